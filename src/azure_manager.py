@@ -1,25 +1,40 @@
+from __future__ import annotations
+
 import logging
 import os
+import threading
 import uuid
+from concurrent.futures import Future
+from typing import IO, TYPE_CHECKING, Any
 
 from azure.core.exceptions import HttpResponseError, ResourceNotFoundError
-from azure.identity import AzureAuthorityHosts, DefaultAzureCredential
-from azure.mgmt.compute import ComputeManagementClient
-from azure.mgmt.compute.models import (
-    GalleryDiskImageSource,
-    GalleryImage,
-    GalleryImageFeature,
-    GalleryImageIdentifier,
-    GalleryImageVersion,
-    GalleryImageVersionProperties,
-    GalleryImageVersionPublishingProfile,
-    GalleryImageVersionStorageProfile,
-    GalleryOSDiskImage,
-    TargetRegion,
-)
-from azure.storage.blob import BlobServiceClient, ContainerClient
+
+from .credentials import CREDENTIAL_AUTO, CachingCredential, build_credential
+from .gallery_inventory import DEFAULT_INVENTORY_TTL, GalleryInventory
+from .operations import OperationTracker, ProvisioningStatePoller
+from .publishing import PublishingProfile
+from .sparse import ByteRange
+from .upload.page_blob import PageBlobUploader
+
+if TYPE_CHECKING:
+    # The Azure SDK clients and models take most of the startup time, so they
+    # are imported once a run first needs them.
+    from azure.core.polling import LROPoller
+    from azure.mgmt.compute import ComputeManagementClient
+    from azure.mgmt.compute.models import GalleryImage, GalleryImageFeature, GalleryImageVersion
+    from azure.storage.blob import BlobClient, BlobProperties, ContainerClient
 
 DEFAULT_GENERATION = "gen1"
+#: Blob metadata key holding the sha256 of a completely uploaded VHD.
+CONTENT_DIGEST_METADATA = "vhd_sha256"
+
+
+def _new_blob_name() -> str:
+    return f"bosh-stemcell-{uuid.uuid4()}.vhd"
+
+
+def _content_blob_name(content_digest: str) -> str:
+    return f"bosh-stemcell-sha256-{content_digest}.vhd"
 
 
 def _hyper_v_generation(generation: str) -> str:
@@ -50,7 +65,25 @@ def _normalize_disk_controllers(disk_controllers: list) -> list:
     return normalized
 
 
+def _retry_after(headers: Any) -> float | None:
+    """Returns the delay of a Retry-After header given in seconds, if any."""
+    value: Any = headers.get("Retry-After") if headers is not None else None
+    if not isinstance(value, str | int | float):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
 class AzureManager:
+    """Uploads VHDs to Azure storage and publishes them to compute galleries.
+
+    The credential, the compute and storage clients and the gallery inventory
+    are created when they are first used, so a run that finds nothing to
+    mirror never loads the storage SDK or connects to the storage account.
+    """
+
     def __init__(
         self,
         subscription_id: str,
@@ -58,42 +91,132 @@ class AzureManager:
         resource_group: str,
         location: str,
         logger: logging.Logger | None = None,
+        uploader: PageBlobUploader | None = None,
+        inventory_ttl: float = DEFAULT_INVENTORY_TTL,
+        inventory_path: str | None = None,
+        publishing_profile: PublishingProfile | None = None,
+        credential_type: str = CREDENTIAL_AUTO,
+        token_cache_path: str | None = None,
     ) -> None:
         self.subscription_id: str = subscription_id
+        self.client_id: str = client_id
         self.resource_group: str = resource_group
         self.location: str = location
-        self.credential: DefaultAzureCredential = DefaultAzureCredential(
-            managed_identity_client_id=client_id, authority=AzureAuthorityHosts.AZURE_PUBLIC_CLOUD
-        )
-        self.compute_client: ComputeManagementClient = ComputeManagementClient(self.credential, subscription_id)
-        self.container_client: ContainerClient | None = None
         self.storage_account_name: str | None = None
         self.storage_container: str | None = None
         self.logger: logging.Logger = logger or logging.getLogger(__name__)
+        self.uploader: PageBlobUploader = uploader or PageBlobUploader(logger=self.logger)
+        self.inventory_ttl: float = inventory_ttl
+        self.inventory_path: str | None = inventory_path
+        self.credential_type: str = credential_type
+        self.token_cache_path: str | None = token_cache_path
+        self._clients_lock = threading.RLock()
+        self._credential: CachingCredential | None = None
+        self._compute_client: ComputeManagementClient | None = None
+        self._container_client: ContainerClient | None = None
+        self._inventory: GalleryInventory | None = None
+        self.operations: OperationTracker = OperationTracker(logger=self.logger)
+        self.publishing_profile: PublishingProfile = publishing_profile or PublishingProfile()
+
+    @property
+    def credential(self) -> CachingCredential:
+        """The credential shared by the compute and storage clients, so they share its tokens."""
+        with self._clients_lock:
+            if self._credential is None:
+                self._credential = build_credential(
+                    self.client_id, self.credential_type, cache_path=self.token_cache_path, logger=self.logger
+                )
+            return self._credential
+
+    @property
+    def compute_client(self) -> ComputeManagementClient:
+        with self._clients_lock:
+            if self._compute_client is None:
+                from azure.mgmt.compute import ComputeManagementClient
+
+                self._compute_client = ComputeManagementClient(self.credential, self.subscription_id)
+            return self._compute_client
+
+    @property
+    def inventory(self) -> GalleryInventory:
+        with self._clients_lock:
+            if self._inventory is None:
+                self._inventory = GalleryInventory(
+                    self.compute_client,
+                    self.resource_group,
+                    ttl=self.inventory_ttl,
+                    path=self.inventory_path,
+                    logger=self.logger,
+                )
+            return self._inventory
+
+    @property
+    def container_client(self) -> ContainerClient | None:
+        """The client of the storage container, created along with the container on first use."""
+        with self._clients_lock:
+            if self._container_client is None and self.storage_account_name and self.storage_container:
+                from azure.storage.blob import BlobServiceClient
+
+                blob_service_client: BlobServiceClient = BlobServiceClient(
+                    f"https://{self.storage_account_name}.blob.core.windows.net",
+                    self.credential,
+                    max_block_size=1024 * 1024 * 64,  # 64 MiB
+                    max_single_put_size=1024 * 1024 * 256,  # 256 MiB
+                )
+                container_client: ContainerClient = blob_service_client.get_container_client(self.storage_container)
+                if not container_client.exists():
+                    container_client.create_container()
+                self._container_client = container_client
+            return self._container_client
 
     def setup_storage(self, storage_account_name: str, storage_container: str) -> None:
+        """Sets the storage container VHDs are uploaded to; it is connected to on the first upload."""
         self.storage_account_name = storage_account_name
         self.storage_container = storage_container
-        blob_service_client: BlobServiceClient = BlobServiceClient(
-            f"https://{storage_account_name}.blob.core.windows.net",
-            self.credential,
-            max_block_size=1024 * 1024 * 64,  # 64 MiB
-            max_single_put_size=1024 * 1024 * 256,  # 256 MiB
-        )
-        self.container_client = blob_service_client.get_container_client(storage_container)
-        if not self.container_client.exists():
-            self.container_client.create_container()
+        with self._clients_lock:
+            self._container_client = None
+
+    def upload_vhd(
+        self,
+        vhd_path: str,
+        data_ranges: list[ByteRange] | None = None,
+        blob_name: str | None = None,
+        content_digest: str | None = None,
+    ) -> str:
+        """
+        Uploads a VHD to a page blob, skipping its all-zero pages.
+
+        If the sha256 of the VHD is known, the blob is named after it instead, and
+        an existing blob that completely holds the same content is reused without
+        uploading anything.
+
+        Args:
+            vhd_path (str): The path to the VHD file.
+            data_ranges (list[ByteRange] | None): The VHD's data ranges, if known, so it need not be scanned.
+            blob_name (str | None): A stable blob name for this VHD. An interrupted upload to the same
+                name is resumed. If not given, the VHD is uploaded to a new, randomly named blob.
+            content_digest (str | None): The sha256 of the VHD content.
 
-    def upload_vhd(self, vhd_path: str) -> str:
-        if not self.container_client:
+        Returns:
+            str: The URI of the uploaded page blob.
+        """
+        container_client: ContainerClient | None = self.container_client
+        if not container_client:
             raise ValueError("Storage account not configured.")
 
-        blob_name: str = f"bosh-stemcell-{uuid.uuid4()}.vhd"
+        if content_digest is not None:
+            blob_name = _content_blob_name(content_digest)
+        resume: bool = blob_name is not None
+        blob_name = blob_name or _new_blob_name()
+        blob_client: BlobClient = container_client.get_blob_client(blob_name)
+        if content_digest is not None and self._holds_content(blob_client, os.path.getsize(vhd_path), content_digest):
+            self.logger.info(f"Blob {blob_name} already holds this VHD; skipping upload.")
+            return self._blob_uri(blob_name)
+
         try:
-            with open(vhd_path, "rb") as data:
-                self.container_client.upload_blob(
-                    name=blob_name, data=data, blob_type="PageBlob", overwrite=True, max_concurrency=4
-                )
+            self.uploader.upload_file(blob_client, vhd_path, data_ranges, resume=resume)
+            if content_digest is not None:
+                blob_client.set_blob_metadata({CONTENT_DIGEST_METADATA: content_digest})
             self.logger.info(f"Uploaded VHD to blob: {blob_name}")
         except HttpResponseError as e:
             self.logger.error(f"Failed to upload VHD: {e.message}")
@@ -102,6 +225,79 @@ class AzureManager:
             self.logger.error(f"An unexpected error occurred during VHD upload: {str(e)}")
             raise e
 
+        return self._blob_uri(blob_name)
+
+    def upload_vhd_stream(self, stream: IO[bytes], size: int, blob_name: str | None = None) -> str:
+        """
+        Uploads a VHD from a sequential stream without staging it on disk.
+
+        Args:
+            stream (IO[bytes]): The VHD content.
+            size (int): The VHD size in bytes.
+            blob_name (str | None): A stable blob name for this VHD; see ``upload_vhd``.
+
+        Returns:
+            str: The URI of the uploaded page blob.
+        """
+        container_client: ContainerClient | None = self.container_client
+        if not container_client:
+            raise ValueError("Storage account not configured.")
+
+        resume: bool = blob_name is not None
+        blob_name = blob_name or _new_blob_name()
+        try:
+            self.uploader.upload_stream(container_client.get_blob_client(blob_name), stream, size, resume=resume)
+            self.logger.info(f"Uploaded VHD to blob: {blob_name}")
+        except HttpResponseError as e:
+            self.logger.error(f"Failed to upload VHD: {e.message}")
+            raise e
+
+        return self._blob_uri(blob_name)
+
+    def delete_blob(self, blob_name: str) -> None:
+        """Deletes a blob from the storage container, if it exists."""
+        container_client: ContainerClient | None = self.container_client
+        if not container_client:
+            raise ValueError("Storage account not configured.")
+        try:
+            container_client.get_blob_client(blob_name).delete_blob()
+            self.logger.info(f"Deleted blob: {blob_name}")
+        except ResourceNotFoundError:
+            pass
+
+    def holds_vhd(self, blob_uri: str, size: int | None = None, content_digest: str | None = None) -> bool:
+        """
+        Whether a VHD uploaded earlier is still in its blob, e.g. before another image version is created from it.
+
+        Args:
+            blob_uri (str): The URI ``upload_vhd`` or ``upload_vhd_stream`` returned.
+            size (int | None): The VHD size in bytes, if known.
+            content_digest (str | None): The sha256 of the VHD, if it was recorded on the blob after the upload.
+
+        Returns:
+            bool: Whether the blob exists in the storage container, with the given size and sha256.
+        """
+        container_client: ContainerClient | None = self.container_client
+        if not container_client:
+            raise ValueError("Storage account not configured.")
+        prefix: str = self._blob_uri("")
+        if not blob_uri.startswith(prefix):
+            return False
+        blob_client: BlobClient = container_client.get_blob_client(blob_uri.removeprefix(prefix))
+        return self._holds_content(blob_client, size, content_digest)
+
+    def _holds_content(self, blob_client: BlobClient, size: int | None, content_digest: str | None) -> bool:
+        """Whether the blob exists and was completely uploaded from a VHD with the given size and sha256, if given."""
+        try:
+            properties: BlobProperties = blob_client.get_blob_properties()
+        except ResourceNotFoundError:
+            return False
+        metadata: dict[str, str] = properties.metadata or {}
+        if content_digest is not None and metadata.get(CONTENT_DIGEST_METADATA) != content_digest:
+            return False
+        return size is None or properties.size == size
+
+    def _blob_uri(self, blob_name: str) -> str:
         return f"https://{self.storage_account_name}.blob.core.windows.net/{self.storage_container}/{blob_name}"
 
     def check_or_create_gallery_image(
@@ -116,6 +312,8 @@ class AzureManager:
             self.compute_client.gallery_images.get(self.resource_group, gallery_name, gallery_image_name)
             self.logger.info("Gallery image definition already exists.")
         except ResourceNotFoundError:
+            from azure.mgmt.compute.models import GalleryImage, GalleryImageIdentifier
+
             self.logger.info("Creating new gallery image definition...")
             generation: str = str(cloud_properties.get("generation", DEFAULT_GENERATION))
             gallery_image_params: GalleryImage = GalleryImage(  # pyright: ignore[reportCallIssue]
@@ -131,12 +329,13 @@ class AzureManager:
                 architecture=_normalize_architecture(cloud_properties.get("architecture")),
                 features=self._build_gallery_image_features(cloud_properties) or None,
             )
-            self.compute_client.gallery_images.begin_create_or_update(
+            poller: LROPoller[GalleryImage] = self.compute_client.gallery_images.begin_create_or_update(
                 resource_group_name=self.resource_group,
                 gallery_name=gallery_name,
                 gallery_image_name=gallery_image_name,
                 gallery_image=gallery_image_params,
             )
+            self.operations.track(f"Gallery image definition {gallery_image_name}", poller).result()
             self.logger.info("Gallery image definition created.")
 
     def _build_gallery_image_features(self, cloud_properties: dict) -> list[GalleryImageFeature]:
@@ -144,6 +343,8 @@ class AzureManager:
 
         Features only apply to generation 2 images, mirroring the bosh-azure-cpi.
         """
+        from azure.mgmt.compute.models import GalleryImageFeature
+
         generation: str = str(cloud_properties.get("generation", DEFAULT_GENERATION)).lower()
         if generation == DEFAULT_GENERATION:
             return []
@@ -190,7 +391,27 @@ class AzureManager:
 
     def create_gallery_image_version(
         self, gallery_name: str, gallery_image_name: str, gallery_image_version: str, blob_uri: str
-    ) -> None:
+    ) -> Future:
+        """
+        Starts creating a gallery image version from an uploaded VHD.
+
+        The version is replicated as set out by ``publishing_profile``. The
+        operation and the replication to its target regions are followed by
+        ``operations``, which logs their progress. The version is recorded in the
+        gallery inventory until the gallery is listed again; if the creation
+        fails, the listing is dropped, so the version is not taken to exist.
+
+        Returns:
+            Future: Resolves to the ``GalleryImageVersion`` once it is provisioned and usable.
+        """
+        from azure.mgmt.compute.models import (
+            GalleryDiskImageSource,
+            GalleryImageVersion,
+            GalleryImageVersionProperties,
+            GalleryImageVersionStorageProfile,
+            GalleryOSDiskImage,
+        )
+
         storage_account_id = (
             f"/subscriptions/{self.subscription_id}/resourceGroups/{self.resource_group}"
             f"/providers/Microsoft.Storage/storageAccounts/{self.storage_account_name}"
@@ -198,9 +419,7 @@ class AzureManager:
         image_version = GalleryImageVersion(
             location=self.location,
             properties=GalleryImageVersionProperties(
-                publishing_profile=GalleryImageVersionPublishingProfile(
-                    target_regions=[TargetRegion(name=self.location, regional_replica_count=1)],
-                ),
+                publishing_profile=self.publishing_profile.build(self.location),
                 storage_profile=GalleryImageVersionStorageProfile(
                     os_disk_image=GalleryOSDiskImage(
                         source=GalleryDiskImageSource(
@@ -211,27 +430,70 @@ class AzureManager:
                 ),
             ),
         )
-        self.compute_client.gallery_image_versions.begin_create_or_update(
+        poller: LROPoller[GalleryImageVersion] = self.compute_client.gallery_image_versions.begin_create_or_update(
             self.resource_group,
             gallery_name,
             gallery_image_name,
             gallery_image_version,
             image_version,
         )
+        self.inventory.record_version(gallery_name, gallery_image_name, gallery_image_version)
         self.logger.info(f"Gallery image version {gallery_image_version} creation initiated.")
+        provisioned: Future = self.operations.track(
+            f"Gallery image version {gallery_image_version}",
+            poller,
+            lambda: self._replication_progress(gallery_name, gallery_image_name, gallery_image_version),
+        )
+
+        def forget_failed_version(done: Future) -> None:
+            # The version was recorded as being created; list the gallery again to see what it holds.
+            if done.cancelled() or done.exception() is not None:
+                self.inventory.invalidate(gallery_name)
+
+        provisioned.add_done_callback(forget_failed_version)
+        return provisioned
+
+    def follow_gallery_image_version(
+        self, gallery_name: str, gallery_image_name: str, gallery_image_version: str
+    ) -> Future:
+        """
+        Follows a gallery image version whose creation was requested earlier, e.g. by an interrupted run.
+
+        Returns:
+            Future: Resolves to the ``GalleryImageVersion`` once it is provisioned and usable.
+        """
+        poller = ProvisioningStatePoller(
+            lambda: self.compute_client.gallery_image_versions.get(
+                self.resource_group, gallery_name, gallery_image_name, gallery_image_version
+            )
+        )
+        return self.operations.track(
+            f"Gallery image version {gallery_image_version}",
+            poller,
+            lambda: self._replication_progress(gallery_name, gallery_image_name, gallery_image_version),
+        )
+
+    def _replication_progress(
+        self, gallery_name: str, gallery_image_name: str, gallery_image_version: str
+    ) -> tuple[dict[str, str], float | None]:
+        """Reads the replication state of an image version in each target region, and any Retry-After delay."""
+        image_version, headers = self.compute_client.gallery_image_versions.get(
+            self.resource_group,
+            gallery_name,
+            gallery_image_name,
+            gallery_image_version,
+            expand="ReplicationStatus",
+            cls=lambda pipeline_response, deserialized, _: (deserialized, pipeline_response.http_response.headers),
+        )
+        regions: dict[str, str] = {}
+        replication_status = image_version.replication_status
+        for status in (replication_status.summary if replication_status else None) or []:
+            state: str = str(getattr(status.state, "value", status.state))
+            regions[status.region] = f"{state} {status.progress}%" if status.progress is not None else state
+        return regions, _retry_after(headers)
 
     def gallery_image_version_exists(
         self, gallery_name: str, gallery_image_name: str, gallery_image_version: str
     ) -> bool:
-        try:
-            self.compute_client.gallery_image_versions.get(
-                resource_group_name=self.resource_group,
-                gallery_name=gallery_name,
-                gallery_image_name=gallery_image_name,
-                gallery_image_version_name=gallery_image_version,
-            )
-            return True
-        except ResourceNotFoundError:
-            return False
-        except Exception as e:
-            raise e
+        """Whether the gallery holds the image version, in any provisioning state, as of its inventory listing."""
+        return self.inventory.version_exists(gallery_name, gallery_image_name, gallery_image_version)
@@ -1,13 +1,33 @@
 import logging
 import os
 from dataclasses import dataclass
+from typing import Any
 
+from .credentials import CREDENTIAL_AUTO
+from .gallery_inventory import DEFAULT_INVENTORY_TTL
+from .http_session import DEFAULT_RETRIES
+from .mirror.bosh_io import TRANSFER_MODE_DOWNLOAD
+from .mirror.download import DEFAULT_DOWNLOAD_WORKERS, DEFAULT_SEGMENT_SIZE
 from .notify.github import GitHubNotifier, GitHubNotifierConfig
 from .notify.notifier import Notifier
+from .publishing import DEFAULT_STORAGE_ACCOUNT_TYPE, REPLICATION_MODE_FULL
+from .sparse import PAGE_SIZE
+from .upload.adaptive import DEFAULT_MAX_CONCURRENCY
+from .upload.async_page_blob import DEFAULT_IN_FLIGHT_SIZE
+from .upload.page_blob import (
+    DEFAULT_UPLOAD_CONCURRENCY,
+    DEFAULT_WINDOW_SIZE,
+    MAX_PAGE_WRITE_SIZE,
+    UPLOAD_ENGINE_THREADS,
+)
 
 # Default mirror to run when BASM_MIRROR is unset.
 DEFAULT_MIRROR = "boshio/ubuntu-jammy"
 
+KIB = 1024
+MIB = 1024 * KIB
+GIB = 1024 * MIB
+
 
 @dataclass(frozen=True)
 class AzureConfig:
@@ -20,6 +40,31 @@ class AzureConfig:
     location: str
     gallery_name: str
     storage_container: str = "stemcell"
+    #: How to authenticate: ``auto``, ``managed-identity`` or ``default`` (the ``DefaultAzureCredential`` chain).
+    credential_type: str = CREDENTIAL_AUTO
+    #: File that keeps access tokens across runs; empty keeps them in memory only.
+    token_cache_file: str = ""
+    upload_concurrency: int = DEFAULT_UPLOAD_CONCURRENCY
+    #: Bytes written per Put Page request; with ``upload_autotune``, the largest size tried.
+    upload_chunk_size: int = MAX_PAGE_WRITE_SIZE
+    upload_window_size: int = DEFAULT_WINDOW_SIZE
+    upload_engine: str = UPLOAD_ENGINE_THREADS
+    upload_in_flight_size: int = DEFAULT_IN_FLIGHT_SIZE
+    #: Tune the chunk size and concurrency while uploading, starting from ``upload_concurrency``.
+    upload_autotune: bool = False
+    upload_max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+    #: Seconds a gallery listing answers version lookups before the gallery is listed again.
+    gallery_inventory_ttl: int = DEFAULT_INVENTORY_TTL
+    #: File that keeps gallery listings across runs; empty keeps them in memory only.
+    gallery_inventory_file: str = ""
+    #: Comma-separated regions new image versions are replicated to besides ``location``, e.g. ``westeurope=3``.
+    gallery_target_regions: str = ""
+    #: Replicas per region; ``0`` sizes them from ``gallery_vm_concurrency``.
+    gallery_replica_count: int = 0
+    #: Number of VMs expected to be created at once from an image version in one region.
+    gallery_vm_concurrency: int = 0
+    gallery_storage_account_type: str = DEFAULT_STORAGE_ACCOUNT_TYPE
+    gallery_replication_mode: str = REPLICATION_MODE_FULL
 
 
 @dataclass(frozen=True)
@@ -28,6 +73,33 @@ class MirrorConfig:
 
     mirror: str
     mounted_directory: str
+    download_workers: int = DEFAULT_DOWNLOAD_WORKERS
+    download_segment_size: int = DEFAULT_SEGMENT_SIZE
+    transfer_mode: str = TRANSFER_MODE_DOWNLOAD
+    #: Size limit of the artifact cache in the mounted directory; ``0`` disables the cache.
+    cache_size: int = 0
+    #: Number of mirrors that run at once when several are selected; ``0`` runs all of them at once.
+    mirror_concurrency: int = 0
+    #: Number of the most recent stemcell versions that are mirrored if missing from the gallery.
+    backfill_count: int = 1
+    #: Comma-separated version constraints, e.g. ``>=1.600,<1.700``; empty selects every version.
+    backfill_range: str = ""
+    #: Scratch disk space shared by the stemcells mirrored at once; ``0`` leaves it unbounded.
+    scratch_budget: int = 0
+    #: Workers of the fetch (download and extract), upload and publish stages of the mirror pipeline.
+    fetch_workers: int = 1
+    upload_workers: int = 1
+    publish_workers: int = 1
+    #: Number of stemcells that may wait between two pipeline stages.
+    pipeline_queue_size: int = 1
+    #: Wait until new gallery image versions are provisioned, and notify only then.
+    wait_for_provisioning: bool = True
+    #: File that keeps the bosh.io listings across runs; empty keeps them in memory only.
+    metadata_index_file: str = ""
+    #: File that keeps the stages each stemcell version completed, so an interrupted run resumes; empty disables it.
+    checkpoint_file: str = ""
+    #: Retries of idempotent HTTP requests to bosh.io, the stemcell origin and GitHub.
+    http_retries: int = DEFAULT_RETRIES
 
 
 def load_azure_config() -> AzureConfig:
@@ -39,6 +111,22 @@ def load_azure_config() -> AzureConfig:
         storage_account_name=os.environ["AZURE_STORAGE_ACCOUNT_NAME"],
         location=os.environ.get("AZURE_REGION", "eastus"),
         gallery_name=os.environ.get("AZURE_GALLERY_NAME", "bosh-azure-stemcells"),
+        credential_type=os.environ.get("BASM_AZURE_CREDENTIAL", CREDENTIAL_AUTO),
+        token_cache_file=os.environ.get("BASM_TOKEN_CACHE_FILE", ""),
+        upload_concurrency=_int_env("BASM_UPLOAD_CONCURRENCY", DEFAULT_UPLOAD_CONCURRENCY),
+        upload_chunk_size=_chunk_size_env("BASM_UPLOAD_CHUNK_SIZE_KB", MAX_PAGE_WRITE_SIZE),
+        upload_window_size=_int_env("BASM_UPLOAD_WINDOW_SIZE_MB", DEFAULT_WINDOW_SIZE // MIB) * MIB,
+        upload_engine=os.environ.get("BASM_UPLOAD_ENGINE", UPLOAD_ENGINE_THREADS),
+        upload_in_flight_size=_int_env("BASM_UPLOAD_IN_FLIGHT_MB", DEFAULT_IN_FLIGHT_SIZE // MIB) * MIB,
+        upload_autotune=_bool_env("BASM_UPLOAD_AUTOTUNE"),
+        upload_max_concurrency=_int_env("BASM_UPLOAD_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY),
+        gallery_inventory_ttl=_int_env("BASM_GALLERY_INVENTORY_TTL", DEFAULT_INVENTORY_TTL, minimum=0),
+        gallery_inventory_file=os.environ.get("BASM_GALLERY_INVENTORY_FILE", ""),
+        gallery_target_regions=os.environ.get("BASM_GALLERY_TARGET_REGIONS", ""),
+        gallery_replica_count=_int_env("BASM_GALLERY_REPLICA_COUNT", 0, minimum=0),
+        gallery_vm_concurrency=_int_env("BASM_GALLERY_VM_CONCURRENCY", 0),
+        gallery_storage_account_type=os.environ.get("BASM_GALLERY_STORAGE_ACCOUNT_TYPE", DEFAULT_STORAGE_ACCOUNT_TYPE),
+        gallery_replication_mode=os.environ.get("BASM_GALLERY_REPLICATION_MODE", REPLICATION_MODE_FULL),
     )
 
 
@@ -47,11 +135,64 @@ def load_mirror_config() -> MirrorConfig:
     return MirrorConfig(
         mirror=os.environ.get("BASM_MIRROR", DEFAULT_MIRROR),
         mounted_directory=os.environ.get("BASM_MOUNTED_DIRECTORY", ""),
+        download_workers=_int_env("BASM_DOWNLOAD_WORKERS", DEFAULT_DOWNLOAD_WORKERS),
+        download_segment_size=_int_env("BASM_DOWNLOAD_SEGMENT_SIZE_MB", DEFAULT_SEGMENT_SIZE // MIB) * MIB,
+        transfer_mode=os.environ.get("BASM_TRANSFER_MODE", TRANSFER_MODE_DOWNLOAD),
+        cache_size=_int_env("BASM_CACHE_SIZE_GB", 0, minimum=0) * GIB,
+        mirror_concurrency=_int_env("BASM_MIRROR_CONCURRENCY", 0, minimum=0),
+        backfill_count=_int_env("BASM_BACKFILL_COUNT", 1),
+        backfill_range=os.environ.get("BASM_BACKFILL_RANGE", ""),
+        scratch_budget=_int_env("BASM_SCRATCH_BUDGET_GB", 0, minimum=0) * GIB,
+        fetch_workers=_int_env("BASM_PIPELINE_FETCH_WORKERS", 1),
+        upload_workers=_int_env("BASM_PIPELINE_UPLOAD_WORKERS", 1),
+        publish_workers=_int_env("BASM_PIPELINE_PUBLISH_WORKERS", 1),
+        pipeline_queue_size=_int_env("BASM_PIPELINE_QUEUE_SIZE", 1),
+        wait_for_provisioning=_bool_env("BASM_PUBLISH_WAIT", default=True),
+        metadata_index_file=os.environ.get("BASM_METADATA_INDEX_FILE", ""),
+        checkpoint_file=os.environ.get("BASM_CHECKPOINT_FILE", ""),
+        http_retries=_int_env("BASM_HTTP_RETRIES", DEFAULT_RETRIES, minimum=0),
     )
 
 
-def configure_notifier(logger: logging.Logger) -> Notifier | None:
-    """Build a notifier from environment variables, or ``None`` if disabled."""
+def _int_env(name: str, default: int, minimum: int = 1) -> int:
+    """Read an integer environment variable of at least ``minimum``, falling back to ``default`` when unset."""
+    value: str | None = os.environ.get(name)
+    if not value:
+        return default
+    try:
+        parsed = int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer, got '{value}'.") from None
+    if parsed < minimum:
+        raise ValueError(f"{name} must be at least {minimum}, got '{value}'.")
+    return parsed
+
+
+def _chunk_size_env(name: str, default: int) -> int:
+    """Read a Put Page size in KiB, which must be a whole number of pages and at most 4 MiB, as bytes."""
+    size: int = _int_env(name, default // KIB) * KIB
+    if size % PAGE_SIZE or size > MAX_PAGE_WRITE_SIZE:
+        raise ValueError(
+            f"{name} must be a multiple of {PAGE_SIZE} bytes and at most {MAX_PAGE_WRITE_SIZE // KIB} KiB, "
+            f"got '{os.environ[name]}'."
+        )
+    return size
+
+
+def _bool_env(name: str, default: bool = False) -> bool:
+    """Read a boolean environment variable, falling back to ``default`` when unset."""
+    value: str = os.environ.get(name, "").strip().lower()
+    if not value:
+        return default
+    if value in ("0", "false", "no", "off"):
+        return False
+    if value in ("1", "true", "yes", "on"):
+        return True
+    raise ValueError(f"{name} must be true or false, got '{value}'.")
+
+
+def configure_notifier(logger: logging.Logger, session: Any = None) -> Notifier | None:
+    """Build a notifier from environment variables, or ``None`` if disabled; it sends through ``session``."""
     github_token: str | None = os.environ.get("BASM_NOTIFY_GITHUB_TOKEN")
     if not github_token:
         logger.info("GitHub workflow notifications disabled; BASM_NOTIFY_GITHUB_TOKEN not set.")
@@ -76,4 +217,4 @@ def configure_notifier(logger: logging.Logger) -> Notifier | None:
         token=github_token,
         timeout_seconds=10,
     )
-    return GitHubNotifier(config, logger=logger)
+    return GitHubNotifier(config, logger=logger, session=session)
@@ -0,0 +1,160 @@
+import logging
+import os
+import stat
+import threading
+import time
+from collections.abc import Callable
+from typing import Any, Self
+
+from azure.core.credentials import AccessToken, TokenCredential
+
+from .state_file import load_state, save_state
+
+#: Managed identity when a client ID is configured, otherwise the full ``DefaultAzureCredential`` chain.
+CREDENTIAL_AUTO = "auto"
+CREDENTIAL_MANAGED_IDENTITY = "managed-identity"
+CREDENTIAL_DEFAULT = "default"
+CREDENTIAL_TYPES = (CREDENTIAL_AUTO, CREDENTIAL_MANAGED_IDENTITY, CREDENTIAL_DEFAULT)
+#: Seconds before it expires at which a cached token is replaced.
+TOKEN_REFRESH_MARGIN = 300
+#: Mode of the token cache file; file systems without POSIX modes, e.g. SMB shares, ignore it.
+TOKEN_CACHE_MODE = 0o600
+
+
+class CachingCredential:
+    """A token credential that hands out each token for as long as it is valid.
+
+    The compute and storage clients each have their own authentication
+    policy, and every async upload client opens another one; sharing this
+    credential lets them all use one token per scope instead of asking the
+    identity endpoint for their own. If ``path`` is set, tokens are saved there,
+    readable by the owner only where the file system applies the file mode, and
+    reused by later runs until they are within
+    ``refresh_margin`` seconds of expiring. A token request with claims, i.e.
+    a claims challenge, always fetches a new token.
+    """
+
+    def __init__(
+        self,
+        credential: TokenCredential,
+        path: str | None = None,
+        refresh_margin: float = TOKEN_REFRESH_MARGIN,
+        logger: logging.Logger | None = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.credential: TokenCredential = credential
+        self.path: str | None = path
+        self.refresh_margin: float = refresh_margin
+        self.logger: logging.Logger = logger or logging.getLogger(__name__)
+        self._clock: Callable[[], float] = clock
+        self._lock = threading.Lock()
+        self._tokens: dict[str, AccessToken] | None = None
+        self._mode_checked: bool = False
+
+    def get_token(self, *scopes: str, **kwargs: Any) -> AccessToken:
+        key: str = _token_key(scopes, kwargs)
+        with self._lock:
+            tokens: dict[str, AccessToken] = self._load()
+            token: AccessToken | None = tokens.get(key)
+            if (
+                token is not None
+                and not kwargs.get("claims")
+                and token.expires_on - self._clock() > self.refresh_margin
+            ):
+                return token
+            token = self.credential.get_token(*scopes, **kwargs)
+            tokens[key] = token
+            self._save()
+            return token
+
+    def close(self) -> None:
+        close: Callable[[], None] | None = getattr(self.credential, "close", None)
+        if close is not None:
+            close()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def _load(self) -> dict[str, AccessToken]:
+        if self._tokens is not None:
+            return self._tokens
+        self._tokens = {}
+        if not self.path:
+            return self._tokens
+        for key, token in load_state(self.path, "token cache", self.logger).items():
+            if float(token["expires_on"]) > self._clock():
+                self._tokens[key] = AccessToken(token["token"], int(token["expires_on"]))
+        return self._tokens
+
+    def _save(self) -> None:
+        if not self.path or self._tokens is None:
+            return
+        now: float = self._clock()
+        content: dict[str, dict] = {
+            key: {"token": token.token, "expires_on": token.expires_on}
+            for key, token in self._tokens.items()
+            if token.expires_on > now
+        }
+        save_state(self.path, content, "token cache", self.logger, mode=TOKEN_CACHE_MODE)
+        if not self._mode_checked:
+            self._mode_checked = True
+            self._warn_if_shared(self.path)
+
+    def _warn_if_shared(self, path: str) -> None:
+        try:
+            mode: int = stat.S_IMODE(os.stat(path).st_mode)
+        except OSError:
+            return
+        if mode & ~TOKEN_CACHE_MODE:
+            self.logger.warning(
+                f"Token cache {path} has mode {mode:o} instead of {TOKEN_CACHE_MODE:o}, so other users may read it; "
+                "its file system does not apply file modes, e.g. an SMB share."
+            )
+
+
+def build_credential(
+    client_id: str,
+    credential_type: str = CREDENTIAL_AUTO,
+    cache_path: str | None = None,
+    logger: logging.Logger | None = None,
+) -> CachingCredential:
+    """
+    Builds the credential shared by all Azure clients.
+
+    ``DefaultAzureCredential`` tries environment, workload identity, managed
+    identity and developer tool credentials in turn, each with its own
+    timeout. When the job runs with a user-assigned managed identity, asking
+    it directly skips that chain.
+
+    Args:
+        client_id (str): The client ID of the user-assigned managed identity, if any.
+        credential_type (str): One of ``CREDENTIAL_TYPES``.
+        cache_path (str | None): The file tokens are kept in across runs; see ``CachingCredential``.
+        logger (logging.Logger | None): The logger.
+
+    Returns:
+        CachingCredential: The credential.
+    """
+    if credential_type not in CREDENTIAL_TYPES:
+        raise ValueError(
+            f"Unsupported credential type '{credential_type}'. Supported types: {', '.join(CREDENTIAL_TYPES)}"
+        )
+    credential: TokenCredential
+    if credential_type == CREDENTIAL_MANAGED_IDENTITY or (credential_type == CREDENTIAL_AUTO and client_id):
+        from azure.identity import ManagedIdentityCredential
+
+        credential = ManagedIdentityCredential(client_id=client_id or None)
+    else:
+        from azure.identity import AzureAuthorityHosts, DefaultAzureCredential
+
+        credential = DefaultAzureCredential(
+            managed_identity_client_id=client_id or None, authority=AzureAuthorityHosts.AZURE_PUBLIC_CLOUD
+        )
+    return CachingCredential(credential, path=cache_path, logger=logger)
+
+
+def _token_key(scopes: tuple[str, ...], kwargs: dict[str, Any]) -> str:
+    return " ".join(sorted(scopes)) + f"|{kwargs.get('tenant_id') or ''}|{bool(kwargs.get('enable_cae'))}"
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+
+from azure.core.exceptions import ResourceNotFoundError
+
+from .state_file import load_state, save_state
+
+if TYPE_CHECKING:
+    from azure.mgmt.compute import ComputeManagementClient
+
+DEFAULT_INVENTORY_TTL = 300  # seconds
+#: Provisioning state recorded for a version this process started creating.
+PROVISIONING_STATE_CREATING = "Creating"
+
+
+@dataclass
+class _Listing:
+    """The image definitions of one gallery, with the provisioning state of each of their versions."""
+
+    fetched_at: float
+    images: dict[str, dict[str, str]] = field(default_factory=dict)
+
+
+class GalleryInventory:
+    """An in-memory index of the image definitions and versions in compute galleries.
+
+    A gallery is listed when it is first queried and again once its listing is
+    older than ``ttl`` seconds: one paged call for its image definitions and one
+    per definition for their versions, instead of one GET per version looked
+    up. Versions created through the inventory are recorded as they are
+    created. If ``path`` is set, listings are saved there and used by later runs
+    while they are fresh. The inventory is safe to share between threads.
+    """
+
+    def __init__(
+        self,
+        compute_client: ComputeManagementClient,
+        resource_group: str,
+        ttl: float = DEFAULT_INVENTORY_TTL,
+        path: str | None = None,
+        logger: logging.Logger | None = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        if ttl < 0:
+            raise ValueError("ttl must not be negative.")
+        self.compute_client: ComputeManagementClient = compute_client
+        self.resource_group: str = resource_group
+        self.ttl: float = ttl
+        self.path: str | None = path
+        self.logger: logging.Logger = logger or logging.getLogger(__name__)
+        self._clock: Callable[[], float] = clock
+        self._lock = threading.Lock()
+        self._listings: dict[str, _Listing] | None = None
+
+    def image_exists(self, gallery_name: str, gallery_image_name: str) -> bool:
+        with self._lock:
+            return gallery_image_name in self._listing(gallery_name).images
+
+    def version_exists(self, gallery_name: str, gallery_image_name: str, gallery_image_version: str) -> bool:
+        return self.provisioning_state(gallery_name, gallery_image_name, gallery_image_version) is not None
+
+    def provisioning_state(self, gallery_name: str, gallery_image_name: str, gallery_image_version: str) -> str | None:
+        """Returns the provisioning state of an image version, or ``None`` if the gallery has no such version."""
+        with self._lock:
+            versions: dict[str, str] = self._listing(gallery_name).images.get(gallery_image_name, {})
+            return versions.get(gallery_image_version)
+
+    def record_version(
+        self,
+        gallery_name: str,
+        gallery_image_name: str,
+        gallery_image_version: str,
+        provisioning_state: str = PROVISIONING_STATE_CREATING,
+    ) -> None:
+        """Records a version created by this process, so it is known without listing the gallery again."""
+        with self._lock:
+            listing: _Listing = self._listing(gallery_name)
+            listing.images.setdefault(gallery_image_name, {})[gallery_image_version] = provisioning_state
+            self._save()
+
+    def invalidate(self, gallery_name: str | None = None) -> None:
+        """Drops the listing of ``gallery_name``, or of all galleries, so the next query lists it again."""
+        with self._lock:
+            listings: dict[str, _Listing] = self._load()
+            if gallery_name is None:
+                listings.clear()
+            else:
+                listings.pop(self._key(gallery_name), None)
+            self._save()
+
+    def _listing(self, gallery_name: str) -> _Listing:
+        listings: dict[str, _Listing] = self._load()
+        key: str = self._key(gallery_name)
+        listing: _Listing | None = listings.get(key)
+        if listing is None or self._clock() - listing.fetched_at > self.ttl:
+            listing = self._fetch(gallery_name)
+            listings[key] = listing
+            self._save()
+        return listing
+
+    def _fetch(self, gallery_name: str) -> _Listing:
+        listing = _Listing(fetched_at=self._clock())
+        try:
+            images: list[Any] = list(
+                self.compute_client.gallery_images.list_by_gallery(self.resource_group, gallery_name)
+            )
+        except ResourceNotFoundError:
+            self.logger.info(f"Gallery {gallery_name} does not exist yet.")
+            return listing
+        for image in images:
+            versions: dict[str, str] = {}
+            try:
+                for version in self.compute_client.gallery_image_versions.list_by_gallery_image(
+                    self.resource_group, gallery_name, image.name
+                ):
+                    versions[version.name] = _provisioning_state(version)
+            except ResourceNotFoundError:
+                pass  # deleted while listing
+            listing.images[image.name] = versions
+        self.logger.info(
+            f"Listed {sum(len(versions) for versions in listing.images.values())} image versions "
+            f"in {len(listing.images)} image definitions of gallery {gallery_name}."
+        )
+        return listing
+
+    def _key(self, gallery_name: str) -> str:
+        return f"{self.resource_group}/{gallery_name}".lower()
+
+    def _load(self) -> dict[str, _Listing]:
+        if self._listings is not None:
+            return self._listings
+        self._listings = {}
+        if not self.path:
+            return self._listings
+        for key, listing in load_state(self.path, "gallery inventory", self.logger).items():
+            self._listings[key] = _Listing(fetched_at=float(listing["fetched_at"]), images=listing["images"])
+        return self._listings
+
+    def _save(self) -> None:
+        if not self.path or self._listings is None:
+            return
+        content: dict[str, dict] = {
+            key: {"fetched_at": listing.fetched_at, "images": listing.images} for key, listing in self._listings.items()
+        }
+        save_state(self.path, content, "gallery inventory", self.logger)
+
+
+def _provisioning_state(version: Any) -> str:
+    state: Any = getattr(version, "provisioning_state", None)
+    return str(getattr(state, "value", state) or "Unknown")
@@ -0,0 +1,72 @@
+from typing import Any
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_POOL_SIZE = 10
+#: Number of hosts whose connection pools are kept.
+POOLED_HOSTS = 10
+DEFAULT_RETRIES = 3
+#: Base of the exponential backoff between retries, in seconds: 0.5s, 1s, 2s, ...
+DEFAULT_RETRY_BACKOFF = 0.5
+#: Upper bound of a single backoff or Retry-After wait, in seconds.
+MAX_RETRY_WAIT = 60
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+REQUEST_TIMEOUT = (10, 60)  # (connect, read) seconds
+
+
+class PooledSession(requests.Session):
+    """A ``requests.Session`` that applies a default timeout to every request."""
+
+    def __init__(self, timeout: tuple[float, float] = REQUEST_TIMEOUT) -> None:
+        super().__init__()
+        self.timeout: tuple[float, float] = timeout
+
+    def request(self, method: str | bytes, url: str | bytes, *args: Any, **kwargs: Any) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, *args, **kwargs)
+
+
+def build_session(
+    pool_size: int = DEFAULT_POOL_SIZE,
+    retries: int = DEFAULT_RETRIES,
+    backoff: float = DEFAULT_RETRY_BACKOFF,
+    timeout: tuple[float, float] = REQUEST_TIMEOUT,
+) -> PooledSession:
+    """
+    Builds the HTTP session shared by the bosh.io client, the downloader and the notifiers.
+
+    Connections are kept alive in a pool per host. Idempotent requests, i.e.
+    all but POST and PATCH, are retried on connection errors and on the
+    ``RETRY_STATUSES`` with exponential backoff, waiting as long as a
+    Retry-After header asks instead, up to ``MAX_RETRY_WAIT``. Errors while a
+    streamed body is read are left to the caller, e.g. the downloader's
+    resumable segments.
+
+    Args:
+        pool_size (int): The connections kept per host, e.g. the number of parallel download segments.
+        retries (int): The retries per request; ``0`` disables them.
+        backoff (float): The backoff factor between retries, in seconds.
+        timeout (tuple[float, float]): The connect and read timeouts of requests that set none.
+
+    Returns:
+        PooledSession: The session.
+    """
+    if pool_size < 1:
+        raise ValueError("pool_size must be at least 1.")
+    if retries < 0:
+        raise ValueError("retries must not be negative.")
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        backoff_max=MAX_RETRY_WAIT,
+        status_forcelist=RETRY_STATUSES,
+        respect_retry_after_header=True,
+        retry_after_max=MAX_RETRY_WAIT,
+        raise_on_status=False,
+    )
+    session = PooledSession(timeout=timeout)
+    for scheme in ("http://", "https://"):
+        session.mount(scheme, HTTPAdapter(pool_connections=POOLED_HOSTS, pool_maxsize=pool_size, max_retries=retry))
+    return session
@@ -1,5 +1,8 @@
 import logging
+import os
 import sys
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from dataclasses import replace
 
 from .azure_manager import AzureManager
 from .config import (
@@ -9,11 +12,26 @@ from .config import (
     load_azure_config,
     load_mirror_config,
 )
+from .http_session import DEFAULT_POOL_SIZE, PooledSession, build_session
 from .mirror.bosh_io import BoshIoJammyMirror, BoshIoNobleMirror, BoshIoStemcellMirror
+from .mirror.cache import ArtifactCache
+from .mirror.checkpoint import CheckpointStore
+from .mirror.download import RangedDownloader
+from .mirror.metadata import BoshIoMetadataClient
+from .mirror.scratch import ScratchBudget
 from .notify.notifier import Notifier
+from .publishing import PublishingProfile, parse_target_regions, replica_count_for
+from .upload.adaptive import DEFAULT_CHUNK_SIZES, AdaptivePageBlobUploader, UploadTuner
+from .upload.async_page_blob import AsyncPageBlobUploader
+from .upload.page_blob import UPLOAD_ENGINE_ASYNC, UPLOAD_ENGINE_THREADS, UPLOAD_ENGINES, PageBlobUploader
 
 MIRROR_TYPES: tuple[type[BoshIoStemcellMirror], ...] = (BoshIoJammyMirror, BoshIoNobleMirror)
 
+# Subdirectory of the mounted directory that holds the artifact cache.
+CACHE_DIRECTORY = "cache"
+# Value of BASM_MIRROR that selects every supported mirror.
+ALL_MIRRORS = "all"
+
 
 def configure_logging() -> logging.Logger:
     """Configure application logging and return the app logger."""
@@ -30,14 +48,116 @@ def configure_logging() -> logging.Logger:
     return app_logger
 
 
+def build_uploader(azure_config: AzureConfig, logger: logging.Logger) -> PageBlobUploader:
+    """Build the page blob uploader for the configured upload engine."""
+    if azure_config.upload_engine == UPLOAD_ENGINE_ASYNC:
+        if azure_config.upload_autotune:
+            logger.warning("BASM_UPLOAD_AUTOTUNE only applies to the threads upload engine; ignoring it.")
+        return AsyncPageBlobUploader(
+            in_flight_size=azure_config.upload_in_flight_size, chunk_size=azure_config.upload_chunk_size, logger=logger
+        )
+    if azure_config.upload_engine == UPLOAD_ENGINE_THREADS and azure_config.upload_autotune:
+        chunk_size: int = azure_config.upload_chunk_size
+        tuner = UploadTuner(
+            initial_concurrency=min(azure_config.upload_concurrency, azure_config.upload_max_concurrency),
+            max_concurrency=azure_config.upload_max_concurrency,
+            chunk_sizes=(chunk_size, *(size for size in DEFAULT_CHUNK_SIZES if size < chunk_size)),
+            logger=logger,
+        )
+        return AdaptivePageBlobUploader(tuner, window_size=azure_config.upload_window_size, logger=logger)
+    if azure_config.upload_engine == UPLOAD_ENGINE_THREADS:
+        return PageBlobUploader(
+            concurrency=azure_config.upload_concurrency,
+            window_size=azure_config.upload_window_size,
+            chunk_size=azure_config.upload_chunk_size,
+            logger=logger,
+        )
+
+    raise ValueError(
+        f"Unsupported upload engine '{azure_config.upload_engine}'. Supported engines: {', '.join(UPLOAD_ENGINES)}"
+    )
+
+
+def build_publishing_profile(azure_config: AzureConfig) -> PublishingProfile:
+    """Build the publishing profile of new gallery image versions."""
+    return PublishingProfile(
+        regions=parse_target_regions(azure_config.gallery_target_regions),
+        replica_count=azure_config.gallery_replica_count or replica_count_for(azure_config.gallery_vm_concurrency),
+        storage_account_type=azure_config.gallery_storage_account_type,
+        replication_mode=azure_config.gallery_replication_mode,
+    )
+
+
+def build_cache(mirror_config: MirrorConfig, logger: logging.Logger) -> ArtifactCache | None:
+    """Build the artifact cache in the mounted directory, or ``None`` if it is disabled."""
+    if not mirror_config.cache_size:
+        return None
+    if not mirror_config.mounted_directory:
+        logger.warning("Artifact cache disabled; BASM_CACHE_SIZE_GB requires BASM_MOUNTED_DIRECTORY.")
+        return None
+    return ArtifactCache(
+        os.path.join(mirror_config.mounted_directory, CACHE_DIRECTORY), mirror_config.cache_size, logger=logger
+    )
+
+
+def build_scratch_budget(mirror_config: MirrorConfig) -> ScratchBudget | None:
+    """Build the scratch disk budget, or ``None`` if it is unbounded."""
+    if not mirror_config.scratch_budget:
+        return None
+    return ScratchBudget(mirror_config.scratch_budget)
+
+
+def build_metadata_client(
+    mirror_config: MirrorConfig, logger: logging.Logger, session: PooledSession | None = None
+) -> BoshIoMetadataClient:
+    """Build the bosh.io metadata client, with its index in the configured file, if any."""
+    return BoshIoMetadataClient(path=mirror_config.metadata_index_file or None, session=session, logger=logger)
+
+
+def build_checkpoints(mirror_config: MirrorConfig, logger: logging.Logger) -> CheckpointStore:
+    """Build the store of the mirrors' checkpoints, kept in the configured file, if any."""
+    return CheckpointStore(path=mirror_config.checkpoint_file or None, logger=logger)
+
+
+def build_http_session(mirror_config: MirrorConfig) -> PooledSession:
+    """Build the HTTP session shared by the mirrors and the notifier.
+
+    Its pools keep a connection for each download segment of every stemcell
+    that may be fetched at once.
+    """
+    mirrors: int = len(mirror_keys(mirror_config.mirror)) or 1
+    if mirror_config.mirror_concurrency:
+        mirrors = min(mirrors, mirror_config.mirror_concurrency)
+    pool_size: int = mirror_config.download_workers * mirror_config.fetch_workers * mirrors
+    return build_session(pool_size=max(pool_size, DEFAULT_POOL_SIZE), retries=mirror_config.http_retries)
+
+
+def mirror_keys(mirror: str) -> list[str]:
+    """Split a comma-separated list of mirror keys; ``all`` selects every supported mirror."""
+    keys: list[str] = [key.strip() for key in mirror.split(",") if key.strip()]
+    if keys == [ALL_MIRRORS]:
+        return [cls.name for cls in MIRROR_TYPES]
+    return list(dict.fromkeys(keys))
+
+
 def build_mirror(
     azure_manager: AzureManager,
     azure_config: AzureConfig,
     mirror_config: MirrorConfig,
     notifier: Notifier | None,
     logger: logging.Logger,
+    downloader: RangedDownloader | None = None,
+    cache: ArtifactCache | None = None,
+    scratch_budget: ScratchBudget | None = None,
+    metadata: BoshIoMetadataClient | None = None,
+    checkpoints: CheckpointStore | None = None,
 ) -> BoshIoStemcellMirror:
-    """Build the stemcell mirror for the configured mirror key."""
+    """Build the stemcell mirror for the configured mirror key.
+
+    A ``downloader``, ``cache``, ``scratch_budget``, ``metadata`` client and
+    ``checkpoints`` store shared with other mirrors may be passed in; otherwise
+    they are built from the configuration.
+    """
     for mirror_cls in MIRROR_TYPES:
         if mirror_cls.name == mirror_config.mirror:
             return mirror_cls(
@@ -46,12 +166,103 @@ def build_mirror(
                 extraction_directory=mirror_config.mounted_directory,
                 notifier=notifier,
                 logger=logger,
+                downloader=downloader
+                or RangedDownloader(
+                    workers=mirror_config.download_workers,
+                    segment_size=mirror_config.download_segment_size,
+                    logger=logger,
+                ),
+                transfer_mode=mirror_config.transfer_mode,
+                cache=cache or build_cache(mirror_config, logger),
+                backfill_count=mirror_config.backfill_count,
+                version_range=mirror_config.backfill_range or None,
+                scratch_budget=scratch_budget or build_scratch_budget(mirror_config),
+                fetch_workers=mirror_config.fetch_workers,
+                upload_workers=mirror_config.upload_workers,
+                publish_workers=mirror_config.publish_workers,
+                queue_size=mirror_config.pipeline_queue_size,
+                wait_for_provisioning=mirror_config.wait_for_provisioning,
+                metadata=metadata or build_metadata_client(mirror_config, logger),
+                checkpoints=checkpoints or build_checkpoints(mirror_config, logger),
             )
 
     supported = ", ".join(cls.name for cls in MIRROR_TYPES)
     raise ValueError(f"Unsupported mirror '{mirror_config.mirror}'. Supported mirrors: {supported}")
 
 
+def build_mirrors(
+    azure_manager: AzureManager,
+    azure_config: AzureConfig,
+    mirror_config: MirrorConfig,
+    notifier: Notifier | None,
+    logger: logging.Logger,
+    session: PooledSession | None = None,
+) -> list[BoshIoStemcellMirror]:
+    """Build the stemcell mirrors for the configured mirror keys.
+
+    The mirrors share the Azure manager, the HTTP ``session``, which is
+    built from the configuration if not passed in, the downloader, the
+    artifact cache, the scratch disk budget, the bosh.io index and the
+    checkpoints.
+    """
+    keys: list[str] = mirror_keys(mirror_config.mirror)
+    if not keys:
+        raise ValueError("BASM_MIRROR selects no mirror.")
+    session = session or build_http_session(mirror_config)
+    downloader = RangedDownloader(
+        workers=mirror_config.download_workers,
+        segment_size=mirror_config.download_segment_size,
+        session=session,
+        logger=logger,
+    )
+    cache: ArtifactCache | None = build_cache(mirror_config, logger)
+    scratch_budget: ScratchBudget | None = build_scratch_budget(mirror_config)
+    metadata: BoshIoMetadataClient = build_metadata_client(mirror_config, logger, session)
+    checkpoints: CheckpointStore = build_checkpoints(mirror_config, logger)
+    return [
+        build_mirror(
+            azure_manager,
+            azure_config,
+            replace(mirror_config, mirror=key),
+            notifier,
+            logger,
+            downloader,
+            cache,
+            scratch_budget,
+            metadata,
+            checkpoints,
+        )
+        for key in keys
+    ]
+
+
+def run_mirrors(mirrors: list[BoshIoStemcellMirror], concurrency: int, logger: logging.Logger) -> list[str]:
+    """
+    Runs the mirrors on a thread pool, at most ``concurrency`` at once, or all at once if it is ``0``.
+
+    A failing mirror is logged and does not stop the others.
+
+    Returns:
+        list[str]: The names of the mirrors that failed.
+    """
+
+    def run(mirror: BoshIoStemcellMirror) -> None:
+        logger.info("Starting %s for mirror '%s'...", type(mirror).__name__, mirror.name)
+        mirror.run()
+        logger.info("Completed %s.", type(mirror).__name__)
+
+    failed: list[str] = []
+    with ThreadPoolExecutor(max_workers=concurrency or len(mirrors), thread_name_prefix="mirror") as executor:
+        futures: dict[Future, BoshIoStemcellMirror] = {executor.submit(run, mirror): mirror for mirror in mirrors}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception:
+                logger.exception("Mirror '%s' failed.", futures[future].name)
+                failed.append(futures[future].name)
+    return failed
+
+
 def main() -> int:
     logger = configure_logging()
 
@@ -66,17 +277,23 @@ def main() -> int:
         resource_group=azure_config.resource_group,
         location=azure_config.location,
         logger=logger,
+        uploader=build_uploader(azure_config, logger),
+        inventory_ttl=azure_config.gallery_inventory_ttl,
+        inventory_path=azure_config.gallery_inventory_file or None,
+        publishing_profile=build_publishing_profile(azure_config),
+        credential_type=azure_config.credential_type,
+        token_cache_path=azure_config.token_cache_file or None,
     )
     azure_manager.setup_storage(azure_config.storage_account_name, azure_config.storage_container)
 
-    notifier = configure_notifier(logger)
-
-    mirror = build_mirror(azure_manager, azure_config, mirror_config, notifier, logger)
-    mirror_name = type(mirror).__name__
+    session = build_http_session(mirror_config)
+    notifier = configure_notifier(logger, session)
 
-    logger.info("Starting %s for mirror '%s'...", mirror_name, mirror_config.mirror)
-    mirror.run()
-    logger.info("Completed %s.", mirror_name)
+    mirrors = build_mirrors(azure_manager, azure_config, mirror_config, notifier, logger, session)
+    failed = run_mirrors(mirrors, mirror_config.mirror_concurrency, logger)
+    if failed:
+        logger.error("%d of %d mirrors failed: %s", len(failed), len(mirrors), ", ".join(failed))
+        return 1
 
     return 0
 
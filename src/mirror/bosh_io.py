@@ -1,17 +1,126 @@
 import logging
+import operator
 import os
+import re
 import shutil
 import tarfile
 import tempfile
+import threading
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from contextlib import AbstractContextManager, ExitStack, nullcontext
+from dataclasses import dataclass, field
+from typing import IO
 
-import requests
 import yaml
 from semver.version import Version
 
 from ..azure_manager import AzureManager
 from ..notify.notifier import Notifier
+from ..sparse import load_content_digest, load_range_map
+from .cache import STAGE_DOWNLOADED, STAGE_EXTRACTED, ArtifactCache
+from .checkpoint import (
+    STAGE_NOTIFIED,
+    STAGE_PROVISIONED,
+    STAGE_REQUESTED,
+    STAGE_UPLOADED,
+    Checkpoint,
+    CheckpointStore,
+)
+from .download import Checksum, ChecksumMismatchError, RangedDownloader
+from .extract import (
+    MANIFEST_MEMBER,
+    VHD_MEMBER,
+    ExtractedStemcell,
+    ManifestHandler,
+    extract_stemcell,
+    walk_stemcell,
+)
+from .metadata import BoshIoMetadataClient, StemcellListing
+from .pipeline import Stage, run_pipeline
+from .scratch import ScratchBudget
 from .stemcell_mirror import StemcellMirror
 
+#: Download the stemcell tarball to disk, then extract it.
+TRANSFER_MODE_DOWNLOAD = "download"
+#: Extract the stemcell while it downloads, without writing the tarball to disk.
+TRANSFER_MODE_STREAM = "stream"
+#: Stream the VHD from the download straight into the page blob, without any scratch storage.
+TRANSFER_MODE_DIRECT = "direct"
+TRANSFER_MODES: tuple[str, ...] = (TRANSFER_MODE_DOWNLOAD, TRANSFER_MODE_STREAM, TRANSFER_MODE_DIRECT)
+
+STEMCELL_TARBALL = "stemcell.tgz"
+
+#: A comparison a stemcell version must satisfy, e.g. ``(operator.ge, Version(1, 600, 0))``.
+VersionConstraint = tuple[Callable[[Version, Version], bool], Version]
+_VERSION_OPERATORS: dict[str, Callable[[Version, Version], bool]] = {
+    ">=": operator.ge,
+    "<=": operator.le,
+    ">": operator.gt,
+    "<": operator.lt,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+_VERSION_CONSTRAINT = re.compile(r"^(>=|<=|>|<|==|!=)?\s*(\S+)$")
+
+#: Scratch space a stemcell needs per byte of its tarball, by transfer mode: the
+#: tarball itself when it is downloaded, plus the extracted VHD's data, which
+#: compresses about 3:1.
+SCRATCH_PER_TARBALL_BYTE: dict[str, int] = {
+    TRANSFER_MODE_DOWNLOAD: 4,
+    TRANSFER_MODE_STREAM: 3,
+    TRANSFER_MODE_DIRECT: 0,
+}
+
+
+@dataclass(frozen=True)
+class StemcellRelease:
+    """A stemcell version published on bosh.io."""
+
+    #: The version formatted as a gallery image version (``major.minor.patch``).
+    version: str
+    url: str
+    checksum: Checksum | None = None
+    #: The size of the stemcell tarball in bytes, if bosh.io lists it.
+    size: int | None = None
+
+    @property
+    def blob_name(self) -> str | None:
+        """A page blob name unique to this stemcell, so an interrupted upload of it can be resumed."""
+        if self.checksum is None:
+            return None
+        return f"bosh-stemcell-{self.version}-{self.checksum.hexdigest.lower()[:16]}.vhd"
+
+    @property
+    def digest(self) -> str | None:
+        """The published digest, e.g. ``sha256:ab12...``, that identifies this stemcell's content."""
+        if self.checksum is None:
+            return None
+        return f"{self.checksum.algorithm}:{self.checksum.hexdigest.lower()}"
+
+
+@dataclass
+class _MirrorJob:
+    """A stemcell on its way through the mirror pipeline, filled in by the stages."""
+
+    release: StemcellRelease
+    #: The stages earlier runs completed for the stemcell.
+    checkpoint: Checkpoint = field(default_factory=Checkpoint)
+    #: Scratch space and files claimed by the fetch stage, released once the VHD is uploaded.
+    resources: ExitStack = field(default_factory=ExitStack)
+    vhd_path: str = ""
+    blob_uri: str = ""
+    #: The size and sha256 of the VHD in ``blob_uri``, if known.
+    vhd_size: int | None = None
+    vhd_sha256: str | None = None
+    #: The blob was uploaded by an earlier run.
+    resumed: bool = False
+    manifest: bytes | None = None
+    #: The check or creation of the gallery image definition, started once the manifest is available.
+    gallery_image: Future | None = None
+    #: The creation of the gallery image version, resolved once it is provisioned.
+    provisioning: Future | None = None
+
 
 class BoshIoStemcellMirror(StemcellMirror):
     """Mirrors a bosh.io stemcell series to an Azure Compute Gallery.
@@ -19,7 +128,6 @@ class BoshIoStemcellMirror(StemcellMirror):
     Concrete subclasses declare the ``stemcell_series`` they are responsible for.
     """
 
-    STEMCELL_API_URL = "https://bosh.io/api/v1/stemcells/"
     stemcell_series: str = ""
 
     def __init__(
@@ -30,80 +138,511 @@ class BoshIoStemcellMirror(StemcellMirror):
         extraction_directory: str = "",
         notifier: Notifier | None = None,
         logger: logging.Logger | None = None,
+        downloader: RangedDownloader | None = None,
+        transfer_mode: str = TRANSFER_MODE_DOWNLOAD,
+        cache: ArtifactCache | None = None,
+        backfill_count: int = 1,
+        version_range: str | None = None,
+        scratch_budget: ScratchBudget | None = None,
+        fetch_workers: int = 1,
+        upload_workers: int = 1,
+        publish_workers: int = 1,
+        queue_size: int = 1,
+        wait_for_provisioning: bool = True,
+        metadata: BoshIoMetadataClient | None = None,
+        checkpoints: CheckpointStore | None = None,
     ) -> None:
         if not self.stemcell_series:
             raise ValueError("stemcell_series must be set by a subclass.")
+        if transfer_mode not in TRANSFER_MODES:
+            raise ValueError(
+                f"Unsupported transfer mode '{transfer_mode}'. Supported modes: {', '.join(TRANSFER_MODES)}"
+            )
+        if min(backfill_count, fetch_workers, upload_workers, publish_workers, queue_size) < 1:
+            raise ValueError("backfill_count, the pipeline workers and queue_size must be at least 1.")
+        self.version_constraints: list[VersionConstraint] = _parse_version_range(version_range)
+        self.version_range: str | None = version_range
         self.azure_manager: AzureManager = azure_manager
         self.gallery_name: str = gallery_name
         self.gallery_image_name: str = gallery_image_name or self.stemcell_series
         self.extraction_directory: str = extraction_directory
         self.notifier: Notifier | None = notifier
         self.logger: logging.Logger = logger or logging.getLogger(__name__)
+        self.downloader: RangedDownloader = downloader or RangedDownloader(logger=self.logger)
+        self.transfer_mode: str = transfer_mode
+        self.cache: ArtifactCache | None = cache
+        self.backfill_count: int = backfill_count
+        self.scratch_budget: ScratchBudget | None = scratch_budget
+        self.fetch_workers: int = fetch_workers
+        self.upload_workers: int = upload_workers
+        self.publish_workers: int = publish_workers
+        self.queue_size: int = queue_size
+        self.wait_for_provisioning: bool = wait_for_provisioning
+        self.metadata: BoshIoMetadataClient = metadata or BoshIoMetadataClient(logger=self.logger)
+        self.checkpoints: CheckpointStore = checkpoints or CheckpointStore(logger=self.logger)
+        # Checks the gallery image definition alongside the transfers of the pipeline, once per run.
+        self._control_plane: ThreadPoolExecutor | None = None
+        self._gallery_image: Future | None = None
+        self._gallery_image_lock = threading.Lock()
 
     def run(self) -> None:
         """
-        Mirrors the latest stemcell of this series to Azure.
+        Mirrors the latest stemcells of this series to Azure.
+
+        Checks bosh.io for the latest ``backfill_count`` stemcell versions within
+        the version range, and mirrors each one the gallery does not hold yet:
+        it is downloaded, its .vhd file extracted and uploaded to Azure storage,
+        and a new gallery image version is created in Azure. The versions move
+        through a pipeline of stages, within the scratch disk budget.
+
+        Each version resumes from the last stage an earlier run completed for
+        it: a version whose VHD was uploaded is published from that blob, and a
+        version whose gallery image version was requested is waited for and
+        announced, unless that already happened.
 
-        Checks bosh.io for the latest stemcell version, downloads it if it's a
-        new version, extracts the .vhd file, uploads it to Azure storage, and
-        creates a new gallery image version in Azure.
+        If the listing is unchanged since a run with the same selection mirrored
+        every version of it, the run ends without asking Azure.
         """
-        response: requests.Response = requests.get(f"{self.STEMCELL_API_URL}{self.stemcell_series}")
-        response.raise_for_status()
-        stemcells: list[dict] = response.json()
+        listing: StemcellListing = self.metadata.fetch(self.stemcell_series)
+        selection: str = self._selection()
+        if not listing.changed and listing.mirrored == selection:
+            self.logger.info("No new stemcell to upload; the bosh.io listing is unchanged since the last complete run.")
+            return
 
-        if not stemcells:
+        if not listing.stemcells:
             self.logger.info(f"No stemcells found for series '{self.stemcell_series}'.")
             return
 
-        latest_stemcell: dict = stemcells[0]
-        latest_version: str | None = latest_stemcell.get("version")
-        if not latest_version:
+        missing: list[_MirrorJob] = []
+        requested: list[_MirrorJob] = []
+        for release in self._select_releases(listing.stemcells):
+            job = _MirrorJob(
+                release, checkpoint=self.checkpoints.load(self.stemcell_series, release.version, release.digest)
+            )
+            if not self.azure_manager.gallery_image_version_exists(
+                self.gallery_name, self.gallery_image_name, release.version
+            ):
+                # Requested by an earlier run, but the creation failed or the version was deleted since.
+                self.checkpoints.rewind(self.stemcell_series, release.version, STAGE_UPLOADED)
+                missing.append(job)
+            elif self._is_announcement_pending(job.checkpoint):
+                requested.append(job)
+        if not missing and not requested:
+            self.logger.info("No new stemcell to upload.")
+            self.metadata.mark_mirrored(self.stemcell_series, selection)
+            return
+
+        self._mirror_releases(missing, requested)
+        if self.wait_for_provisioning:
+            self.metadata.mark_mirrored(self.stemcell_series, selection)
+
+    def _is_announcement_pending(self, checkpoint: Checkpoint) -> bool:
+        """Whether an earlier run requested the gallery image version, but did not wait for it to be announced."""
+        if not self.wait_for_provisioning or not checkpoint.reached(STAGE_REQUESTED):
+            return False
+        return not checkpoint.reached(STAGE_NOTIFIED if self.notifier else STAGE_PROVISIONED)
+
+    def _selection(self) -> str:
+        """Identifies the gallery image and the versions a run of this mirror selects from the listing."""
+        return f"{self.gallery_name}/{self.gallery_image_name}:{self.backfill_count}:{self.version_range or ''}"
+
+    def _select_releases(self, stemcells: list[dict]) -> list[StemcellRelease]:
+        """
+        Parses the newest ``backfill_count`` stemcells of the bosh.io listing that are within the version range.
+
+        The latest stemcell must be valid; older entries that are not are skipped.
+
+        Args:
+            stemcells (list[dict]): The bosh.io stemcell listing, newest first.
+
+        Returns:
+            list[StemcellRelease]: The selected stemcells, newest first.
+        """
+        releases: list[StemcellRelease] = []
+        for index, stemcell in enumerate(stemcells):
+            if len(releases) >= self.backfill_count:
+                break
+            try:
+                release: StemcellRelease = self._parse_release(stemcell)
+            except ValueError as e:
+                if index == 0:
+                    raise
+                self.logger.warning(f"Skipping stemcell {stemcell.get('version')}: {e}")
+                continue
+            if self._in_version_range(release.version):
+                releases.append(release)
+        return releases
+
+    def _in_version_range(self, version: str) -> bool:
+        parsed: Version = Version.parse(version)
+        return all(compare(parsed, bound) for compare, bound in self.version_constraints)
+
+    def _mirror_releases(self, jobs: list[_MirrorJob], requested: list[_MirrorJob] | None = None) -> None:
+        """
+        Mirrors the stemcells through a pipeline of fetch, upload and publish stages.
+
+        Each stage has its own workers, so while one stemcell uploads the next one
+        is already downloading and the previous one's gallery image version is
+        being created. In ``direct`` mode, fetching and uploading are one stage.
+        Unless ``wait_for_provisioning`` is off, the run then waits until the
+        gallery image versions are provisioned, together with the ``requested``
+        ones an earlier run started creating. A stemcell that fails to mirror
+        does not stop the others; the failures are raised once all stemcells
+        were attempted.
+        """
+        if len(jobs) > 1:
+            self.logger.info(f"Backfilling stemcell versions {', '.join(job.release.version for job in jobs)}.")
+        self._gallery_image = None
+        control_plane = ThreadPoolExecutor(max_workers=1, thread_name_prefix="control-plane")
+        self._control_plane = control_plane
+        try:
+            failures: list[tuple[_MirrorJob, Exception]] = run_pipeline(
+                jobs, self._stages(), queue_size=self.queue_size
+            )
+        finally:
+            self._control_plane = None
+            control_plane.shutdown(cancel_futures=True)
+        for job in requested or []:
+            self.logger.info(
+                f"Resuming stemcell version {job.release.version}; its gallery image version was requested."
+            )
+            job.provisioning = self.azure_manager.follow_gallery_image_version(
+                self.gallery_name, self.gallery_image_name, job.release.version
+            )
+        jobs = jobs + (requested or [])
+        failures += self._await_provisioning([job for job in jobs if job.provisioning is not None])
+        if len(jobs) == 1 and failures:
+            raise failures[0][1]
+        for job, error in failures:
+            self.logger.error(f"Failed to mirror stemcell version {job.release.version}: {error}")
+        if failures:
+            failed: list[str] = sorted(job.release.version for job, _ in failures)
+            raise RuntimeError(f"Failed to mirror stemcell versions: {', '.join(failed)}")
+
+    def _stages(self) -> list[Stage]:
+        publish: Stage = Stage("publish", self._publish, self.publish_workers)
+        if self.transfer_mode == TRANSFER_MODE_DIRECT:
+            return [Stage("transfer", self._transfer_direct, self.upload_workers), publish]
+        return [
+            Stage("fetch", self._fetch, self.fetch_workers),
+            Stage("upload", self._upload, self.upload_workers),
+            publish,
+        ]
+
+    def _fetch(self, job: _MirrorJob) -> None:
+        """Downloads and extracts the stemcell, starting the gallery image definition check on its manifest."""
+        if self._resume_upload(job):
+            return
+        with ExitStack() as resources:
+            resources.enter_context(self._reserve_scratch(job.release))
+            self._log_new_release(job.release)
+            job.vhd_path = self._stage_stemcell(
+                job.release, resources, lambda manifest: self._start_gallery_image_check(job, manifest)
+            )
+            if job.gallery_image is None:
+                # Extracted by an earlier run, or the stemcell has no manifest.
+                self._start_gallery_image_check(job, self._read_manifest(os.path.dirname(job.vhd_path)))
+            self._advance(job, STAGE_EXTRACTED)
+            # The scratch space and files stay claimed until the upload stage is done with them.
+            job.resources = resources.pop_all()
+
+    def _upload(self, job: _MirrorJob) -> None:
+        if job.blob_uri:
+            return
+        with job.resources:
+            job.vhd_size = os.path.getsize(job.vhd_path)
+            job.vhd_sha256 = load_content_digest(job.vhd_path)
+            job.blob_uri = self._upload_vhd(job.release, job.vhd_path)
+        self._advance(job, STAGE_UPLOADED)
+
+    def _transfer_direct(self, job: _MirrorJob) -> None:
+        if self._resume_upload(job):
+            return
+        with self._reserve_scratch(job.release):
+            self._log_new_release(job.release)
+            job.blob_uri, job.vhd_size = self._upload_stemcell_direct(
+                job.release, lambda manifest: self._start_gallery_image_check(job, manifest)
+            )
+        if job.gallery_image is None:
+            self._start_gallery_image_check(job, None)
+        self._advance(job, STAGE_UPLOADED)
+
+    def _resume_upload(self, job: _MirrorJob) -> bool:
+        """Picks up the VHD an earlier run uploaded, if its blob still holds it, skipping the transfer."""
+        checkpoint: Checkpoint = job.checkpoint
+        if not checkpoint.reached(STAGE_UPLOADED) or not checkpoint.blob_uri:
+            return False
+        if not self.azure_manager.holds_vhd(checkpoint.blob_uri, checkpoint.vhd_size, checkpoint.vhd_sha256):
+            self.logger.warning(
+                f"Blob {checkpoint.blob_uri} no longer holds the VHD of stemcell version {job.release.version}; "
+                "uploading it again."
+            )
+            self.checkpoints.rewind(self.stemcell_series, job.release.version, STAGE_EXTRACTED)
+            return False
+        self.logger.info(
+            f"Resuming stemcell version {job.release.version} from its uploaded VHD {checkpoint.blob_uri}."
+        )
+        job.blob_uri = checkpoint.blob_uri
+        job.vhd_size, job.vhd_sha256 = checkpoint.vhd_size, checkpoint.vhd_sha256
+        job.resumed = True
+        self._start_gallery_image_check(job, None if checkpoint.manifest is None else checkpoint.manifest.encode())
+        return True
+
+    def _advance(self, job: _MirrorJob, stage: str) -> None:
+        """Records that the stemcell completed ``stage``, with the blob and manifest once they are known."""
+        self.checkpoints.advance(
+            self.stemcell_series,
+            job.release.version,
+            stage,
+            blob_uri=job.blob_uri or None,
+            manifest=None if job.manifest is None else job.manifest.decode(errors="replace"),
+            vhd_size=job.vhd_size,
+            vhd_sha256=job.vhd_sha256,
+        )
+
+    def _publish(self, job: _MirrorJob) -> None:
+        """Starts creating the gallery image version from the uploaded VHD, once the image definition exists."""
+        if job.gallery_image is not None:
+            job.gallery_image.result()
+        self.logger.info(f"Creating new gallery image version {job.release.version}...")
+        # Recorded first: if the run ends before the version is listed, the next run finds it missing and rewinds.
+        self._advance(job, STAGE_REQUESTED)
+        job.provisioning = self.azure_manager.create_gallery_image_version(
+            self.gallery_name, self.gallery_image_name, job.release.version, job.blob_uri
+        )
+
+    def _await_provisioning(self, jobs: list[_MirrorJob]) -> list[tuple[_MirrorJob, Exception]]:
+        """
+        Waits until the gallery image versions are provisioned, notifying about each one as it becomes usable.
+
+        Returns:
+            list[tuple[_MirrorJob, Exception]]: The stemcells whose version failed to provision or to be announced.
+        """
+        if not jobs:
+            return []
+        if not self.wait_for_provisioning:
+            self.logger.info(
+                f"Not waiting for gallery image versions {', '.join(job.release.version for job in jobs)} "
+                "to be provisioned; no notifications are sent."
+            )
+            return []
+
+        failures: list[tuple[_MirrorJob, Exception]] = []
+        futures: dict[Future, _MirrorJob] = {job.provisioning: job for job in jobs if job.provisioning is not None}
+        for future in as_completed(futures):
+            job: _MirrorJob = futures[future]
+            try:
+                future.result()
+                self.logger.info("Completed vhd upload and gallery image version creation.")
+                self._advance(job, STAGE_PROVISIONED)
+                if self.notifier:
+                    self._notify_new_stemcell(job.release.version)
+                    self._advance(job, STAGE_NOTIFIED)
+            except Exception as e:
+                if job.resumed and not job.checkpoint.reached(STAGE_PROVISIONED):
+                    # The blob an earlier run uploaded may be what failed; the next run uploads the VHD again.
+                    self.checkpoints.rewind(self.stemcell_series, job.release.version, STAGE_EXTRACTED)
+                failures.append((job, e))
+        return failures
+
+    def _log_new_release(self, release: StemcellRelease) -> None:
+        self.logger.info(f"New stemcell version {release.version} found. Downloading...")
+        if release.checksum is None:
+            self.logger.warning(f"bosh.io lists no checksum for stemcell {release.version}; skipping verification.")
+
+    def _parse_release(self, stemcell: dict) -> StemcellRelease:
+        """
+        Parses a stemcell entry of the bosh.io API.
+
+        Args:
+            stemcell (dict): One element of the bosh.io stemcell listing.
+
+        Returns:
+            StemcellRelease: The version, download URL and checksum of the stemcell.
+        """
+        raw_version: str | None = stemcell.get("version")
+        if not raw_version:
             raise ValueError(f"Latest stemcell for series '{self.stemcell_series}' is missing a version.")
-        sc_version: Version = Version.parse(latest_version, optional_minor_and_patch=True)
-        formatted_latest_version: str = f"{sc_version.major}.{sc_version.minor}.{sc_version.patch}"
-        download_url: str | None = latest_stemcell.get("regular", {}).get("url")
+        sc_version: Version = Version.parse(raw_version, optional_minor_and_patch=True)
+        regular: dict = stemcell.get("regular", {})
+        download_url: str | None = regular.get("url")
         if not download_url:
             raise ValueError("Failed to find download URL for stemcell.")
 
-        version_exists: bool = self.azure_manager.gallery_image_version_exists(
-            self.gallery_name, self.gallery_image_name, formatted_latest_version
+        checksum: Checksum | None = None
+        for algorithm in ("sha256", "sha1"):
+            if regular.get(algorithm):
+                checksum = Checksum(algorithm, regular[algorithm])
+                break
+
+        size: int | None = regular.get("size")
+        return StemcellRelease(
+            version=f"{sc_version.major}.{sc_version.minor}.{sc_version.patch}",
+            url=download_url,
+            checksum=checksum,
+            size=size if isinstance(size, int) and size > 0 else None,
         )
-        if version_exists:
-            self.logger.info("No new stemcell to upload.")
+
+    def _reserve_scratch(self, release: StemcellRelease) -> AbstractContextManager:
+        """Reserves the stemcell's estimated scratch disk footprint; an unknown size reserves the whole budget."""
+        if self.scratch_budget is None:
+            return nullcontext()
+        size: int = self.scratch_budget.size if release.size is None else release.size
+        return self.scratch_budget.reserve(size * SCRATCH_PER_TARBALL_BYTE[self.transfer_mode])
+
+    def _stage_stemcell(
+        self, release: StemcellRelease, resources: ExitStack, on_manifest: ManifestHandler | None = None
+    ) -> str:
+        """
+        Extracts the stemcell to scratch storage, registering its cleanup with ``resources``.
+
+        If the artifact cache is enabled, the stemcell is extracted into its cache
+        entry, fetching only the stages that are missing, and is kept there after
+        the upload, so a retry can skip the download and extraction. Otherwise it
+        is extracted to a scratch directory that is removed after the upload,
+        or kept if it holds an interrupted download, which the next run resumes.
+
+        Args:
+            release (StemcellRelease): The stemcell to fetch.
+            resources (ExitStack): Collects the cleanup of the scratch storage.
+            on_manifest (ManifestHandler | None): Called with the manifest content if it is extracted.
+
+        Returns:
+            str: The path to the extracted VHD.
+        """
+        if self.cache is not None and release.checksum is not None:
+            entry: str = resources.enter_context(self.cache.use(release.checksum))
+            if not self.cache.is_marked(entry, STAGE_EXTRACTED):
+                return self._fetch_stemcell_to_cache(release, self.cache, entry, on_manifest)
+            self.logger.info(f"Using extracted stemcell from cache entry {entry}.")
+            return os.path.join(entry, VHD_MEMBER)
+
+        extracted_stemcell_dir: str = self._create_extraction_dir(release)
+        resources.callback(self._remove_extraction_dir, extracted_stemcell_dir)
+        vhd_path: str = self._fetch_stemcell(release, extracted_stemcell_dir, on_manifest)
+        if not os.path.exists(vhd_path):
+            raise FileNotFoundError("Failed to find root.vhd in stemcell image.")
+        return vhd_path
+
+    def _remove_extraction_dir(self, extracted_stemcell_dir: str) -> None:
+        if self.downloader.is_partial(os.path.join(extracted_stemcell_dir, STEMCELL_TARBALL)):
+            self.logger.info(f"Keeping the interrupted download in {extracted_stemcell_dir} for the next run.")
             return
+        self.logger.info(f"Cleaning up temp directory: {extracted_stemcell_dir}")
+        shutil.rmtree(extracted_stemcell_dir, ignore_errors=True)
 
-        self.logger.info(f"New stemcell version {formatted_latest_version} found. Downloading...")
-        extracted_stemcell_dir: str = self._create_extraction_dir()
-        try:
-            stemcell_path: str = self._download_stemcell(download_url, extracted_stemcell_dir)
-            vhd_path: str = self._extract_stemcell(stemcell_path)
+    def _fetch_stemcell_to_cache(
+        self, release: StemcellRelease, cache: ArtifactCache, entry: str, on_manifest: ManifestHandler | None = None
+    ) -> str:
+        """
+        Downloads and extracts the stemcell into its cache entry, reusing a cached tarball.
 
-            if not os.path.exists(vhd_path):
-                raise FileNotFoundError("Failed to find root.vhd in stemcell image.")
+        A partially downloaded tarball is resumed, and the entry is only marked
+        once each stage has completed.
 
-            cloud_properties: dict = self._read_cloud_properties(os.path.dirname(vhd_path))
+        Args:
+            release (StemcellRelease): The stemcell to fetch.
+            cache (ArtifactCache): The artifact cache.
+            entry (str): The cache entry of the stemcell.
+            on_manifest (ManifestHandler | None): Called with the manifest content once it is extracted.
 
-            self.logger.info("Checking gallery image definition.")
-            self.azure_manager.check_or_create_gallery_image(
-                self.stemcell_series, self.gallery_name, self.gallery_image_name, cloud_properties
-            )
+        Returns:
+            str: The path to the extracted VHD.
+        """
+        if cache.is_marked(entry, STAGE_DOWNLOADED):
+            self.logger.info(f"Using stemcell tarball from cache entry {entry}.")
+            vhd_path: str = self._extract_stemcell(os.path.join(entry, STEMCELL_TARBALL), on_manifest)
+        elif self.transfer_mode == TRANSFER_MODE_STREAM:
+            vhd_path = self._stream_stemcell(release, entry, on_manifest)
+        else:
+            self._download_stemcell(release, entry)
+            cache.mark(entry, STAGE_DOWNLOADED)
+            vhd_path = self._extract_stemcell(os.path.join(entry, STEMCELL_TARBALL), on_manifest)
+
+        if not os.path.exists(vhd_path):
+            raise FileNotFoundError("Failed to find root.vhd in stemcell image.")
+        cache.mark(entry, STAGE_EXTRACTED)
+        return vhd_path
+
+    def _upload_vhd(self, release: StemcellRelease, vhd_path: str) -> str:
+        self.logger.info("Uploading .vhd to Azure storage...")
+        return self.azure_manager.upload_vhd(
+            vhd_path,
+            load_range_map(vhd_path),
+            blob_name=release.blob_name,
+            content_digest=load_content_digest(vhd_path),
+        )
+
+    def _upload_stemcell_direct(
+        self, release: StemcellRelease, on_manifest: ManifestHandler | None = None
+    ) -> tuple[str, int]:
+        """
+        Streams the VHD from the downloading stemcell straight into a page blob.
+
+        Download, decompression and upload overlap, and nothing is written to the
+        scratch directory. The checksum is verified once the stream ends, before
+        the blob is used for a gallery image version; if it does not match, the
+        blob is deleted.
+
+        Args:
+            release (StemcellRelease): The stemcell to mirror.
+            on_manifest (ManifestHandler | None): Called with the manifest content, before the VHD is streamed.
+
+        Returns:
+            tuple[str, int]: The URI of the uploaded VHD blob, and the size of the VHD.
+        """
+        blobs: list[tuple[str, int]] = []
 
-            self.logger.info("Uploading .vhd to Azure storage...")
-            blob_uri: str = self.azure_manager.upload_vhd(vhd_path)
+        def read_manifest(stream: IO[bytes], member: tarfile.TarInfo) -> None:
+            content: bytes = stream.read()
+            if on_manifest is not None:
+                on_manifest(content)
 
-            self.logger.info(f"Creating new gallery image version {formatted_latest_version}...")
-            self.azure_manager.create_gallery_image_version(
-                self.gallery_name, self.gallery_image_name, formatted_latest_version, blob_uri
+        def upload_vhd(stream: IO[bytes], member: tarfile.TarInfo) -> None:
+            self.logger.info("Streaming .vhd to Azure storage...")
+            blobs.append(
+                (self.azure_manager.upload_vhd_stream(stream, member.size, blob_name=release.blob_name), member.size)
             )
 
-            self.logger.info("Completed vhd upload and gallery image version creation.")
+        try:
+            with self.downloader.stream(release.url, release.checksum) as body:
+                skipped_members: list[str] = walk_stemcell(
+                    body, {MANIFEST_MEMBER: read_manifest, VHD_MEMBER: upload_vhd}
+                )
+        except ChecksumMismatchError:
+            # The pages came from a corrupt download; a later run must not resume the blob.
+            if release.blob_name is not None:
+                self.azure_manager.delete_blob(release.blob_name)
+            raise
+        self._log_skipped_members(skipped_members)
+
+        if not blobs:
+            raise FileNotFoundError("Failed to find root.vhd in stemcell image.")
+
+        return blobs[0]
+
+    def _start_gallery_image_check(self, job: _MirrorJob, manifest_content: bytes | None) -> None:
+        """
+        Checks or creates the gallery image definition in the background, while the VHD is transferred.
 
-            if self.notifier:
-                self._notify_new_stemcell(formatted_latest_version)
-        finally:
-            self.logger.info(f"Cleaning up temp directory: {extracted_stemcell_dir}")
-            shutil.rmtree(extracted_stemcell_dir, ignore_errors=True)
+        The definition is checked once per run, from the first manifest that
+        is available, and every stemcell of the run waits for that check, so
+        concurrent fetches never race to create the same definition.
+        """
+        job.manifest = manifest_content
+        with self._gallery_image_lock:
+            if self._gallery_image is None:
+                if self._control_plane is None:
+                    raise RuntimeError("The gallery image definition can only be checked while stemcells are mirrored.")
+                cloud_properties: dict = self._parse_cloud_properties(manifest_content)
+                self._gallery_image = self._control_plane.submit(self._check_gallery_image, cloud_properties)
+            job.gallery_image = self._gallery_image
+
+    def _check_gallery_image(self, cloud_properties: dict) -> None:
+        self.logger.info("Checking gallery image definition.")
+        self.azure_manager.check_or_create_gallery_image(
+            self.stemcell_series, self.gallery_name, self.gallery_image_name, cloud_properties
+        )
 
     def _notify_new_stemcell(self, version: str) -> None:
         notifier = self.notifier
@@ -119,45 +658,88 @@ class BoshIoStemcellMirror(StemcellMirror):
         self.logger.info("Dispatching notifications for new stemcell version %s...", version)
         notifier.notify_new_stemcell(metadata)
 
-    def _download_stemcell(self, url: str, extract_path: str) -> str:
+    def _fetch_stemcell(
+        self, release: StemcellRelease, extract_path: str, on_manifest: ManifestHandler | None = None
+    ) -> str:
         """
-        Downloads the stemcell archive.
+        Downloads and extracts the stemcell according to the configured transfer mode.
 
         Args:
-            url (str): The URL to download the stemcell from.
-            extract_path (str): The directory to download the stemcell.
+            release (StemcellRelease): The stemcell to download.
+            extract_path (str): The directory to extract the stemcell to.
+            on_manifest (ManifestHandler | None): Called with the manifest content once it is extracted.
 
         Returns:
-            str: The path to the downloaded stemcell tarball.
+            str: The path to the extracted VHD.
         """
-        response: requests.Response = requests.get(url, stream=True)
-        tgz_path: str = os.path.join(extract_path, "stemcell.tgz")
+        if self.transfer_mode == TRANSFER_MODE_STREAM:
+            return self._stream_stemcell(release, extract_path, on_manifest)
 
-        with open(tgz_path, "wb") as temp_tgz:
-            for chunk in response.iter_content(chunk_size=8192):
-                temp_tgz.write(chunk)
+        stemcell_path: str = self._download_stemcell(release, extract_path)
+        return self._extract_stemcell(stemcell_path, on_manifest)
 
-        return tgz_path
+    def _stream_stemcell(
+        self, release: StemcellRelease, extract_path: str, on_manifest: ManifestHandler | None = None
+    ) -> str:
+        """
+        Extracts the stemcell straight from the download stream.
+
+        Only ``stemcell.MF`` and ``root.vhd`` are written to disk; the tarball and
+        the nested image tarball are never materialised. The checksum is computed
+        on the fly and verified when the stream ends.
+
+        Args:
+            release (StemcellRelease): The stemcell to download.
+            extract_path (str): The directory to extract the stemcell to.
+            on_manifest (ManifestHandler | None): Called with the manifest content once it is extracted.
 
-    def _extract_stemcell(self, stemcell_path: str) -> str:
+        Returns:
+            str: The path to the extracted VHD.
+        """
+        with self.downloader.stream(release.url, release.checksum) as body:
+            extracted: ExtractedStemcell = extract_stemcell(body, extract_path, on_manifest)
+        self._log_skipped_members(extracted.skipped_members)
+        return extracted.vhd_path
+
+    def _download_stemcell(self, release: StemcellRelease, extract_path: str) -> str:
+        """
+        Downloads and verifies the stemcell archive, fetching byte ranges in parallel when the origin supports it.
+
+        Args:
+            release (StemcellRelease): The stemcell to download.
+            extract_path (str): The directory to download the stemcell.
+
+        Returns:
+            str: The path to the downloaded stemcell tarball.
+        """
+        tgz_path: str = os.path.join(extract_path, STEMCELL_TARBALL)
+        return self.downloader.download(release.url, tgz_path, release.checksum)
+
+    def _extract_stemcell(self, stemcell_path: str, on_manifest: ManifestHandler | None = None) -> str:
         """
         Extracts the VHD from the stemcell tarball.
 
+        Only ``stemcell.MF`` and ``root.vhd`` are written to disk; every other member,
+        including the nested image tarball itself, is skipped. The VHD is written
+        as a sparse file, with its data ranges recorded next to it.
+
         Args:
             stemcell_path (str): The tarfile to extract the VHD from.
+            on_manifest (ManifestHandler | None): Called with the manifest content once it is extracted.
 
         Returns:
             str: The path to the extracted VHD.
         """
-        extract_path = os.path.dirname(stemcell_path)
-        with tarfile.open(stemcell_path, "r:gz") as tar:
-            tar.extractall(extract_path)
-
-        image_path: str = os.path.join(extract_path, "image")
-        with tarfile.open(image_path, "r:*") as image_tar:
-            image_tar.extractall(extract_path)
-
-        return os.path.join(extract_path, "root.vhd")
+        with open(stemcell_path, "rb") as stemcell:
+            extracted: ExtractedStemcell = extract_stemcell(stemcell, os.path.dirname(stemcell_path), on_manifest)
+        self._log_skipped_members(extracted.skipped_members)
+        return extracted.vhd_path
+
+    def _log_skipped_members(self, skipped_members: list[str]) -> None:
+        if skipped_members:
+            self.logger.info(
+                f"Skipped {len(skipped_members)} stemcell members not needed for Azure: {', '.join(skipped_members)}"
+            )
 
     def _read_cloud_properties(self, stemcell_dir: str) -> dict:
         """
@@ -169,13 +751,32 @@ class BoshIoStemcellMirror(StemcellMirror):
         Returns:
             Dict: The stemcell cloud properties, or an empty dict if unavailable.
         """
-        manifest_path: str = os.path.join(stemcell_dir, "stemcell.MF")
+        return self._parse_cloud_properties(self._read_manifest(stemcell_dir))
+
+    def _read_manifest(self, stemcell_dir: str) -> bytes | None:
+        """Reads the extracted stemcell.MF, or returns ``None`` if the stemcell has none."""
+        manifest_path: str = os.path.join(stemcell_dir, MANIFEST_MEMBER)
         if not os.path.exists(manifest_path):
+            return None
+
+        with open(manifest_path, "rb") as manifest_file:
+            return manifest_file.read()
+
+    def _parse_cloud_properties(self, manifest_content: bytes | None) -> dict:
+        """
+        Parses the cloud properties from the content of a stemcell.MF manifest.
+
+        Args:
+            manifest_content (bytes | None): The manifest content, or ``None`` if the stemcell has none.
+
+        Returns:
+            Dict: The stemcell cloud properties, or an empty dict if unavailable.
+        """
+        if manifest_content is None:
             self.logger.warning("stemcell.MF not found; proceeding without cloud properties.")
             return {}
 
-        with open(manifest_path) as manifest_file:
-            manifest = yaml.safe_load(manifest_file) or {}
+        manifest = yaml.safe_load(manifest_content) or {}
 
         cloud_properties = manifest.get("cloud_properties", {})
         if not isinstance(cloud_properties, dict):
@@ -184,25 +785,49 @@ class BoshIoStemcellMirror(StemcellMirror):
 
         return cloud_properties
 
-    def _create_extraction_dir(self) -> str:
+    def _create_extraction_dir(self, release: StemcellRelease) -> str:
         """
-        Creates a temporary directory for extracting the stemcell.
+        Creates a directory for downloading and extracting the stemcell.
 
-        If the mounted directory is available and writable, use it as the
-        temporary directory. Otherwise, create a new temporary directory.
+        If the mounted directory is available and writable, it is used. The
+        directory is then named after the stemcell's version and digest, so a
+        run restarted after an interrupted download finds that download and
+        resumes it. Otherwise, a new temporary directory is created.
+
+        Args:
+            release (StemcellRelease): The stemcell to extract.
 
         Returns:
-            str: The path to the temporary extraction directory.
+            str: The path to the extraction directory.
         """
         mount_dir = self.extraction_directory
         if mount_dir and os.path.exists(mount_dir) and os.access(mount_dir, os.W_OK):
             self.logger.info(f"Using mounted directory {mount_dir} for extraction.")
-            return tempfile.mkdtemp(prefix="stemcell-", dir=mount_dir)
+            if release.blob_name is None:
+                return tempfile.mkdtemp(prefix="stemcell-", dir=mount_dir)
+            extraction_dir: str = os.path.join(mount_dir, f"stemcell-{os.path.splitext(release.blob_name)[0]}")
+            os.makedirs(extraction_dir, exist_ok=True)
+            return extraction_dir
 
         self.logger.warning(f"'{mount_dir}' is not writable or does not exist. Falling back to system temp.")
         return tempfile.mkdtemp(prefix="stemcell-")
 
 
+def _parse_version_range(version_range: str | None) -> list[VersionConstraint]:
+    """Parses comma-separated version constraints such as ``>=1.600,<1.700``; a bare version means ``==``."""
+    constraints: list[VersionConstraint] = []
+    for constraint in filter(None, (part.strip() for part in (version_range or "").split(","))):
+        match: re.Match[str] | None = _VERSION_CONSTRAINT.match(constraint)
+        if match is None:
+            raise ValueError(f"Invalid version constraint '{constraint}'.")
+        try:
+            bound: Version = Version.parse(match.group(2), optional_minor_and_patch=True)
+        except ValueError:
+            raise ValueError(f"Invalid version constraint '{constraint}'.") from None
+        constraints.append((_VERSION_OPERATORS[match.group(1) or "=="], bound))
+    return constraints
+
+
 class BoshIoJammyMirror(BoshIoStemcellMirror):
     """Mirrors the Ubuntu Jammy (22.04) bosh.io Azure stemcell."""
 
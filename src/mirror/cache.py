@@ -0,0 +1,125 @@
+import logging
+import os
+import shutil
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from .download import Checksum
+
+#: The stemcell tarball was downloaded and its digest verified.
+STAGE_DOWNLOADED = "downloaded"
+#: ``stemcell.MF`` and ``root.vhd`` were extracted completely.
+STAGE_EXTRACTED = "extracted"
+
+
+class ArtifactCache:
+    """A size-bounded cache of stemcell artifacts, keyed by the stemcell's published digest.
+
+    Each entry is a directory named after the digest that holds the downloaded
+    tarball and the extracted files, together with marker files recording the
+    stages that completed. Since the key is the digest of the content, an entry
+    can be reused by any later run that mirrors the same stemcell. Entries are
+    evicted least recently used first once the cache grows beyond ``max_size``,
+    except for entries that are in use by any mirror sharing the cache.
+    """
+
+    def __init__(self, directory: str, max_size: int, logger: logging.Logger | None = None) -> None:
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1 byte.")
+        self.directory: str = directory
+        self.max_size: int = max_size
+        self.logger: logging.Logger = logger or logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._in_use: dict[str, int] = {}
+
+    def entry(self, checksum: Checksum) -> str:
+        """
+        Returns the directory for a stemcell, creating it if needed and marking it as recently used.
+
+        Args:
+            checksum (Checksum): The published digest of the stemcell.
+
+        Returns:
+            str: The path to the cache entry.
+        """
+        path: str = os.path.join(self.directory, f"{checksum.algorithm}-{checksum.hexdigest.lower()}")
+        os.makedirs(path, exist_ok=True)
+        os.utime(path)
+        return path
+
+    @contextmanager
+    def use(self, checksum: Checksum) -> Iterator[str]:
+        """
+        Yields the entry for a stemcell, protecting it from eviction until the block exits.
+
+        Once the block exits, the cache is trimmed to ``max_size``, keeping this entry.
+
+        Args:
+            checksum (Checksum): The published digest of the stemcell.
+        """
+        entry: str = self.entry(checksum)
+        with self._lock:
+            self._in_use[entry] = self._in_use.get(entry, 0) + 1
+        try:
+            yield entry
+        finally:
+            with self._lock:
+                self._in_use[entry] -= 1
+                if not self._in_use[entry]:
+                    del self._in_use[entry]
+            self.evict(keep=entry)
+
+    def is_marked(self, entry: str, stage: str) -> bool:
+        return os.path.exists(_marker_path(entry, stage))
+
+    def mark(self, entry: str, stage: str) -> None:
+        """Records that ``stage`` completed for ``entry``; call only once its files are fully written."""
+        with open(_marker_path(entry, stage), "w"):
+            pass
+
+    def evict(self, keep: str | None = None) -> None:
+        """
+        Removes the least recently used entries until the cache fits within ``max_size``.
+
+        Args:
+            keep (str | None): An entry that is in use and must not be removed.
+        """
+        if not os.path.isdir(self.directory):
+            return
+        with self._lock:
+            in_use: set[str] = set(self._in_use)
+        entries: list[tuple[float, int, str]] = []
+        for name in os.listdir(self.directory):
+            path: str = os.path.join(self.directory, name)
+            if os.path.isdir(path):
+                entries.append((os.stat(path).st_mtime, _disk_usage(path), path))
+
+        total: int = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            if path in in_use or (keep is not None and os.path.samefile(path, keep)):
+                continue
+            self.logger.info(f"Evicting cached stemcell {os.path.basename(path)} ({size} bytes).")
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+        if total > self.max_size:
+            self.logger.warning(f"Stemcell cache holds {total} bytes, more than its limit of {self.max_size} bytes.")
+
+
+def _marker_path(entry: str, stage: str) -> str:
+    return os.path.join(entry, f".{stage}")
+
+
+def _disk_usage(path: str) -> int:
+    """Returns the bytes allocated below ``path``, so sparse VHDs count only their data."""
+    usage: int = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                usage += os.lstat(os.path.join(root, name)).st_blocks * 512
+            except FileNotFoundError:
+                pass
+    return usage
@@ -0,0 +1,151 @@
+import logging
+import threading
+from dataclasses import asdict, dataclass
+
+from ..state_file import load_state, save_state
+from .cache import STAGE_EXTRACTED
+
+#: The VHD was uploaded to its page blob.
+STAGE_UPLOADED = "uploaded"
+#: The creation of the gallery image version was requested.
+STAGE_REQUESTED = "requested"
+#: The gallery image version was provisioned.
+STAGE_PROVISIONED = "provisioned"
+#: The notifications about the new version were sent.
+STAGE_NOTIFIED = "notified"
+#: The stages a stemcell version goes through, in order. A finished download is not a stage: only the
+#: artifact cache keeps the tarball, and it tracks that itself.
+STAGES: tuple[str, ...] = (
+    STAGE_EXTRACTED,
+    STAGE_UPLOADED,
+    STAGE_REQUESTED,
+    STAGE_PROVISIONED,
+    STAGE_NOTIFIED,
+)
+
+
+@dataclass
+class Checkpoint:
+    """How far a stemcell version got through the mirror."""
+
+    #: The published digest of the stemcell, e.g. ``sha256:ab12...``.
+    digest: str | None = None
+    #: The last stage that completed, if any.
+    stage: str | None = None
+    blob_uri: str | None = None
+    #: The size and sha256 of the uploaded VHD, if known, to check that the blob still holds it.
+    vhd_size: int | None = None
+    vhd_sha256: str | None = None
+    #: The content of ``stemcell.MF``, so the gallery image definition can be checked without the stemcell.
+    manifest: str | None = None
+
+    def reached(self, stage: str) -> bool:
+        return self.stage is not None and STAGES.index(self.stage) >= STAGES.index(stage)
+
+
+class CheckpointStore:
+    """Records the stages each stemcell version completed, so an interrupted run can be resumed.
+
+    A checkpoint belongs to the stemcell with the published digest it was
+    started for; if bosh.io republishes a version with a different digest, it
+    starts over. Versions without a published digest are tracked for the
+    current run only. If ``path`` is set, the checkpoints are saved there after
+    every stage and read by later runs. The store is safe to share between
+    mirrors.
+    """
+
+    def __init__(self, path: str | None = None, logger: logging.Logger | None = None) -> None:
+        self.path: str | None = path
+        self.logger: logging.Logger = logger or logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._checkpoints: dict[str, dict[str, Checkpoint]] | None = None
+
+    def load(self, series: str, version: str, digest: str | None) -> Checkpoint:
+        """
+        Returns the checkpoint of a stemcell version, starting a new one unless one was recorded for ``digest``.
+
+        Args:
+            series (str): The stemcell series.
+            version (str): The stemcell version.
+            digest (str | None): The published digest of the stemcell, if any.
+
+        Returns:
+            Checkpoint: The checkpoint, which ``advance`` and ``rewind`` update.
+        """
+        with self._lock:
+            versions: dict[str, Checkpoint] = self._load().setdefault(series, {})
+            checkpoint: Checkpoint | None = versions.get(version)
+            if checkpoint is None or digest is None or checkpoint.digest != digest:
+                checkpoint = versions[version] = Checkpoint(digest=digest)
+            return checkpoint
+
+    def advance(
+        self,
+        series: str,
+        version: str,
+        stage: str,
+        blob_uri: str | None = None,
+        manifest: str | None = None,
+        vhd_size: int | None = None,
+        vhd_sha256: str | None = None,
+    ) -> None:
+        """Records that ``stage`` completed for a loaded stemcell version, along with the given details."""
+        with self._lock:
+            checkpoint: Checkpoint = self._load()[series][version]
+            if not checkpoint.reached(stage):
+                checkpoint.stage = stage
+            if blob_uri is not None:
+                checkpoint.blob_uri = blob_uri
+                checkpoint.vhd_size = vhd_size
+                checkpoint.vhd_sha256 = vhd_sha256
+            if manifest is not None:
+                checkpoint.manifest = manifest
+            self._save()
+
+    def rewind(self, series: str, version: str, stage: str) -> None:
+        """
+        Moves a loaded stemcell version back to ``stage``, e.g. when its gallery image version disappeared.
+
+        Moving it back before ``uploaded`` also forgets its blob.
+        """
+        with self._lock:
+            checkpoint: Checkpoint = self._load()[series][version]
+            if checkpoint.reached(stage):
+                checkpoint.stage = stage
+                if not checkpoint.reached(STAGE_UPLOADED):
+                    checkpoint.blob_uri = checkpoint.vhd_size = checkpoint.vhd_sha256 = None
+                self._save()
+
+    def _load(self) -> dict[str, dict[str, Checkpoint]]:
+        if self._checkpoints is not None:
+            return self._checkpoints
+        self._checkpoints = {}
+        if not self.path:
+            return self._checkpoints
+        for series, versions in load_state(self.path, "checkpoints", self.logger).items():
+            self._checkpoints[series] = {
+                version: Checkpoint(
+                    digest=checkpoint["digest"],
+                    stage=checkpoint["stage"] if checkpoint["stage"] in STAGES else None,
+                    blob_uri=checkpoint.get("blob_uri"),
+                    vhd_size=checkpoint.get("vhd_size"),
+                    vhd_sha256=checkpoint.get("vhd_sha256"),
+                    manifest=checkpoint.get("manifest"),
+                )
+                for version, checkpoint in versions.items()
+            }
+        return self._checkpoints
+
+    def _save(self) -> None:
+        if not self.path or self._checkpoints is None:
+            return
+        content: dict[str, dict] = {}
+        for series, versions in self._checkpoints.items():
+            recorded: dict[str, dict] = {
+                version: asdict(checkpoint)
+                for version, checkpoint in versions.items()
+                if checkpoint.digest is not None and checkpoint.stage is not None
+            }
+            if recorded:
+                content[series] = recorded
+        save_state(self.path, content, "checkpoints", self.logger)
@@ -0,0 +1,330 @@
+import hashlib
+import json
+import logging
+import os
+from collections.abc import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import IO, Any
+
+import requests
+
+from ..http_session import REQUEST_TIMEOUT
+
+DEFAULT_DOWNLOAD_WORKERS = 8
+DEFAULT_SEGMENT_SIZE = 1024 * 1024 * 64  # 64 MiB
+CHUNK_SIZE = 1024 * 1024  # 1 MiB
+
+
+class DownloadError(RuntimeError):
+    """Raised when a download cannot be completed."""
+
+
+class ChecksumMismatchError(DownloadError):
+    """Raised when downloaded content does not match its published digest."""
+
+
+@dataclass(frozen=True)
+class Checksum:
+    """A published content digest, e.g. the sha256 bosh.io lists for a stemcell."""
+
+    algorithm: str
+    hexdigest: str
+
+    def new(self) -> Any:
+        return hashlib.new(self.algorithm)
+
+    def verify(self, hasher: Any, source: str) -> None:
+        """Raises ``ChecksumMismatchError`` unless ``hasher`` produced the expected digest."""
+        actual: str = hasher.hexdigest()
+        if actual != self.hexdigest.lower():
+            raise ChecksumMismatchError(
+                f"{self.algorithm} mismatch for {source}: expected {self.hexdigest.lower()}, got {actual}."
+            )
+
+
+class ChecksumReader:
+    """Wraps a readable stream and hashes everything read through it."""
+
+    def __init__(self, stream: IO[bytes], checksum: Checksum) -> None:
+        self._stream: IO[bytes] = stream
+        self._checksum: Checksum = checksum
+        self._hasher: Any = checksum.new()
+
+    def read(self, size: int = -1) -> bytes:
+        data: bytes = self._stream.read(size)
+        self._hasher.update(data)
+        return data
+
+    def verify(self, source: str) -> None:
+        """Reads the stream to its end, since consumers may stop early, and checks the digest."""
+        while self.read(CHUNK_SIZE):
+            pass
+        self._checksum.verify(self._hasher, source)
+
+
+class RangedDownloader:
+    """Downloads a file as parallel HTTP Range segments into a preallocated file.
+
+    Progress is recorded in a ``<path>.parts`` sidecar, so an interrupted download
+    only fetches the missing segments on the next attempt. Origins that do not
+    support range requests fall back to a single streamed GET.
+    """
+
+    def __init__(
+        self,
+        workers: int = DEFAULT_DOWNLOAD_WORKERS,
+        segment_size: int = DEFAULT_SEGMENT_SIZE,
+        session: Any = None,
+        logger: logging.Logger | None = None,
+    ) -> None:
+        if workers < 1:
+            raise ValueError("workers must be at least 1.")
+        if segment_size < 1:
+            raise ValueError("segment_size must be at least 1 byte.")
+        self.workers: int = workers
+        self.segment_size: int = segment_size
+        # Anything exposing requests' ``head``/``get`` API, e.g. a requests.Session.
+        self._http: Any = session or requests
+        self.logger: logging.Logger = logger or logging.getLogger(__name__)
+
+    def download(self, url: str, path: str, checksum: Checksum | None = None) -> str:
+        """
+        Downloads ``url`` to ``path``, resuming a previous partial download if possible.
+
+        If a checksum is given, the digest is computed while the download is in
+        progress and a mismatching file is removed.
+
+        Args:
+            url (str): The URL to download.
+            path (str): The destination file path.
+            checksum (Checksum | None): The expected digest of the content.
+
+        Returns:
+            str: The path to the downloaded file.
+
+        Raises:
+            ChecksumMismatchError: If the downloaded content does not match ``checksum``.
+        """
+        size: int | None = self._probe(url)
+        if size is None:
+            self.logger.info("Origin does not support range requests; downloading as a single stream.")
+            hasher: Any = self._download_stream(url, path, checksum)
+        else:
+            hasher = self._download_ranges(url, path, size, checksum)
+
+        if checksum is not None:
+            try:
+                checksum.verify(hasher, url)
+            except ChecksumMismatchError:
+                os.remove(path)
+                raise
+            self.logger.info(f"Verified {checksum.algorithm} of {os.path.basename(path)}.")
+        return path
+
+    @contextmanager
+    def stream(self, url: str, checksum: Checksum | None = None) -> Iterator[IO[bytes] | ChecksumReader]:
+        """
+        Streams the body of ``url`` to a sequential consumer, verifying its digest at the end.
+
+        The digest is computed as the consumer reads. When the ``with`` block exits
+        normally, the rest of the body is drained and the digest is checked.
+
+        Args:
+            url (str): The URL to stream.
+            checksum (Checksum | None): The expected digest of the content.
+
+        Yields:
+            IO[bytes] | ChecksumReader: The response body.
+
+        Raises:
+            ChecksumMismatchError: If the streamed content does not match ``checksum``.
+        """
+        with self.open(url) as response:
+            if checksum is None:
+                yield response.raw
+                return
+            reader = ChecksumReader(response.raw, checksum)
+            yield reader
+            reader.verify(url)
+            self.logger.info(f"Verified {checksum.algorithm} of streamed download.")
+
+    def open(self, url: str) -> requests.Response:
+        """
+        Opens ``url`` as a single streamed response for consumers that read it sequentially.
+
+        Args:
+            url (str): The URL to stream.
+
+        Returns:
+            requests.Response: The response; its ``raw`` attribute yields the decoded body.
+        """
+        response: requests.Response = self._http.get(url, stream=True, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        response.raw.decode_content = True
+        return response
+
+    def _probe(self, url: str) -> int | None:
+        """Returns the content length if the origin serves byte ranges, otherwise ``None``."""
+        response: requests.Response = self._http.head(url, allow_redirects=True, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        if response.headers.get("Accept-Ranges", "").lower() != "bytes":
+            return None
+        content_length: str = response.headers.get("Content-Length", "")
+        if not content_length.isdigit() or int(content_length) == 0:
+            return None
+        return int(content_length)
+
+    def _download_stream(self, url: str, path: str, checksum: Checksum | None) -> Any:
+        hasher: Any = checksum.new() if checksum else None
+        response: requests.Response = self.open(url)
+        with response, open(path, "wb") as target:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                target.write(chunk)
+                if hasher is not None:
+                    hasher.update(chunk)
+        self._remove_sidecar(path)
+        return hasher
+
+    def _download_ranges(self, url: str, path: str, size: int, checksum: Checksum | None) -> Any:
+        segment_count: int = -(-size // self.segment_size)
+        completed: set[int] = self._load_progress(url, path, size)
+        pending: list[int] = [index for index in range(segment_count) if index not in completed]
+        if completed:
+            self.logger.info(f"Resuming download: {len(completed)} of {segment_count} segments already present.")
+        else:
+            self.logger.info(f"Downloading {size} bytes in {segment_count} segments with {self.workers} workers.")
+
+        fd: int = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        hash_cursor = _SegmentHasher(fd, size, self.segment_size, checksum) if checksum else None
+        try:
+            _preallocate(fd, size)
+            self._save_progress(url, path, size, completed)
+            if hash_cursor is not None:
+                hash_cursor.advance(completed)
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures: list[Future] = [
+                    executor.submit(self._fetch_segment, url, fd, index, size) for index in pending
+                ]
+                try:
+                    for future in as_completed(futures):
+                        completed.add(future.result())
+                        self._save_progress(url, path, size, completed)
+                        if hash_cursor is not None:
+                            hash_cursor.advance(completed)
+                except BaseException:
+                    for future in futures:
+                        future.cancel()
+                    raise
+        finally:
+            os.close(fd)
+
+        self._remove_sidecar(path)
+        return hash_cursor.hasher if hash_cursor is not None else None
+
+    def _fetch_segment(self, url: str, fd: int, index: int, size: int) -> int:
+        start: int = index * self.segment_size
+        end: int = min(start + self.segment_size, size) - 1
+        response: requests.Response = self._http.get(
+            url, headers={"Range": f"bytes={start}-{end}"}, stream=True, timeout=REQUEST_TIMEOUT
+        )
+        response.raise_for_status()
+        if response.status_code != 206:
+            raise DownloadError(f"Origin ignored range request for segment {index} (status {response.status_code}).")
+
+        offset: int = start
+        with response:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if offset + len(chunk) > end + 1:
+                    raise DownloadError(f"Segment {index} returned more data than requested.")
+                os.pwrite(fd, chunk, offset)
+                offset += len(chunk)
+
+        if offset != end + 1:
+            raise DownloadError(f"Segment {index} ended early at byte {offset} (expected {end + 1}).")
+        return index
+
+    def _load_progress(self, url: str, path: str, size: int) -> set[int]:
+        """Reads completed segments from the sidecar if it matches this download."""
+        sidecar: str = _sidecar_path(path)
+        if not os.path.exists(sidecar) or not os.path.exists(path):
+            return set()
+        try:
+            with open(sidecar) as progress_file:
+                progress: dict = json.load(progress_file)
+        except ValueError:
+            self.logger.warning(f"Ignoring unreadable download progress file {sidecar}.")
+            return set()
+
+        if (
+            progress.get("url") != url
+            or progress.get("size") != size
+            or progress.get("segment_size") != self.segment_size
+        ):
+            self.logger.info("Download progress file does not match this download; starting over.")
+            return set()
+        return {int(index) for index in progress.get("completed", [])}
+
+    def _save_progress(self, url: str, path: str, size: int, completed: set[int]) -> None:
+        sidecar: str = _sidecar_path(path)
+        progress: dict = {
+            "url": url,
+            "size": size,
+            "segment_size": self.segment_size,
+            "completed": sorted(completed),
+        }
+        with open(f"{sidecar}.tmp", "w") as progress_file:
+            json.dump(progress, progress_file)
+        os.replace(f"{sidecar}.tmp", sidecar)
+
+    def is_partial(self, path: str) -> bool:
+        """Whether ``path`` holds an interrupted download that a later ``download`` to it resumes."""
+        return os.path.exists(path) and os.path.exists(_sidecar_path(path))
+
+    def _remove_sidecar(self, path: str) -> None:
+        try:
+            os.remove(_sidecar_path(path))
+        except FileNotFoundError:
+            pass
+
+
+class _SegmentHasher:
+    """Hashes a ranged download in file order while later segments are still downloading.
+
+    Segments complete out of order, so the digest advances over the contiguous
+    prefix of completed segments, reading each one back while it is still in
+    the page cache.
+    """
+
+    def __init__(self, fd: int, size: int, segment_size: int, checksum: Checksum) -> None:
+        self._fd: int = fd
+        self._size: int = size
+        self._segment_size: int = segment_size
+        self._next_segment: int = 0
+        self.hasher: Any = checksum.new()
+
+    def advance(self, completed: set[int]) -> None:
+        while self._next_segment in completed:
+            start: int = self._next_segment * self._segment_size
+            end: int = min(start + self._segment_size, self._size)
+            for offset in range(start, end, CHUNK_SIZE):
+                self.hasher.update(os.pread(self._fd, min(CHUNK_SIZE, end - offset), offset))
+            self._next_segment += 1
+
+
+def _sidecar_path(path: str) -> str:
+    return f"{path}.parts"
+
+
+def _preallocate(fd: int, size: int) -> None:
+    """Sizes the file to ``size`` bytes, reserving the space where the filesystem supports it."""
+    if os.fstat(fd).st_size == size:
+        return
+    os.ftruncate(fd, size)
+    if hasattr(os, "posix_fallocate"):
+        try:
+            os.posix_fallocate(fd, 0, size)
+        except OSError:
+            # Network filesystems such as Azure Files may not support fallocate.
+            pass
@@ -0,0 +1,144 @@
+import os
+import shutil
+import tarfile
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import IO
+
+from ..sparse import write_sparse
+
+IMAGE_MEMBER = "image"
+MANIFEST_MEMBER = "stemcell.MF"
+VHD_MEMBER = "root.vhd"
+COPY_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+
+#: Called with a readable stream of the member's content and its tar header.
+MemberHandler = Callable[[IO[bytes], tarfile.TarInfo], None]
+#: Called with the content of ``stemcell.MF`` as soon as it has been extracted.
+ManifestHandler = Callable[[bytes], None]
+
+
+class ExtractionError(ValueError):
+    """Raised when a stemcell tarball does not have the expected layout."""
+
+
+@dataclass(frozen=True)
+class ExtractedStemcell:
+    """The files written by ``extract_stemcell``."""
+
+    vhd_path: str
+    #: Names of the members that were not needed and therefore not written to disk.
+    skipped_members: list[str] = field(default_factory=list)
+
+
+def walk_stemcell(fileobj: IO[bytes], handlers: dict[str, MemberHandler]) -> list[str]:
+    """
+    Streams a stemcell tarball and hands the wanted members to their handlers.
+
+    The outer tarball and the nested ``image`` tarball are read strictly
+    sequentially, so ``fileobj`` may be a non-seekable stream such as an HTTP
+    response body. Members of both archives are matched by name against
+    ``handlers``; a handler must consume its stream before returning. All other
+    members are skipped without being written anywhere, and member names are
+    never used to build file paths.
+
+    Args:
+        fileobj (IO[bytes]): The gzip-compressed stemcell tarball.
+        handlers (dict[str, MemberHandler]): Handlers keyed by member name.
+
+    Returns:
+        list[str]: The names of the skipped members; those of the image tarball are prefixed with ``image/``.
+
+    Raises:
+        ExtractionError: If a wanted member is not a regular file or appears more than once.
+    """
+    skipped: list[str] = []
+    seen: set[str] = set()
+    with tarfile.open(fileobj=fileobj, mode="r|gz") as stemcell_tar:
+        for member in stemcell_tar:
+            name: str = _member_name(member)
+            if name != IMAGE_MEMBER:
+                _dispatch(stemcell_tar, member, handlers, seen, skipped, "")
+                continue
+            image: IO[bytes] | None = stemcell_tar.extractfile(member) if member.isfile() else None
+            if image is None:
+                raise ExtractionError(f"Stemcell member '{member.name}' is not a regular file.")
+            with tarfile.open(fileobj=image, mode="r|*") as image_tar:
+                for image_member in image_tar:
+                    _dispatch(image_tar, image_member, handlers, seen, skipped, f"{IMAGE_MEMBER}/")
+    return skipped
+
+
+def extract_stemcell(
+    fileobj: IO[bytes], extract_path: str, on_manifest: ManifestHandler | None = None
+) -> ExtractedStemcell:
+    """
+    Extracts ``stemcell.MF`` and ``root.vhd`` from a stemcell tarball stream.
+
+    The VHD is written as a sparse file and its data ranges are recorded in a
+    ``root.vhd.map`` sidecar (see ``src.sparse.load_range_map``). No other
+    member is written to disk.
+
+    Args:
+        fileobj (IO[bytes]): The gzip-compressed stemcell tarball.
+        extract_path (str): The directory to write the extracted files to.
+        on_manifest (ManifestHandler | None): Called with the manifest content once it is written. That
+            is before the VHD only if the tarball lists the manifest before the image; otherwise it is after.
+
+    Returns:
+        ExtractedStemcell: The path to the extracted VHD and the skipped members.
+    """
+    skipped: list[str] = walk_stemcell(
+        fileobj,
+        {
+            MANIFEST_MEMBER: _write_manifest_to(os.path.join(extract_path, MANIFEST_MEMBER), on_manifest),
+            VHD_MEMBER: _write_sparse_to(os.path.join(extract_path, VHD_MEMBER)),
+        },
+    )
+    return ExtractedStemcell(vhd_path=os.path.join(extract_path, VHD_MEMBER), skipped_members=skipped)
+
+
+def _dispatch(
+    tar: tarfile.TarFile,
+    member: tarfile.TarInfo,
+    handlers: dict[str, MemberHandler],
+    seen: set[str],
+    skipped: list[str],
+    prefix: str,
+) -> None:
+    name: str = _member_name(member)
+    handler: MemberHandler | None = handlers.get(name)
+    if handler is None:
+        if not member.isdir():
+            skipped.append(f"{prefix}{name}")
+        return
+    if not member.isfile():
+        raise ExtractionError(f"Stemcell member '{member.name}' is not a regular file.")
+    if name in seen:
+        raise ExtractionError(f"Stemcell contains more than one '{name}' member.")
+    seen.add(name)
+    stream: IO[bytes] | None = tar.extractfile(member)
+    if stream is not None:
+        handler(stream, member)
+
+
+def _member_name(member: tarfile.TarInfo) -> str:
+    return os.path.normpath(member.name)
+
+
+def _write_manifest_to(path: str, on_manifest: ManifestHandler | None) -> MemberHandler:
+    def write(stream: IO[bytes], member: tarfile.TarInfo) -> None:
+        with open(path, "wb") as target:
+            shutil.copyfileobj(stream, target, COPY_CHUNK_SIZE)
+        if on_manifest is not None:
+            with open(path, "rb") as manifest:
+                on_manifest(manifest.read())
+
+    return write
+
+
+def _write_sparse_to(path: str) -> MemberHandler:
+    def write(stream: IO[bytes], member: tarfile.TarInfo) -> None:
+        write_sparse(stream, path)
+
+    return write
@@ -0,0 +1,214 @@
+import codecs
+import hashlib
+import itertools
+import json
+import logging
+import threading
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from typing import Any
+
+import requests
+
+from ..http_session import REQUEST_TIMEOUT
+from ..state_file import load_state, save_state
+
+STEMCELL_API_URL = "https://bosh.io/api/v1/stemcells/"
+LISTING_CHUNK_SIZE = 64 * 1024
+#: The fields of a bosh.io stemcell entry, and of its ``regular`` tarball, that the index keeps.
+_ENTRY_FIELDS = ("version",)
+_TARBALL_FIELDS = ("url", "size", "sha1", "sha256")
+
+
+@dataclass
+class StemcellListing:
+    """The stemcells bosh.io lists for a series, in compact form, newest first."""
+
+    stemcells: list[dict] = field(default_factory=list)
+    etag: str | None = None
+    last_modified: str | None = None
+    #: The sha256 of the listing as bosh.io served it.
+    digest: str | None = None
+    #: Whether the listing differs from the one in the index.
+    changed: bool = True
+    #: The selection of versions a run completely mirrored from this listing, if any; see ``mark_mirrored``.
+    mirrored: str | None = None
+
+
+class BoshIoMetadataClient:
+    """Fetches bosh.io stemcell listings, keeping a compact index of them.
+
+    The listing covers every version ever published, so it is read as a
+    stream, one stemcell entry at a time, keeping only the fields the mirror
+    uses. Known listings are revalidated with ``If-None-Match`` and
+    ``If-Modified-Since``, and a listing served again with the same content is
+    treated as unchanged as well. If ``path`` is set, the index is saved there
+    and used by later runs. The client is safe to share between mirrors.
+    """
+
+    def __init__(
+        self,
+        api_url: str = STEMCELL_API_URL,
+        path: str | None = None,
+        session: Any = None,
+        logger: logging.Logger | None = None,
+    ) -> None:
+        self.api_url: str = api_url
+        self.path: str | None = path
+        # Anything exposing requests' ``get`` API, e.g. the shared session of the job.
+        self._http: Any = session or requests
+        self.logger: logging.Logger = logger or logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._index: dict[str, StemcellListing] | None = None
+
+    def fetch(self, series: str) -> StemcellListing:
+        """
+        Fetches the listing of a stemcell series, unless bosh.io reports it unchanged since it was indexed.
+
+        Args:
+            series (str): The stemcell series, e.g. ``bosh-azure-hyperv-ubuntu-jammy-go_agent``.
+
+        Returns:
+            StemcellListing: The listing; ``changed`` is off if it is the indexed one.
+        """
+        with self._lock:
+            known: StemcellListing | None = self._load().get(series)
+        headers: dict[str, str] = {}
+        if known is not None and known.etag:
+            headers["If-None-Match"] = known.etag
+        if known is not None and known.last_modified:
+            headers["If-Modified-Since"] = known.last_modified
+
+        response: requests.Response = self._http.get(
+            f"{self.api_url}{series}", headers=headers, stream=True, timeout=REQUEST_TIMEOUT
+        )
+        with response:
+            if known is not None and response.status_code == 304:
+                self.logger.info(f"bosh.io listing of {series} is unchanged.")
+                return self._record(series, known, changed=False)
+            response.raise_for_status()
+
+            hasher: Any = hashlib.sha256()
+            stemcells: list[dict] = [
+                _compact(stemcell)
+                for stemcell in iter_listing(_hashed(response.iter_content(LISTING_CHUNK_SIZE), hasher))
+            ]
+            listing = StemcellListing(
+                stemcells=stemcells,
+                etag=_header(response, "ETag"),
+                last_modified=_header(response, "Last-Modified"),
+                digest=hasher.hexdigest(),
+            )
+        if known is not None and known.digest == listing.digest:
+            listing.mirrored = known.mirrored
+            return self._record(series, listing, changed=False)
+        return self._record(series, listing, changed=True)
+
+    def mark_mirrored(self, series: str, selection: str) -> None:
+        """Records that a run mirrored every version in ``selection`` of the current listing of ``series``."""
+        with self._lock:
+            listing: StemcellListing | None = self._load().get(series)
+            if listing is not None:
+                listing.mirrored = selection
+                self._save()
+
+    def _record(self, series: str, listing: StemcellListing, changed: bool) -> StemcellListing:
+        listing.changed = changed
+        with self._lock:
+            self._load()[series] = listing
+            self._save()
+        return listing
+
+    def _load(self) -> dict[str, StemcellListing]:
+        if self._index is not None:
+            return self._index
+        self._index = {}
+        if not self.path:
+            return self._index
+        for series, listing in load_state(self.path, "bosh.io index", self.logger).items():
+            self._index[series] = StemcellListing(
+                stemcells=list(listing["stemcells"]),
+                etag=listing.get("etag"),
+                last_modified=listing.get("last_modified"),
+                digest=listing.get("digest"),
+                mirrored=listing.get("mirrored"),
+            )
+        return self._index
+
+    def _save(self) -> None:
+        if not self.path or self._index is None:
+            return
+        content: dict[str, dict] = {
+            series: {
+                "etag": listing.etag,
+                "last_modified": listing.last_modified,
+                "digest": listing.digest,
+                "mirrored": listing.mirrored,
+                "stemcells": listing.stemcells,
+            }
+            for series, listing in self._index.items()
+        }
+        save_state(self.path, content, "bosh.io index", self.logger, compact=True)
+
+
+def iter_listing(chunks: Iterable[bytes]) -> Iterator[dict]:
+    """
+    Parses a JSON array of objects as it arrives, yielding one element at a time.
+
+    Only the element being parsed and the rest of the current chunk are held
+    in memory, not the whole document.
+
+    Args:
+        chunks (Iterable[bytes]): The UTF-8 encoded JSON array, in chunks of any size.
+
+    Returns:
+        Iterator[dict]: The elements of the array, in order.
+    """
+    decoder = json.JSONDecoder()
+    text: codecs.IncrementalDecoder = codecs.getincrementaldecoder("utf-8")()
+    buffer: str = ""
+    started: bool = False
+    for chunk in itertools.chain(chunks, [None]):
+        buffer += text.decode(chunk or b"", final=chunk is None)
+        position: int = 0
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position == len(buffer):
+                break
+            if not started:
+                if buffer[position] != "[":
+                    raise ValueError("The bosh.io stemcell listing is not a JSON array.")
+                started = True
+                position += 1
+                continue
+            if buffer[position] == "]":
+                return
+            try:
+                element, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break  # incomplete until the next chunk arrives
+            if not isinstance(element, dict):
+                raise ValueError("The bosh.io stemcell listing holds an entry that is not an object.")
+            yield element
+        buffer = buffer[position:]
+    raise ValueError("The bosh.io stemcell listing ended unexpectedly.")
+
+
+def _hashed(chunks: Iterable[bytes], hasher: Any) -> Iterator[bytes]:
+    for chunk in chunks:
+        hasher.update(chunk)
+        yield chunk
+
+
+def _compact(stemcell: dict) -> dict:
+    compact: dict[str, Any] = {key: stemcell[key] for key in _ENTRY_FIELDS if key in stemcell}
+    regular: Any = stemcell.get("regular")
+    if isinstance(regular, dict):
+        compact["regular"] = {key: regular[key] for key in _TARBALL_FIELDS if regular.get(key)}
+    return compact
+
+
+def _header(response: requests.Response, name: str) -> str | None:
+    value: Any = response.headers.get(name)
+    return value if isinstance(value, str) else None
@@ -0,0 +1,80 @@
+import queue
+import threading
+from collections.abc import Callable, Iterable, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+_DONE = object()
+
+
+@dataclass(frozen=True)
+class Stage:
+    """One step of a pipeline, applied to each item by ``workers`` threads of its own."""
+
+    name: str
+    work: Callable[[Any], None]
+    workers: int = 1
+
+
+def run_pipeline(items: Iterable[Any], stages: Sequence[Stage], queue_size: int = 1) -> list[tuple[Any, Exception]]:
+    """
+    Passes every item through the stages in order, with the stages working on different items at once.
+
+    Each stage takes items from a bounded queue filled by the previous stage,
+    so while one item is in a later stage the next ones are already in the
+    earlier stages, and a slow stage holds back the earlier ones once
+    ``queue_size`` items wait for it. An item whose stage raises is dropped
+    from the pipeline without affecting the other items.
+
+    Args:
+        items (Iterable[Any]): The items, in the order they enter the pipeline.
+        stages (Sequence[Stage]): The stages; each one works on the items in place.
+        queue_size (int): The number of items that may wait between two stages.
+
+    Returns:
+        list[tuple[Any, Exception]]: The items that failed, with the exception their stage raised.
+    """
+    if not stages:
+        raise ValueError("A pipeline needs at least one stage.")
+    if queue_size < 1 or any(stage.workers < 1 for stage in stages):
+        raise ValueError("queue_size and the stage workers must be at least 1.")
+
+    inputs: list[queue.Queue] = [queue.Queue()] + [queue.Queue(maxsize=queue_size) for _ in stages[1:]]
+    for item in items:
+        inputs[0].put(item)
+    for _ in range(stages[0].workers):
+        inputs[0].put(_DONE)
+
+    lock = threading.Lock()
+    failures: list[tuple[Any, Exception]] = []
+    running: list[int] = [stage.workers for stage in stages]
+
+    def work(index: int) -> None:
+        stage: Stage = stages[index]
+        downstream: queue.Queue | None = inputs[index + 1] if index + 1 < len(stages) else None
+        while (item := inputs[index].get()) is not _DONE:
+            try:
+                stage.work(item)
+            except Exception as e:
+                with lock:
+                    failures.append((item, e))
+                continue
+            if downstream is not None:
+                downstream.put(item)
+        with lock:
+            running[index] -= 1
+            last: bool = running[index] == 0
+        if last and downstream is not None:
+            for _ in range(stages[index + 1].workers):
+                downstream.put(_DONE)
+
+    threads: list[threading.Thread] = [
+        threading.Thread(target=work, args=(index,), name=f"{stage.name}-{worker}")
+        for index, stage in enumerate(stages)
+        for worker in range(stage.workers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return failures
@@ -0,0 +1,34 @@
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+
+class ScratchBudget:
+    """Bounds the scratch disk space claimed by stemcells that are mirrored at the same time.
+
+    Each stemcell reserves its estimated footprint before it is fetched and
+    releases it once it is uploaded. Reservations larger than the whole budget
+    are capped to it, so such a stemcell still runs, just on its own. The budget
+    is safe to share between mirrors running on different threads.
+    """
+
+    def __init__(self, size: int) -> None:
+        if size < 1:
+            raise ValueError("size must be at least 1 byte.")
+        self.size: int = size
+        self._available: int = size
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def reserve(self, size: int) -> Iterator[None]:
+        """Blocks until ``size`` bytes are available and holds them until the block exits."""
+        size = min(max(size, 0), self.size)
+        with self._condition:
+            self._condition.wait_for(lambda: self._available >= size)
+            self._available -= size
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._available += size
+                self._condition.notify_all()
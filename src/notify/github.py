@@ -23,9 +23,11 @@ class GitHubNotifierConfig:
 class GitHubNotifier:
     """Dispatches a GitHub Actions workflow via the workflow_dispatch event."""
 
-    def __init__(self, config: GitHubNotifierConfig, logger: logging.Logger | None = None) -> None:
+    def __init__(self, config: GitHubNotifierConfig, logger: logging.Logger | None = None, session: Any = None) -> None:
         self._config = config
         self._logger = logger or logging.getLogger(__name__)
+        # Anything exposing requests' ``post`` API, e.g. the shared session of the job.
+        self._http: Any = session or requests
 
     def notify_new_stemcell(self, metadata: dict[str, Any] | None = None) -> None:
         metadata_dict: dict[str, Any] = dict(metadata or {})
@@ -47,7 +49,7 @@ class GitHubNotifier:
             self._config.repository_name,
         )
 
-        response = requests.post(
+        response = self._http.post(
             url,
             json=payload,
             headers=headers,
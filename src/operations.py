@@ -0,0 +1,195 @@
+import logging
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any
+
+DEFAULT_MIN_POLL_INTERVAL = 5.0  # seconds
+DEFAULT_MAX_POLL_INTERVAL = 120.0  # seconds
+#: Factor by which the progress polling interval grows while an operation is running.
+POLL_BACKOFF = 1.5
+PROVISIONING_SUCCEEDED = "Succeeded"
+#: The provisioning states in which an Azure resource stays until it is changed again.
+PROVISIONING_ENDED = (PROVISIONING_SUCCEEDED, "Failed", "Canceled")
+
+#: Returns the progress of an operation by region, and the Retry-After delay the service asked for, if any.
+ProgressProbe = Callable[[], tuple[dict[str, str], float | None]]
+
+
+@dataclass
+class TrackedOperation:
+    """A long-running operation followed by an ``OperationTracker``."""
+
+    description: str
+    poller: Any
+    progress: ProgressProbe | None
+    started: float
+    future: Future = field(default_factory=Future)
+    finished: float | None = None
+    #: The latest progress reported for each region.
+    regions: dict[str, str] = field(default_factory=dict)
+    next_probe: float = 0.0
+    interval: float = 0.0
+
+    @property
+    def duration(self) -> float | None:
+        return None if self.finished is None else self.finished - self.started
+
+
+class OperationTracker:
+    """Follows many Azure long-running operations from one background thread.
+
+    The azure-core pollers poll the operation status themselves, honouring the
+    service's Retry-After. On top of that the tracker asks each operation's
+    ``progress`` probe, e.g. for per-region replication, starting every
+    ``min_interval`` seconds and backing off to ``max_interval`` while the
+    operation runs, but never sooner than a Retry-After returned by the probe.
+    Each tracked operation resolves a future with the poller's result once it
+    is done, and its duration and progress are logged.
+    """
+
+    def __init__(
+        self,
+        min_interval: float = DEFAULT_MIN_POLL_INTERVAL,
+        max_interval: float = DEFAULT_MAX_POLL_INTERVAL,
+        logger: logging.Logger | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if not 0 < min_interval <= max_interval:
+            raise ValueError("min_interval must be positive and at most max_interval.")
+        self.min_interval: float = min_interval
+        self.max_interval: float = max_interval
+        self.logger: logging.Logger = logger or logging.getLogger(__name__)
+        self._clock: Callable[[], float] = clock
+        self._condition = threading.Condition()
+        self._pending: list[TrackedOperation] = []
+        self._thread: threading.Thread | None = None
+
+    def track(self, description: str, poller: Any, progress: ProgressProbe | None = None) -> Future:
+        """
+        Follows the operation of ``poller`` until it is done.
+
+        Args:
+            description (str): Names the operation in log messages, e.g. ``Gallery image version 1.2.3``.
+            poller (Any): The ``LROPoller`` of the operation.
+            progress (ProgressProbe | None): Reports the operation's progress while it runs.
+
+        Returns:
+            Future: Resolves to the poller's result, or to its error, once the operation is done.
+        """
+        now: float = self._clock()
+        operation = TrackedOperation(description, poller, progress, started=now, next_probe=now)
+        operation.interval = self.min_interval
+        with self._condition:
+            self._pending.append(operation)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="operation-tracker", daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+        return operation.future
+
+    @property
+    def pending(self) -> int:
+        with self._condition:
+            return len(self._pending)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: bool(self._pending))
+                operations: list[TrackedOperation] = list(self._pending)
+            for operation in operations:
+                self._poll(operation)
+            with self._condition:
+                self._pending = [operation for operation in self._pending if not operation.future.done()]
+                if self._pending:
+                    now: float = self._clock()
+                    wake: float = min(now + self.min_interval, *(operation.next_probe for operation in self._pending))
+                    self._condition.wait(max(wake - now, 0))
+
+    def _poll(self, operation: TrackedOperation) -> None:
+        if operation.poller.done():
+            self._finish(operation)
+            return
+        now: float = self._clock()
+        if operation.progress is None:
+            # Only the poller is asked, every ``min_interval`` seconds.
+            operation.next_probe = now + self.min_interval
+            return
+        if now < operation.next_probe:
+            return
+        retry_after: float | None = None
+        try:
+            regions, retry_after = operation.progress()
+        except Exception as e:
+            self.logger.warning(f"Failed to read the progress of {operation.description}: {e}")
+        else:
+            if regions and regions != operation.regions:
+                operation.regions = regions
+                summary: str = ", ".join(f"{region} {state}" for region, state in sorted(regions.items()))
+                self.logger.info(f"{operation.description} replication: {summary}")
+        operation.next_probe = now + max(operation.interval, retry_after or 0)
+        operation.interval = min(operation.interval * POLL_BACKOFF, self.max_interval)
+
+    def _finish(self, operation: TrackedOperation) -> None:
+        try:
+            result: Any = operation.poller.result()
+        except Exception as e:
+            operation.finished = self._clock()
+            self.logger.error(f"{operation.description} failed after {operation.duration:.0f}s: {e}")
+            operation.future.set_exception(e)
+            return
+        operation.finished = self._clock()
+        self.logger.info(f"{operation.description} succeeded after {operation.duration:.0f}s.")
+        operation.future.set_result(result)
+
+
+class ProvisioningStatePoller:
+    """Follows a resource that an earlier run started creating, by reading its provisioning state.
+
+    Stands in for the poller of the original operation, which ended with that
+    run, so an ``OperationTracker`` can follow it. The resource is read at most
+    every ``min_interval`` seconds, backing off to ``max_interval``.
+    """
+
+    def __init__(
+        self,
+        get_resource: Callable[[], Any],
+        min_interval: float = DEFAULT_MIN_POLL_INTERVAL,
+        max_interval: float = DEFAULT_MAX_POLL_INTERVAL,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._get_resource: Callable[[], Any] = get_resource
+        self._interval: float = min_interval
+        self.max_interval: float = max_interval
+        self._clock: Callable[[], float] = clock
+        self._next_read: float = 0.0
+        self._resource: Any = None
+        self._state: str | None = None
+        self._error: Exception | None = None
+
+    def done(self) -> bool:
+        if self._error is not None or self._state in PROVISIONING_ENDED:
+            return True
+        now: float = self._clock()
+        if now < self._next_read:
+            return False
+        try:
+            self._resource = self._get_resource()
+        except Exception as e:
+            self._error = e
+            return True
+        state: Any = self._resource.provisioning_state
+        self._state = str(getattr(state, "value", state))
+        self._next_read = now + self._interval
+        self._interval = min(self._interval * POLL_BACKOFF, self.max_interval)
+        return self._state in PROVISIONING_ENDED
+
+    def result(self) -> Any:
+        if self._error is not None:
+            raise self._error
+        if self._state != PROVISIONING_SUCCEEDED:
+            raise RuntimeError(f"Provisioning ended in state {self._state}.")
+        return self._resource
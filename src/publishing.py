@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from azure.mgmt.compute.models import GalleryImageVersionPublishingProfile
+
+REPLICATION_MODE_FULL = "Full"
+#: Creates the image version without copying the VHD, for test galleries; only supports the home region.
+REPLICATION_MODE_SHALLOW = "Shallow"
+REPLICATION_MODES = (REPLICATION_MODE_FULL, REPLICATION_MODE_SHALLOW)
+STORAGE_ACCOUNT_TYPES = ("Standard_LRS", "Standard_ZRS", "Premium_LRS", "PremiumV2_LRS")
+DEFAULT_STORAGE_ACCOUNT_TYPE = "Standard_LRS"
+#: Concurrent VM deployments Azure recommends per replica of an image version.
+VMS_PER_REPLICA = 20
+MAX_REPLICA_COUNT = 100
+
+
+@dataclass(frozen=True)
+class RegionTarget:
+    """A region an image version is replicated to; ``replica_count`` overrides the profile's count."""
+
+    name: str
+    replica_count: int | None = None
+
+
+@dataclass(frozen=True)
+class PublishingProfile:
+    """Where and how new gallery image versions are replicated.
+
+    Every version is replicated to the home region of the gallery and to
+    ``regions``, which Azure fills in parallel as part of the same operation.
+    Each region holds ``replica_count`` replicas unless its target says
+    otherwise.
+    """
+
+    regions: tuple[RegionTarget, ...] = ()
+    replica_count: int = 1
+    storage_account_type: str = DEFAULT_STORAGE_ACCOUNT_TYPE
+    replication_mode: str = REPLICATION_MODE_FULL
+
+    def __post_init__(self) -> None:
+        if self.replication_mode not in REPLICATION_MODES:
+            raise ValueError(
+                f"Unsupported replication mode '{self.replication_mode}'. "
+                f"Supported modes: {', '.join(REPLICATION_MODES)}"
+            )
+        if self.storage_account_type not in STORAGE_ACCOUNT_TYPES:
+            raise ValueError(
+                f"Unsupported storage account type '{self.storage_account_type}'. "
+                f"Supported types: {', '.join(STORAGE_ACCOUNT_TYPES)}"
+            )
+        counts: list[int] = [self.replica_count] + [
+            region.replica_count for region in self.regions if region.replica_count is not None
+        ]
+        if any(not 1 <= count <= MAX_REPLICA_COUNT for count in counts):
+            raise ValueError(f"Replica counts must be between 1 and {MAX_REPLICA_COUNT}.")
+        if self.replication_mode == REPLICATION_MODE_SHALLOW and (self.regions or max(counts) > 1):
+            raise ValueError("Shallow replication only supports a single replica in the home region.")
+
+    def build(self, location: str) -> GalleryImageVersionPublishingProfile:
+        """Builds the publishing profile of an image version in a gallery in ``location``."""
+        from azure.mgmt.compute.models import GalleryImageVersionPublishingProfile, TargetRegion
+
+        targets: dict[str, int] = {_region_name(location): self.replica_count}
+        for region in self.regions:
+            targets[_region_name(region.name)] = region.replica_count or self.replica_count
+        return GalleryImageVersionPublishingProfile(
+            target_regions=[
+                TargetRegion(
+                    name=name,
+                    regional_replica_count=replica_count,
+                    storage_account_type=self.storage_account_type,
+                )
+                for name, replica_count in targets.items()
+            ],
+            replica_count=self.replica_count,
+            storage_account_type=self.storage_account_type,
+            replication_mode=self.replication_mode,
+        )
+
+
+def replica_count_for(vm_concurrency: int) -> int:
+    """The number of replicas per region that serves ``vm_concurrency`` VMs created at once."""
+    return min(max(math.ceil(vm_concurrency / VMS_PER_REPLICA), 1), MAX_REPLICA_COUNT)
+
+
+def parse_target_regions(value: str) -> tuple[RegionTarget, ...]:
+    """
+    Parses comma-separated target regions, each optionally with its replica count.
+
+    Args:
+        value (str): The regions, e.g. ``westeurope=3,northeurope``.
+
+    Returns:
+        tuple[RegionTarget, ...]: The regions in the given order.
+    """
+    regions: list[RegionTarget] = []
+    for item in value.split(","):
+        name, _, count = item.partition("=")
+        if not name.strip():
+            if item.strip():
+                raise ValueError(f"Invalid target region '{item.strip()}'.")
+            continue
+        if not count.strip():
+            regions.append(RegionTarget(name.strip()))
+            continue
+        try:
+            regions.append(RegionTarget(name.strip(), int(count)))
+        except ValueError:
+            raise ValueError(f"Invalid replica count in target region '{item.strip()}'.") from None
+    return tuple(regions)
+
+
+def _region_name(name: str) -> str:
+    return name.replace(" ", "").lower()
@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+from bisect import bisect_right
+from collections.abc import Iterable, Iterator
+from typing import IO
+
+PAGE_SIZE = 512
+HOLE_BLOCK_SIZE = 1024 * 4  # 4 KiB, the usual filesystem block size
+COARSE_BLOCK_SIZE = 1024 * 64  # 64 KiB
+WRITE_CHUNK_SIZE = 1024 * 1024 * 4  # 4 MiB
+RANGE_MAP_SUFFIX = ".map"
+
+#: A half-open ``(start, end)`` byte range.
+ByteRange = tuple[int, int]
+
+_ZEROS = bytes(COARSE_BLOCK_SIZE)
+
+
+def find_data_ranges(data: bytes | memoryview, offset: int = 0, block_size: int = PAGE_SIZE) -> list[ByteRange]:
+    """
+    Finds the ranges of ``data`` that contain non-zero bytes.
+
+    The buffer is first checked in coarse 64 KiB blocks, and only non-zero
+    blocks are split into ``block_size`` blocks, so mostly empty disk images are
+    scanned at close to memory bandwidth.
+
+    Args:
+        data (bytes | memoryview): The buffer to scan.
+        offset (int): The absolute position of ``data``, added to the returned ranges.
+        block_size (int): The granularity of the returned ranges; must divide 64 KiB.
+
+    Returns:
+        list[ByteRange]: Coalesced, block-aligned ranges holding data, in ascending order.
+    """
+    if COARSE_BLOCK_SIZE % block_size:
+        raise ValueError(f"block_size must divide {COARSE_BLOCK_SIZE} bytes.")
+    view = memoryview(data)
+    ranges: list[ByteRange] = []
+    for coarse_start in range(0, len(view), COARSE_BLOCK_SIZE):
+        # bytes.startswith takes any buffer and compares with memcmp, so the
+        # blocks are checked in place, without copying them out of ``data``.
+        coarse: memoryview = view[coarse_start : coarse_start + COARSE_BLOCK_SIZE]
+        if _ZEROS.startswith(coarse):
+            continue
+        for block_start in range(0, len(coarse), block_size):
+            block: memoryview = coarse[block_start : block_start + block_size]
+            if _ZEROS.startswith(block):
+                continue
+            start: int = offset + coarse_start + block_start
+            end: int = start + len(block)
+            if ranges and ranges[-1][1] == start:
+                ranges[-1] = (ranges[-1][0], end)
+            else:
+                ranges.append((start, end))
+    return ranges
+
+
+def coalesce_ranges(ranges: Iterable[ByteRange]) -> list[ByteRange]:
+    """Merges overlapping and adjacent ranges; the input must be sorted by start."""
+    merged: list[ByteRange] = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_ranges(ranges: Iterable[ByteRange], removed: list[ByteRange]) -> list[ByteRange]:
+    """Returns the parts of ``ranges`` not covered by ``removed``; both must be sorted and non-overlapping."""
+    remaining: list[ByteRange] = []
+    for start, end in ranges:
+        cursor: int = start
+        index: int = bisect_right(removed, start, key=lambda byte_range: byte_range[1])
+        while index < len(removed) and removed[index][0] < end:
+            removed_start, removed_end = removed[index]
+            if removed_start > cursor:
+                remaining.append((cursor, removed_start))
+            cursor = max(cursor, removed_end)
+            index += 1
+        if cursor < end:
+            remaining.append((cursor, end))
+    return remaining
+
+
+def split_ranges(ranges: Iterable[ByteRange], max_length: int) -> Iterator[ByteRange]:
+    """Splits ranges into consecutive pieces of at most ``max_length`` bytes."""
+    for start, end in ranges:
+        for piece_start in range(start, end, max_length):
+            yield piece_start, min(piece_start + max_length, end)
+
+
+def write_sparse(stream: IO[bytes], path: str, block_size: int = HOLE_BLOCK_SIZE) -> list[ByteRange]:
+    """
+    Copies ``stream`` to ``path``, seeking over all-zero blocks instead of writing them.
+
+    On filesystems that support sparse files the skipped blocks become holes,
+    which read back as zeros, so the result is byte-identical to a plain copy.
+    The data ranges and the sha256 of the content, computed during the copy,
+    are also saved next to the file (see ``load_range_map`` and ``load_content_digest``).
+
+    Args:
+        stream (IO[bytes]): The content to copy.
+        path (str): The file to create.
+        block_size (int): The granularity of zero detection.
+
+    Returns:
+        list[ByteRange]: The ranges of the file that hold data.
+    """
+    ranges: list[ByteRange] = []
+    size: int = 0
+    digest = hashlib.sha256()
+    with open(path, "wb") as target:
+        while chunk := _read_chunk(stream, WRITE_CHUNK_SIZE):
+            digest.update(chunk)
+            view = memoryview(chunk)
+            for start, end in find_data_ranges(view, size, block_size):
+                target.seek(start)
+                target.write(view[start - size : end - size])
+                ranges.append((start, end))
+            size += len(chunk)
+        target.truncate(size)
+
+    data_ranges: list[ByteRange] = coalesce_ranges(ranges)
+    save_range_map(path, size, data_ranges, digest.hexdigest())
+    return data_ranges
+
+
+def save_range_map(path: str, size: int, data_ranges: list[ByteRange], sha256: str | None = None) -> None:
+    """Records the data ranges and, if known, the sha256 of ``path`` in a ``<path>.map`` sidecar."""
+    range_map: dict = {"size": size, "data": data_ranges}
+    if sha256 is not None:
+        range_map["sha256"] = sha256
+    with open(f"{path}{RANGE_MAP_SUFFIX}", "w") as map_file:
+        json.dump(range_map, map_file)
+
+
+def load_range_map(path: str) -> list[ByteRange] | None:
+    """
+    Loads the data ranges recorded for ``path``.
+
+    Args:
+        path (str): The file the map was recorded for.
+
+    Returns:
+        list[ByteRange] | None: The data ranges, or ``None`` if there is no map or it does not match the file.
+    """
+    range_map: dict | None = _read_range_map(path)
+    if range_map is None:
+        return None
+    return [(int(start), int(end)) for start, end in range_map.get("data", [])]
+
+
+def load_content_digest(path: str) -> str | None:
+    """Returns the sha256 recorded for ``path`` by ``write_sparse``, or ``None`` if it is unknown."""
+    range_map: dict | None = _read_range_map(path)
+    if range_map is None:
+        return None
+    return range_map.get("sha256")
+
+
+def _read_range_map(path: str) -> dict | None:
+    map_path: str = f"{path}{RANGE_MAP_SUFFIX}"
+    if not os.path.exists(map_path) or not os.path.exists(path):
+        return None
+    try:
+        with open(map_path) as map_file:
+            range_map: dict = json.load(map_file)
+    except ValueError:
+        return None
+    if range_map.get("size") != os.path.getsize(path):
+        return None
+    return range_map
+
+
+def _read_chunk(stream: IO[bytes], size: int) -> bytes:
+    """Reads up to ``size`` bytes, only returning less at the end of the stream."""
+    parts: list[bytes] = []
+    remaining: int = size
+    while remaining:
+        part: bytes = stream.read(remaining)
+        if not part:
+            break
+        parts.append(part)
+        remaining -= len(part)
+    return b"".join(parts)
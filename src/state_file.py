@@ -0,0 +1,68 @@
+import json
+import logging
+import os
+from typing import Any
+
+#: File mode of a state file that anyone may read; the umask still applies.
+DEFAULT_FILE_MODE = 0o644
+
+
+def load_state(path: str, description: str, logger: logging.Logger) -> dict[str, Any]:
+    """
+    Reads a JSON object that a previous run saved with ``save_state``.
+
+    A missing file yields an empty object, as does an unreadable one, which is
+    logged and then overwritten by the next save.
+
+    Args:
+        path (str): The file to read.
+        description (str): What the file holds, for log messages, e.g. ``"checkpoints"``.
+        logger (logging.Logger): The logger for unreadable files.
+
+    Returns:
+        dict[str, Any]: The saved object.
+    """
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as source:
+            content: Any = json.load(source)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable {description} {path}: {e}")
+        return {}
+    if not isinstance(content, dict):
+        logger.warning(f"Ignoring unreadable {description} {path}: not a JSON object.")
+        return {}
+    return content
+
+
+def save_state(
+    path: str,
+    content: dict[str, Any],
+    description: str,
+    logger: logging.Logger,
+    mode: int = DEFAULT_FILE_MODE,
+    compact: bool = False,
+) -> None:
+    """
+    Replaces ``path`` with ``content`` as JSON, so a reader never sees a partly written file.
+
+    The content is written to ``<path>.tmp`` first and then moved over ``path``.
+    A failure is logged rather than raised, since the state only saves work
+    for later runs.
+
+    Args:
+        path (str): The file to write.
+        content (dict[str, Any]): The object to save.
+        description (str): What the file holds, for log messages.
+        logger (logging.Logger): The logger for failed saves.
+        mode (int): The mode of a newly created file, e.g. ``0o600`` for secrets.
+        compact (bool): Leave out the whitespace between items, e.g. for large listings.
+    """
+    temporary_path: str = f"{path}.tmp"
+    try:
+        with os.fdopen(os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode), "w") as target:
+            json.dump(content, target, separators=(",", ":") if compact else None)
+        os.replace(temporary_path, path)
+    except OSError as e:
+        logger.warning(f"Failed to save {description} to {path}: {e}")
@@ -0,0 +1,8 @@
+from .async_page_blob import AsyncPageBlobUploader
+from .page_blob import PageBlobUploader, UploadError
+
+__all__ = [
+    "AsyncPageBlobUploader",
+    "PageBlobUploader",
+    "UploadError",
+]
@@ -0,0 +1,202 @@
+import logging
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+from azure.core.exceptions import HttpResponseError, ServiceRequestError, ServiceResponseError
+
+from ..sparse import PAGE_SIZE
+from .page_blob import DEFAULT_UPLOAD_CONCURRENCY, DEFAULT_WINDOW_SIZE, MAX_PAGE_WRITE_SIZE, PageBlobUploader, PageBody
+
+MIB = 1024 * 1024
+DEFAULT_MAX_CONCURRENCY = 32
+DEFAULT_CHUNK_SIZES: tuple[int, ...] = (4 * MIB, 2 * MIB, 1 * MIB)
+DEFAULT_PROBE_SIZE = 256 * MIB
+DEFAULT_STEP_SIZE = 32 * MIB
+#: A setting must beat the best one so far by this factor to be preferred.
+MIN_IMPROVEMENT = 1.1
+MAX_THROTTLE_RETRIES = 5
+THROTTLE_BACKOFF = 1.0  # seconds, doubled on every retry
+#: Server errors that are retried like throttling, but do not lower the concurrency.
+TRANSIENT_STATUSES = (500, 502, 504)
+
+
+class UploadTuner:
+    """Searches for the Put Page chunk size and concurrency with the highest throughput.
+
+    Throughput is measured over consecutive steps of ``step_size`` uploaded
+    bytes. The tuner first doubles the concurrency while that improves
+    throughput, then tries the other chunk sizes at the best concurrency, and
+    settles on the best setting once all candidates were measured or
+    ``probe_size`` bytes were uploaded. Throttling halves the concurrency and
+    caps it for the rest of the upload.
+    """
+
+    def __init__(
+        self,
+        initial_concurrency: int = DEFAULT_UPLOAD_CONCURRENCY,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        chunk_sizes: tuple[int, ...] = DEFAULT_CHUNK_SIZES,
+        probe_size: int = DEFAULT_PROBE_SIZE,
+        step_size: int = DEFAULT_STEP_SIZE,
+        logger: logging.Logger | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if not 1 <= initial_concurrency <= max_concurrency:
+            raise ValueError("initial_concurrency must be between 1 and max_concurrency.")
+        if not chunk_sizes:
+            raise ValueError("chunk_sizes must not be empty.")
+        self.concurrency: int = initial_concurrency
+        self.max_concurrency: int = max_concurrency
+        self.chunk_sizes: tuple[int, ...] = chunk_sizes
+        self.chunk_size: int = chunk_sizes[0]
+        self.probe_size: int = probe_size
+        self.step_size: int = step_size
+        self.settled: bool = False
+        self.logger: logging.Logger = logger or logging.getLogger(__name__)
+        self._clock: Callable[[], float] = clock
+        self._lock = threading.Lock()
+        self._pending_chunk_sizes: list[int] = list(chunk_sizes[1:])
+        self._exploring_concurrency: bool = True
+        self._best: tuple[float, int, int] | None = None
+        self._probed: int = 0
+        self._step_bytes: int = 0
+        self._step_start: float | None = None
+        self._last_throttle: float | None = None
+
+    def start(self) -> None:
+        """Starts timing the first step; call when the first request is sent."""
+        with self._lock:
+            if self._step_start is None:
+                self._step_start = self._clock()
+
+    def record(self, size: int) -> None:
+        """Records ``size`` bytes acknowledged by the service, evaluating the current setting after each step."""
+        with self._lock:
+            if self.settled:
+                return
+            self._step_bytes += size
+            self._probed += size
+            if self._step_bytes < self.step_size:
+                return
+            now: float = self._clock()
+            elapsed: float = now - (self._step_start if self._step_start is not None else now)
+            throughput: float = self._step_bytes / elapsed if elapsed > 0 else float("inf")
+            self._step_bytes = 0
+            self._step_start = now
+            self._advance(throughput)
+
+    def throttled(self) -> None:
+        """Halves the concurrency after the service reported it is busy, and keeps it capped."""
+        with self._lock:
+            now: float = self._clock()
+            # Requests in flight are often rejected together; count them as one signal.
+            if self._last_throttle is not None and now - self._last_throttle < THROTTLE_BACKOFF:
+                return
+            self._last_throttle = now
+            self.concurrency = max(1, self.concurrency // 2)
+            self.max_concurrency = self.concurrency
+            self._exploring_concurrency = False
+            self._best = None
+            self._step_bytes = 0
+            self._step_start = now
+        self.logger.warning(f"Storage service is busy; reducing upload concurrency to {self.concurrency}.")
+
+    def _advance(self, throughput: float) -> None:
+        if self._best is None or throughput > self._best[0] * MIN_IMPROVEMENT:
+            self._best = (throughput, self.chunk_size, self.concurrency)
+        elif self._exploring_concurrency:
+            self._exploring_concurrency = False
+        _, self.chunk_size, self.concurrency = self._best
+
+        if self._probed >= self.probe_size:
+            self._settle()
+        elif self._exploring_concurrency and self.concurrency * 2 <= self.max_concurrency:
+            self.concurrency *= 2
+        elif self._pending_chunk_sizes:
+            self._exploring_concurrency = False
+            self.chunk_size = self._pending_chunk_sizes.pop(0)
+        else:
+            self._settle()
+
+    def _settle(self) -> None:
+        self.settled = True
+        if self._best is not None:
+            throughput, self.chunk_size, self.concurrency = self._best
+            self.logger.info(
+                f"Upload tuner settled on {self.chunk_size // 1024} KiB chunks with concurrency "
+                f"{self.concurrency} ({throughput / MIB:.1f} MiB/s); pin them with "
+                f"BASM_UPLOAD_CHUNK_SIZE_KB={self.chunk_size // 1024} and BASM_UPLOAD_CONCURRENCY={self.concurrency}."
+            )
+
+
+class AdaptivePageBlobUploader(PageBlobUploader):
+    """A ``PageBlobUploader`` whose chunk size and concurrency are tuned while it uploads.
+
+    The thread pool is sized for the tuner's ``max_concurrency``, and a gate lets
+    only ``tuner.concurrency`` Put Page requests run at once. A new chunk size
+    applies from the next window read. Requests rejected with 503 Server Busy
+    are retried with exponential backoff. The Storage SDK's own retries are
+    turned off for Put Page, so the tuner hears about throttling on the first
+    rejection instead of after the SDK has backed off for a minute; connection
+    and other transient server errors are retried here as well.
+    """
+
+    def __init__(
+        self,
+        tuner: UploadTuner,
+        window_size: int = DEFAULT_WINDOW_SIZE,
+        logger: logging.Logger | None = None,
+    ) -> None:
+        for chunk_size in tuner.chunk_sizes:
+            if chunk_size < PAGE_SIZE or chunk_size > MAX_PAGE_WRITE_SIZE or chunk_size % PAGE_SIZE:
+                raise ValueError(f"Chunk sizes must be multiples of {PAGE_SIZE} bytes and at most 4 MiB.")
+        super().__init__(
+            concurrency=tuner.max_concurrency,
+            window_size=max(window_size, tuner.max_concurrency * MAX_PAGE_WRITE_SIZE),
+            chunk_size=tuner.chunk_size,
+            logger=logger,
+        )
+        self.tuner: UploadTuner = tuner
+        self._gate = threading.Condition()
+        self._running: int = 0
+
+    def _put_pages(self, blob_client: Any, data: PageBody, offset: int) -> None:
+        with self._gate:
+            self._gate.wait_for(lambda: self._running < self.tuner.concurrency)
+            self._running += 1
+        try:
+            self.tuner.start()
+            self._put_pages_with_backoff(blob_client, data, offset)
+        finally:
+            with self._gate:
+                self._running -= 1
+                self._gate.notify_all()
+        self.tuner.record(len(data))
+        self.chunk_size = self.tuner.chunk_size
+
+    def _put_pages_with_backoff(self, blob_client: Any, data: PageBody, offset: int) -> None:
+        for attempt in range(MAX_THROTTLE_RETRIES + 1):
+            try:
+                blob_client.upload_page(data, offset=offset, length=len(data), retry_total=0)
+                return
+            except (HttpResponseError, ServiceRequestError, ServiceResponseError) as e:
+                throttled: bool = _is_throttled(e)
+                if not (throttled or _is_transient(e)) or attempt == MAX_THROTTLE_RETRIES:
+                    raise
+                if throttled:
+                    self.tuner.throttled()
+                time.sleep(THROTTLE_BACKOFF * 2**attempt)
+
+
+def _is_throttled(error: Exception) -> bool:
+    return isinstance(error, HttpResponseError) and (
+        error.status_code == 503 or getattr(error, "error_code", None) == "ServerBusy"
+    )
+
+
+def _is_transient(error: Exception) -> bool:
+    if isinstance(error, (ServiceRequestError, ServiceResponseError)):
+        return True
+    return isinstance(error, HttpResponseError) and error.status_code in TRANSIENT_STATUSES
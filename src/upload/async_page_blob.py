@@ -0,0 +1,110 @@
+import asyncio
+import logging
+from collections.abc import Iterator
+from typing import Any
+
+from ..sparse import ByteRange, find_data_ranges, split_ranges, subtract_ranges
+from .page_blob import MAX_PAGE_WRITE_SIZE, PageBlobUploader, _raise_failures
+
+DEFAULT_IN_FLIGHT_SIZE = 1024 * 1024 * 256  # 256 MiB
+
+
+class _ByteBudget:
+    """An asyncio semaphore that counts bytes instead of requests."""
+
+    def __init__(self, size: int) -> None:
+        self._available: int = size
+        self._condition = asyncio.Condition()
+
+    async def acquire(self, size: int) -> None:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._available >= size)
+            self._available -= size
+
+    async def release(self, size: int) -> None:
+        async with self._condition:
+            self._available += size
+            self._condition.notify_all()
+
+
+class AsyncPageBlobUploader(PageBlobUploader):
+    """Writes VHD content to Azure page blobs from an asyncio event loop.
+
+    Put Page calls are coroutines on the ``azure.storage.blob.aio`` client,
+    sharing one pooled aiohttp connector, instead of requests on a thread pool.
+    Instead of a thread count, the number of writes in flight is bounded by
+    ``in_flight_size``, the bytes that have been read but not yet acknowledged
+    by the service. Blob creation, resuming and verification work as in
+    ``PageBlobUploader``; the synchronous ``blob_client`` is used for those
+    control calls and provides the URL and credential of the async client.
+    """
+
+    def __init__(
+        self,
+        in_flight_size: int = DEFAULT_IN_FLIGHT_SIZE,
+        chunk_size: int = MAX_PAGE_WRITE_SIZE,
+        logger: logging.Logger | None = None,
+    ) -> None:
+        super().__init__(
+            concurrency=max(1, in_flight_size // chunk_size),
+            window_size=in_flight_size,
+            chunk_size=chunk_size,
+            logger=logger,
+        )
+
+    def _upload_chunks(
+        self,
+        blob_client: Any,
+        windows: Iterator[tuple[int, bytes | memoryview]],
+        present: list[ByteRange] | None = None,
+    ) -> int:
+        return asyncio.run(self._upload_chunks_async(blob_client, windows, present or []))
+
+    async def _upload_chunks_async(
+        self, blob_client: Any, windows: Iterator[tuple[int, bytes | memoryview]], present: list[ByteRange]
+    ) -> int:
+        budget = _ByteBudget(self.window_size)
+        in_flight: list[asyncio.Task] = []
+        uploaded: int = 0
+        async with self._open_async_client(blob_client) as async_client:
+            try:
+                # Windows are read on a worker thread, so reading overlaps with the writes in flight.
+                while (window := await asyncio.to_thread(next, windows, None)) is not None:
+                    offset, data = window
+                    view = memoryview(data)
+                    data_ranges: list[ByteRange] = find_data_ranges(view, offset)
+                    if present:
+                        data_ranges = subtract_ranges(data_ranges, present)
+                    for start, end in split_ranges(data_ranges, self.chunk_size):
+                        # aiohttp sends a memoryview as it is, so the window is not copied.
+                        chunk: memoryview = view[start - offset : end - offset]
+                        await budget.acquire(len(chunk))
+                        in_flight.append(asyncio.create_task(self._put_pages_async(async_client, budget, chunk, start)))
+                        in_flight = _raise_failures(in_flight)
+                        uploaded += len(chunk)
+                await asyncio.gather(*in_flight)
+            except BaseException:
+                for task in in_flight:
+                    task.cancel()
+                await asyncio.gather(*in_flight, return_exceptions=True)
+                raise
+        return uploaded
+
+    async def _put_pages_async(self, async_client: Any, budget: _ByteBudget, data: memoryview, offset: int) -> None:
+        try:
+            await async_client.upload_page(data, offset=offset, length=len(data))
+        finally:
+            await budget.release(len(data))
+
+    def _open_async_client(self, blob_client: Any) -> Any:
+        """Opens an async client for the same blob, with a connection pool sized for the writes in flight."""
+        import aiohttp
+        from azure.core.pipeline.transport import AioHttpTransport
+        from azure.storage.blob.aio import BlobClient as AsyncBlobClient
+
+        session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.concurrency))
+        return AsyncBlobClient.from_blob_url(
+            blob_client.url,
+            credential=blob_client.credential,
+            transport=AioHttpTransport(session=session, session_owner=True),
+        )
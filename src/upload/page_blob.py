@@ -0,0 +1,285 @@
+import logging
+import mmap
+import os
+import threading
+from collections.abc import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import IO, Any, Protocol, Self
+
+from azure.core.exceptions import ResourceNotFoundError
+
+from ..sparse import PAGE_SIZE, ByteRange, coalesce_ranges, find_data_ranges, split_ranges, subtract_ranges
+
+MAX_PAGE_WRITE_SIZE = 1024 * 1024 * 4  # 4 MiB, the Put Page limit
+DEFAULT_UPLOAD_CONCURRENCY = 4
+DEFAULT_WINDOW_SIZE = 1024 * 1024 * 64  # 64 MiB
+SCAN_SIZE = 1024 * 1024 * 32  # 32 MiB
+
+#: Put Page requests on a thread pool with a fixed number of workers.
+UPLOAD_ENGINE_THREADS = "threads"
+#: Put Page coroutines on an asyncio event loop, bounded by the bytes in flight.
+UPLOAD_ENGINE_ASYNC = "async"
+UPLOAD_ENGINES: tuple[str, ...] = (UPLOAD_ENGINE_THREADS, UPLOAD_ENGINE_ASYNC)
+
+
+class UploadError(RuntimeError):
+    """Raised when a page blob does not match the uploaded content."""
+
+
+class PageBody:
+    """A file-like Put Page payload that is sent straight from the buffer it views.
+
+    The Storage SDK slices the payload to the request length and hands file-like
+    bodies to the HTTP transport, which reads them in blocks and writes each
+    block to the socket. Slices and blocks are views of the same buffer, such as
+    a memory-mapped VHD, so the payload is never copied in user space.
+    """
+
+    def __init__(self, view: memoryview) -> None:
+        self._view: memoryview = view
+        self._position: int = 0
+
+    def __len__(self) -> int:
+        return len(self._view)
+
+    def __getitem__(self, key: slice) -> Self:
+        return type(self)(self._view[key])
+
+    def __bytes__(self) -> bytes:
+        return self._view.tobytes()
+
+    def read(self, size: int = -1) -> memoryview:
+        end: int = len(self._view) if size is None or size < 0 else min(self._position + size, len(self._view))
+        data: memoryview = self._view[self._position : end]
+        self._position = end
+        return data
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        base: int = {os.SEEK_SET: 0, os.SEEK_CUR: self._position, os.SEEK_END: len(self._view)}[whence]
+        self._position = min(max(base + offset, 0), len(self._view))
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
+
+
+class _Outcome(Protocol):
+    """A pending upload: a ``concurrent.futures.Future`` or an ``asyncio.Task``."""
+
+    def done(self) -> bool: ...
+
+    def result(self) -> Any: ...
+
+
+class PageBlobUploader:
+    """Writes VHD content to Azure page blobs with bounded, parallel Put Page calls.
+
+    ``blob_client`` arguments are ``azure.storage.blob.BlobClient`` instances (or
+    anything exposing ``create_page_blob`` and ``upload_page``, plus
+    ``get_blob_properties`` and ``list_page_ranges`` when resuming).
+
+    When resuming, an existing page blob of the right size is kept and the page
+    ranges it already holds are not uploaded again. Put Page requests are
+    atomic, so every range the service reports was written completely.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = DEFAULT_UPLOAD_CONCURRENCY,
+        window_size: int = DEFAULT_WINDOW_SIZE,
+        chunk_size: int = MAX_PAGE_WRITE_SIZE,
+        logger: logging.Logger | None = None,
+    ) -> None:
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1.")
+        if chunk_size < PAGE_SIZE or chunk_size > MAX_PAGE_WRITE_SIZE or chunk_size % PAGE_SIZE:
+            raise ValueError(f"chunk_size must be a multiple of {PAGE_SIZE} bytes and at most 4 MiB.")
+        if window_size < chunk_size:
+            raise ValueError("window_size must be at least one chunk.")
+        self.concurrency: int = concurrency
+        self.window_size: int = window_size
+        self.chunk_size: int = chunk_size
+        self.scan_size: int = SCAN_SIZE
+        self.logger: logging.Logger = logger or logging.getLogger(__name__)
+
+    def upload_file(
+        self, blob_client: Any, path: str, data_ranges: list[ByteRange] | None = None, resume: bool = False
+    ) -> None:
+        """
+        Creates a page blob the size of ``path`` and uploads only its non-zero pages.
+
+        The file is memory-mapped and scanned in large aligned windows; runs of
+        non-zero pages are coalesced into Put Page requests of up to
+        ``chunk_size`` bytes, while all-zero pages are skipped since a new page
+        blob already reads as zeros. If the file's data ranges are already
+        known, only those are read. Zero detection and the requests work on
+        views of the mapping, so the VHD is not copied into Python buffers.
+
+        Args:
+            blob_client (Any): The client of the page blob to write.
+            path (str): The file to upload; its size must be a multiple of 512 bytes.
+            data_ranges (list[ByteRange] | None): Sorted, page-aligned ranges outside of which the file is zero.
+            resume (bool): Whether to continue an earlier upload to the same blob.
+        """
+        size: int = os.path.getsize(path)
+        _check_page_aligned(size)
+        present: list[ByteRange] = self._prepare_blob(blob_client, size, resume)
+
+        pages: memoryview = _map_file(path, size)
+        ranges: list[ByteRange] = [(0, size)] if data_ranges is None else subtract_ranges(data_ranges, present)
+        uploaded: int = self._upload_chunks(blob_client, _view_ranges(pages, ranges, self.scan_size), present)
+
+        if resume:
+            _verify_size(blob_client, size)
+        self._log_upload(uploaded, size)
+
+    def upload_stream(self, blob_client: Any, stream: IO[bytes], size: int, resume: bool = False) -> None:
+        """
+        Creates a page blob of ``size`` bytes and fills it from a sequential stream.
+
+        At most ``window_size`` bytes are buffered in memory at any time, so reading
+        the stream overlaps with the uploads without staging the content on disk.
+        All-zero pages are skipped. When resuming, the stream is still read in
+        full, but pages the blob already holds are not sent again.
+
+        Args:
+            blob_client (Any): The client of the page blob to write.
+            stream (IO[bytes]): The content to upload; exactly ``size`` bytes are read.
+            size (int): The content length, which must be a multiple of 512 bytes.
+            resume (bool): Whether to continue an earlier upload to the same blob.
+        """
+        _check_page_aligned(size)
+        present: list[ByteRange] = self._prepare_blob(blob_client, size, resume)
+
+        uploaded: int = self._upload_chunks(blob_client, _read_windows(stream, size, self.chunk_size), present)
+
+        if resume:
+            _verify_size(blob_client, size)
+        self._log_upload(uploaded, size)
+
+    def _prepare_blob(self, blob_client: Any, size: int, resume: bool) -> list[ByteRange]:
+        """
+        Creates an empty page blob of ``size`` bytes, unless an earlier upload to it can be resumed.
+
+        Returns:
+            list[ByteRange]: The ranges the blob already holds, which need not be uploaded again.
+        """
+        if resume:
+            try:
+                existing_size: int | None = blob_client.get_blob_properties().size
+            except ResourceNotFoundError:
+                existing_size = None
+            if existing_size == size:
+                present: list[ByteRange] = coalesce_ranges(
+                    (page_range.start, page_range.end + 1)
+                    for page_range in blob_client.list_page_ranges()
+                    if not page_range.cleared
+                )
+                self.logger.info(
+                    f"Resuming upload: page blob already holds {sum(end - start for start, end in present)} bytes."
+                )
+                return present
+            if existing_size is not None:
+                self.logger.info(f"Existing page blob has {existing_size} bytes instead of {size}; starting over.")
+
+        blob_client.create_page_blob(size=size)
+        return []
+
+    def _upload_chunks(
+        self,
+        blob_client: Any,
+        windows: Iterator[tuple[int, bytes | memoryview]],
+        present: list[ByteRange] | None = None,
+    ) -> int:
+        """Uploads the non-zero, not yet ``present`` pages of each ``(offset, data)`` window; returns the bytes sent."""
+        window = threading.BoundedSemaphore(max(1, self.window_size // self.chunk_size))
+        in_flight: list[Future] = []
+        uploaded: int = 0
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            try:
+                for offset, data in windows:
+                    view = memoryview(data)
+                    data_ranges: list[ByteRange] = find_data_ranges(view, offset)
+                    if present:
+                        data_ranges = subtract_ranges(data_ranges, present)
+                    for start, end in split_ranges(data_ranges, self.chunk_size):
+                        chunk: PageBody = PageBody(view[start - offset : end - offset])
+                        window.acquire()
+                        future: Future = executor.submit(self._put_pages, blob_client, chunk, start)
+                        future.add_done_callback(lambda _: window.release())
+                        in_flight.append(future)
+                        in_flight = _raise_failures(in_flight)
+                        uploaded += len(chunk)
+                for future in in_flight:
+                    future.result()
+            except BaseException:
+                for future in in_flight:
+                    future.cancel()
+                raise
+        return uploaded
+
+    def _put_pages(self, blob_client: Any, data: PageBody, offset: int) -> None:
+        blob_client.upload_page(data, offset=offset, length=len(data))
+
+    def _log_upload(self, uploaded: int, size: int) -> None:
+        self.logger.info(f"Uploaded {uploaded} of {size} bytes to page blob; skipped {size - uploaded} zero bytes.")
+
+
+def _check_page_aligned(size: int) -> None:
+    if size % PAGE_SIZE:
+        raise ValueError(f"Page blob content must be a multiple of {PAGE_SIZE} bytes, got {size} bytes.")
+
+
+def _verify_size(blob_client: Any, size: int) -> None:
+    blob_size: int = blob_client.get_blob_properties().size
+    if blob_size != size:
+        raise UploadError(f"Page blob has {blob_size} bytes after the upload, expected {size}.")
+
+
+def _read_windows(source: IO[bytes], size: int, window_size: int) -> Iterator[tuple[int, bytes]]:
+    """Yields consecutive ``(offset, data)`` windows covering the first ``size`` bytes of ``source``."""
+    offset: int = 0
+    while offset < size:
+        data: bytes = _read_exactly(source, min(window_size, size - offset))
+        yield offset, data
+        offset += len(data)
+
+
+def _map_file(path: str, size: int) -> memoryview:
+    """Maps ``path`` read-only; the mapping is released once no view of it is left."""
+    if size == 0:
+        return memoryview(b"")
+    with open(path, "rb") as source:
+        return memoryview(mmap.mmap(source.fileno(), size, access=mmap.ACCESS_READ))
+
+
+def _view_ranges(pages: memoryview, ranges: list[ByteRange], window_size: int) -> Iterator[tuple[int, memoryview]]:
+    """Yields ``(offset, data)`` windows of ``pages`` covering only the given ranges."""
+    for start, end in split_ranges(ranges, window_size):
+        if start % PAGE_SIZE:
+            raise ValueError(f"Data range starting at byte {start} is not aligned to {PAGE_SIZE} bytes.")
+        yield start, pages[start:end]
+
+
+def _read_exactly(stream: IO[bytes], length: int) -> bytes:
+    """Reads ``length`` bytes, raising ``EOFError`` if the stream ends early."""
+    parts: list[bytes] = []
+    remaining: int = length
+    while remaining:
+        part: bytes = stream.read(remaining)
+        if not part:
+            raise EOFError(f"Stream ended {remaining} bytes before the expected end of content.")
+        parts.append(part)
+        remaining -= len(part)
+    return parts[0] if len(parts) == 1 else b"".join(parts)
+
+
+def _raise_failures(futures: list[_Outcome]) -> list[_Outcome]:
+    """Re-raises the first failed upload and returns the futures, or asyncio tasks, still pending."""
+    pending: list[_Outcome] = []
+    for future in futures:
+        if future.done():
+            future.result()
+        else:
+            pending.append(future)
+    return pending
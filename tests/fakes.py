@@ -0,0 +1,8 @@
+class FakeClock:
+    """A clock for the ``clock`` parameters of the code under test, advanced by setting ``now``."""
+
+    def __init__(self, now: float = 0.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
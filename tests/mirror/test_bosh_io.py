@@ -1,24 +1,55 @@
+import hashlib
+import io
 import json
 import os
 import shutil
+import threading
 import unittest
+from concurrent.futures import Future
+from contextlib import contextmanager
 from unittest.mock import MagicMock, patch
 
 import requests
 
 from src.mirror.bosh_io import BoshIoJammyMirror, BoshIoNobleMirror, BoshIoStemcellMirror
+from src.mirror.cache import ArtifactCache
+from src.mirror.checkpoint import STAGE_NOTIFIED, STAGE_PROVISIONED, STAGE_REQUESTED, CheckpointStore
+from src.mirror.download import Checksum, ChecksumMismatchError, DownloadError, RangedDownloader
+from src.mirror.pipeline import Stage
+from src.upload.page_blob import PageBlobUploader
+from tests.mirror.test_download import make_session
+from tests.mirror.test_extract import MANIFEST_CONTENT, make_stemcell, make_tar
+from tests.mirror.test_metadata import api_response, listing_chunks
+from tests.upload.test_page_blob import RecordingBlobClient
 
 tmp_dir = os.path.join("tests", "tmp")
 
 JAMMY_SERIES = "bosh-azure-hyperv-ubuntu-jammy-go_agent"
 
 
+class PageBlob(RecordingBlobClient):
+    """An in-memory page blob that remembers which pages were written, like Azure's page ranges."""
+
+    def upload_page(self, page: bytes, offset: int, length: int) -> None:
+        super().upload_page(page, offset, length)
+        with self._lock:
+            self.present.append((offset, offset + length))
+
+    def delete_blob(self) -> None:
+        self.exists = False
+        self.content = bytearray()
+        self.present = []
+
+
 class TestBoshIoStemcellMirror(unittest.TestCase):
 
     def setUp(self):
         self.mock_azure_manager = MagicMock()
         self.mock_azure_manager.subscription_id = "00000000-0000-0000-0000-000000000000"
         self.mock_azure_manager.resource_group = "test-resource-group"
+        provisioned = Future()
+        provisioned.set_result(MagicMock())
+        self.mock_azure_manager.create_gallery_image_version.return_value = provisioned
         self.mirror = BoshIoJammyMirror(
             azure_manager=self.mock_azure_manager,
             gallery_name="test-gallery",
@@ -39,7 +70,7 @@ class TestBoshIoStemcellMirror(unittest.TestCase):
         mock_response_api = MagicMock()
         mock_response_api.status_code = 200
         with open("tests/resources/stemcell.json") as mock_data:
-            mock_response_api.json.return_value = json.load(mock_data)
+            mock_response_api.iter_content.return_value = listing_chunks(json.load(mock_data))
         mock_response_api.raise_for_status = MagicMock()
         mock_requests_get.return_value = mock_response_api
         mock_download_stemcell.return_value = os.path.join(tmp_dir, "fake-stemcell.tgz")
@@ -56,14 +87,255 @@ class TestBoshIoStemcellMirror(unittest.TestCase):
         passed_cloud_properties = call_args.args[3]
         self.assertEqual(passed_cloud_properties["architecture"], "x86_64")
         self.assertEqual(passed_cloud_properties["os_type"], "linux")
-        self.mock_azure_manager.upload_vhd.assert_called_once_with(os.path.join(tmp_dir, "root.vhd"))
+        self.mock_azure_manager.upload_vhd.assert_called_once_with(
+            os.path.join(tmp_dir, "root.vhd"),
+            [(0, 14)],
+            blob_name="bosh-stemcell-1.682.0-181fa9d348fd9af2.vhd",
+            content_digest="db38d2e65e5d2b944c134d7a848a183379f3c9ec062de024938433594ae673e9",
+        )
+        self.mock_azure_manager.create_gallery_image_version.assert_called_once()
+
+    @patch("requests.get")
+    def test_run_in_stream_mode(self, mock_requests_get):
+        mock_downloader = MagicMock()
+        stream_mirror = BoshIoJammyMirror(
+            azure_manager=self.mock_azure_manager,
+            gallery_name="test-gallery",
+            gallery_image_name="test-image",
+            extraction_directory=tmp_dir,
+            downloader=mock_downloader,
+            transfer_mode="stream",
+        )
+        mock_response_api = MagicMock()
+        with open("tests/resources/stemcell.json") as mock_data:
+            mock_response_api.iter_content.return_value = listing_chunks(json.load(mock_data))
+        mock_requests_get.return_value = mock_response_api
+        self.mock_azure_manager.gallery_image_version_exists.return_value = False
+        stemcell = open(os.path.join("tests", "resources", "fake-stemcell.tgz"), "rb")
+        self.addCleanup(stemcell.close)
+        mock_downloader.stream.return_value.__enter__.return_value = stemcell
+        staged_files: list[str] = []
+        self.mock_azure_manager.upload_vhd.side_effect = lambda vhd_path, *args, **kwargs: staged_files.extend(
+            os.listdir(os.path.dirname(vhd_path))
+        )
+
+        stream_mirror.run()
+
+        mock_downloader.download.assert_not_called()
+        mock_downloader.stream.assert_called_once_with(
+            "https://storage.googleapis.com/bosh-core-stemcells/1.682/"
+            "bosh-stemcell-1.682-azure-hyperv-ubuntu-jammy-go_agent.tgz",
+            Checksum("sha256", "181fa9d348fd9af2d1ff55da9c081889873c39abb75a18b2e9622d92b2eae52f"),
+        )
+        passed_cloud_properties = self.mock_azure_manager.check_or_create_gallery_image.call_args.args[3]
+        self.assertEqual(passed_cloud_properties["architecture"], "x86_64")
+        uploaded_vhd = self.mock_azure_manager.upload_vhd.call_args.args[0]
+        self.assertEqual(os.path.basename(uploaded_vhd), "root.vhd")
+        self.assertEqual(sorted(staged_files), ["root.vhd", "root.vhd.map", "stemcell.MF"])
+
+    @patch("requests.get")
+    def test_run_in_direct_mode(self, mock_requests_get):
+        mock_downloader = MagicMock()
+        direct_mirror = BoshIoJammyMirror(
+            azure_manager=self.mock_azure_manager,
+            gallery_name="test-gallery",
+            gallery_image_name="test-image",
+            extraction_directory=tmp_dir,
+            downloader=mock_downloader,
+            transfer_mode="direct",
+        )
+        mock_response_api = MagicMock()
+        with open("tests/resources/stemcell.json") as mock_data:
+            mock_response_api.iter_content.return_value = listing_chunks(json.load(mock_data))
+        mock_requests_get.return_value = mock_response_api
+        self.mock_azure_manager.gallery_image_version_exists.return_value = False
+        stemcell = open(os.path.join("tests", "resources", "fake-stemcell.tgz"), "rb")
+        self.addCleanup(stemcell.close)
+        mock_downloader.stream.return_value.__enter__.return_value = stemcell
+        streamed: list[bytes] = []
+        self.mock_azure_manager.upload_vhd_stream.side_effect = (
+            lambda stream, size, blob_name: streamed.append(stream.read(size)) or "https://blob/root.vhd"
+        )
+
+        direct_mirror.run()
+
+        self.mock_azure_manager.upload_vhd.assert_not_called()
+        self.assertEqual(len(streamed), 1)
+        self.assertEqual(self.mock_azure_manager.upload_vhd_stream.call_args.args[1], len(streamed[0]))
+        passed_cloud_properties = self.mock_azure_manager.check_or_create_gallery_image.call_args.args[3]
+        self.assertEqual(passed_cloud_properties["architecture"], "x86_64")
+        self.mock_azure_manager.create_gallery_image_version.assert_called_once_with(
+            "test-gallery", "test-image", "1.682.0", "https://blob/root.vhd"
+        )
+        self.assertEqual(os.listdir(tmp_dir), ["fake-stemcell.tgz"])
+
+    @patch("requests.get")
+    def test_direct_mode_checks_gallery_image_during_transfer(self, mock_requests_get):
+        mock_downloader = MagicMock()
+        direct_mirror = BoshIoJammyMirror(
+            azure_manager=self.mock_azure_manager,
+            gallery_name="test-gallery",
+            downloader=mock_downloader,
+            transfer_mode="direct",
+        )
+        mock_requests_get.return_value.iter_content.return_value = listing_chunks(
+            [{"version": "1.682", "regular": {"url": "https://fake-url/stemcell.tgz"}}]
+        )
+        self.mock_azure_manager.gallery_image_version_exists.return_value = False
+        mock_downloader.stream.return_value.__enter__.return_value = io.BytesIO(make_stemcell(manifest_first=True))
+        checked = threading.Event()
+        self.mock_azure_manager.check_or_create_gallery_image.side_effect = lambda *args: checked.set()
+        self.mock_azure_manager.upload_vhd_stream.side_effect = (
+            lambda stream, size, blob_name: checked.wait(1) and stream.read(size) and "https://blob/root.vhd"
+        )
+
+        direct_mirror.run()
+
+        self.mock_azure_manager.create_gallery_image_version.assert_called_once_with(
+            "test-gallery", JAMMY_SERIES, "1.682.0", "https://blob/root.vhd"
+        )
+
+    @patch("requests.get")
+    def test_direct_mode_reuploads_every_page_after_checksum_mismatch(self, mock_requests_get):
+        vhd = b"\x01" * 2048
+        stemcells = [
+            make_tar({"./stemcell.MF": MANIFEST_CONTENT, "./image": make_tar({"./root.vhd": content}, "w:gz")}, "w:gz")
+            for content in (b"\x02" * 2048, vhd)
+        ]
+        mock_requests_get.return_value.iter_content.return_value = listing_chunks(
+            [{"version": "1.682", "regular": {"url": "https://fake-url/stemcell.tgz", "sha256": "ab" * 32}}]
+        )
+
+        @contextmanager
+        def stream(url, checksum):
+            corrupt = len(stemcells) == 2
+            yield io.BytesIO(stemcells.pop(0))
+            if corrupt:
+                raise ChecksumMismatchError("sha256 mismatch")
+
+        mock_downloader = MagicMock()
+        mock_downloader.stream.side_effect = stream
+        blob = PageBlob()
+        uploader = PageBlobUploader(chunk_size=512, window_size=512)
+        self.mock_azure_manager.gallery_image_version_exists.return_value = False
+        self.mock_azure_manager.upload_vhd_stream.side_effect = lambda stream, size, blob_name: (
+            uploader.upload_stream(blob, stream, size, resume=True) or "https://blob/root.vhd"
+        )
+        self.mock_azure_manager.delete_blob.side_effect = lambda blob_name: blob.delete_blob()
+        direct_mirror = BoshIoJammyMirror(
+            azure_manager=self.mock_azure_manager,
+            gallery_name="test-gallery",
+            downloader=mock_downloader,
+            transfer_mode="direct",
+        )
+
+        with self.assertRaises(ChecksumMismatchError):
+            direct_mirror.run()
+        blob.writes = []
+        direct_mirror.run()
+
+        self.mock_azure_manager.delete_blob.assert_called_once_with("bosh-stemcell-1.682.0-abababababababab.vhd")
+        self.assertEqual(sorted(blob.writes), [(offset, 512) for offset in range(0, len(vhd), 512)])
+        self.assertEqual(bytes(blob.content), vhd)
         self.mock_azure_manager.create_gallery_image_version.assert_called_once()
 
+    @patch("src.mirror.bosh_io.BoshIoStemcellMirror._download_stemcell")
+    @patch("requests.get")
+    def test_gallery_image_is_checked_once_per_run(self, mock_requests_get, mock_download_stemcell):
+        with open("tests/resources/stemcell.json") as mock_data:
+            mock_requests_get.return_value.iter_content.return_value = listing_chunks(json.load(mock_data))
+        mock_download_stemcell.side_effect = lambda release, path: shutil.copy(
+            os.path.join("tests", "resources", "fake-stemcell.tgz"), os.path.join(path, "stemcell.tgz")
+        )
+        self.mock_azure_manager.gallery_image_version_exists.return_value = False
+        backfill_mirror = BoshIoJammyMirror(
+            azure_manager=self.mock_azure_manager,
+            gallery_name="test-gallery",
+            extraction_directory=tmp_dir,
+            backfill_count=3,
+            fetch_workers=3,
+            upload_workers=3,
+        )
+
+        backfill_mirror.run()
+
+        self.assertEqual(self.mock_azure_manager.create_gallery_image_version.call_count, 3)
+        self.mock_azure_manager.check_or_create_gallery_image.assert_called_once()
+        self.assertFalse(any(thread.name.startswith("control-plane") for thread in threading.enumerate()))
+
+    @patch("requests.get")
+    def test_failed_gallery_image_check_skips_version(self, mock_requests_get):
+        mock_downloader = MagicMock()
+        direct_mirror = BoshIoJammyMirror(
+            azure_manager=self.mock_azure_manager,
+            gallery_name="test-gallery",
+            downloader=mock_downloader,
+            transfer_mode="direct",
+        )
+        mock_requests_get.return_value.iter_content.return_value = listing_chunks(
+            [{"version": "1.682", "regular": {"url": "https://fake-url/stemcell.tgz"}}]
+        )
+        self.mock_azure_manager.gallery_image_version_exists.return_value = False
+        stemcell = open(os.path.join("tests", "resources", "fake-stemcell.tgz"), "rb")
+        self.addCleanup(stemcell.close)
+        mock_downloader.stream.return_value.__enter__.return_value = stemcell
+        self.mock_azure_manager.check_or_create_gallery_image.side_effect = RuntimeError("quota exceeded")
+        self.mock_azure_manager.upload_vhd_stream.side_effect = lambda stream, size, blob_name: stream.read(size)
+
+        with self.assertRaisesRegex(RuntimeError, "quota exceeded"):
+            direct_mirror.run()
+
+        self.mock_azure_manager.upload_vhd_stream.assert_called_once()
+        self.mock_azure_manager.create_gallery_image_version.assert_not_called()
+
+    @patch("requests.get")
+    def test_retry_reuses_cached_stemcell(self, mock_requests_get):
+        mock_downloader = MagicMock()
+        mock_downloader.download.side_effect = lambda url, path, checksum: shutil.copy(
+            os.path.join("tests", "resources", "fake-stemcell.tgz"), path
+        )
+        cache = ArtifactCache(os.path.join(tmp_dir, "cache"), 1024 * 1024 * 1024)
+        cached_mirror = BoshIoJammyMirror(
+            azure_manager=self.mock_azure_manager,
+            gallery_name="test-gallery",
+            gallery_image_name="test-image",
+            downloader=mock_downloader,
+            cache=cache,
+        )
+        mock_response_api = MagicMock()
+        with open("tests/resources/stemcell.json") as mock_data:
+            mock_response_api.iter_content.return_value = listing_chunks(json.load(mock_data))
+        mock_requests_get.return_value = mock_response_api
+        self.mock_azure_manager.gallery_image_version_exists.return_value = False
+        self.mock_azure_manager.upload_vhd.side_effect = [RuntimeError("upload failed"), "https://blob/root.vhd"]
+
+        with self.assertRaises(RuntimeError):
+            cached_mirror.run()
+        cached_mirror.run()
+
+        mock_downloader.download.assert_called_once()
+        entry = os.path.join(
+            tmp_dir, "cache", "sha256-181fa9d348fd9af2d1ff55da9c081889873c39abb75a18b2e9622d92b2eae52f"
+        )
+        self.assertEqual(self.mock_azure_manager.upload_vhd.call_args.args[0], os.path.join(entry, "root.vhd"))
+        self.assertEqual(
+            self.mock_azure_manager.check_or_create_gallery_image.call_args.args[3]["architecture"], "x86_64"
+        )
+        self.mock_azure_manager.create_gallery_image_version.assert_called_once_with(
+            "test-gallery", "test-image", "1.682.0", "https://blob/root.vhd"
+        )
+
+    def test_unsupported_transfer_mode_raises(self):
+        with self.assertRaises(ValueError):
+            BoshIoJammyMirror(azure_manager=self.mock_azure_manager, gallery_name="gallery", transfer_mode="carrier")
+
     @patch("requests.get")
     def test_run_with_existing_version(self, mock_requests_get):
         mock_response = MagicMock()
         mock_response.status_code = 200
-        mock_response.json.return_value = [{"version": "1.682.0", "regular": {"url": "https://fake-url/stemcell.tgz"}}]
+        mock_response.iter_content.return_value = listing_chunks(
+            [{"version": "1.682.0", "regular": {"url": "https://fake-url/stemcell.tgz"}}]
+        )
         mock_response.raise_for_status = MagicMock()
         mock_requests_get.return_value = mock_response
         self.mock_azure_manager.gallery_image_version_exists.return_value = True
@@ -77,11 +349,100 @@ class TestBoshIoStemcellMirror(unittest.TestCase):
         self.mock_azure_manager.upload_vhd.assert_not_called()
         self.mock_azure_manager.create_gallery_image_version.assert_not_called()
 
+    @patch("src.mirror.bosh_io.BoshIoStemcellMirror._mirror_releases")
+    @patch("requests.get")
+    def test_unchanged_listing_skips_azure_after_complete_run(self, mock_requests_get, mock_mirror_releases):
+        with open("tests/resources/stemcell.json") as mock_data:
+            stemcells = json.load(mock_data)
+        mock_requests_get.return_value = api_response(stemcells, headers={"ETag": '"v1"'})
+        self.mock_azure_manager.gallery_image_version_exists.return_value = False
+        mock_mirror_releases.side_effect = [RuntimeError("boom"), None, None]
+
+        with self.assertRaises(RuntimeError):
+            self.mirror.run()
+        mock_requests_get.return_value = api_response([], status_code=304)
+        self.mirror.run()  # retries, since the last run failed
+        self.mirror.run()
+
+        self.assertEqual(mock_requests_get.call_count, 3)
+        self.assertEqual(mock_mirror_releases.call_count, 2)
+        self.assertEqual(self.mock_azure_manager.gallery_image_version_exists.call_count, 2)
+        backfill_mirror = BoshIoJammyMirror(
+            azure_manager=self.mock_azure_manager,
+            gallery_name="test-gallery",
+            gallery_image_name="test-image",
+            backfill_count=2,
+            metadata=self.mirror.metadata,
+        )
+        backfill_mirror.run()  # its selection was not mirrored yet
+
+        self.assertEqual(mock_mirror_releases.call_count, 3)
+
+    @patch("src.mirror.bosh_io.BoshIoStemcellMirror._stages")
+    @patch("requests.get")
+    def test_backfill_mirrors_missing_versions_in_range(self, mock_requests_get, mock_stages):
+        mock_mirror_release = MagicMock()
+        mock_stages.return_value = [Stage("mirror", mock_mirror_release)]
+        mock_response = MagicMock()
+        with open("tests/resources/stemcell.json") as mock_data:
+            mock_response.iter_content.return_value = listing_chunks(json.load(mock_data))
+        mock_requests_get.return_value = mock_response
+        self.mock_azure_manager.gallery_image_version_exists.side_effect = lambda _g, _i, version: version == "1.651.0"
+        backfill_mirror = BoshIoJammyMirror(
+            azure_manager=self.mock_azure_manager,
+            gallery_name="test-gallery",
+            backfill_count=3,
+            version_range=">=1.631, !=1.639",
+        )
+
+        backfill_mirror.run()
+
+        self.assertEqual(self.mock_azure_manager.gallery_image_version_exists.call_count, 3)
+        mirrored = [call.args[0].release for call in mock_mirror_release.call_args_list]
+        self.assertEqual([release.version for release in mirrored], ["1.682.0", "1.631.0"])
+        self.assertEqual(mirrored[0].size, 1253467594)
+
+    @patch("src.mirror.bosh_io.BoshIoStemcellMirror._publish")
+    @patch("src.mirror.bosh_io.BoshIoStemcellMirror._upload")
+    @patch("src.mirror.bosh_io.BoshIoStemcellMirror._fetch")
+    @patch("requests.get")
+    def test_backfill_failure_does_not_stop_other_versions(
+        self, mock_requests_get, mock_fetch, mock_upload, mock_publish
+    ):
+        mock_response = MagicMock()
+        mock_response.iter_content.return_value = listing_chunks(
+            [
+                {"version": version, "regular": {"url": f"https://fake-url/{version}.tgz"}}
+                for version in ("1.3", "1.2", "1.1")
+            ]
+        )
+        mock_requests_get.return_value = mock_response
+        self.mock_azure_manager.gallery_image_version_exists.return_value = False
+
+        def upload(job):
+            if job.release.version == "1.2.0":
+                raise RuntimeError("boom")
+
+        mock_upload.side_effect = upload
+        backfill_mirror = BoshIoJammyMirror(
+            azure_manager=self.mock_azure_manager, gallery_name="test-gallery", backfill_count=3, logger=MagicMock()
+        )
+
+        with self.assertRaisesRegex(RuntimeError, "1.2.0"):
+            backfill_mirror.run()
+
+        self.assertEqual((mock_fetch.call_count, mock_upload.call_count), (3, 3))
+        self.assertEqual([call.args[0].release.version for call in mock_publish.call_args_list], ["1.3.0", "1.1.0"])
+
+    def test_invalid_version_range_raises(self):
+        with self.assertRaises(ValueError):
+            BoshIoJammyMirror(azure_manager=self.mock_azure_manager, gallery_name="gallery", version_range="~1.600")
+
     @patch("requests.get")
     def test_run_with_empty_stemcell_list(self, mock_requests_get):
         mock_response = MagicMock()
         mock_response.status_code = 200
-        mock_response.json.return_value = []
+        mock_response.iter_content.return_value = listing_chunks([])
         mock_response.raise_for_status = MagicMock()
         mock_requests_get.return_value = mock_response
 
@@ -107,7 +468,7 @@ class TestBoshIoStemcellMirror(unittest.TestCase):
         mock_response_api = MagicMock()
         mock_response_api.status_code = 200
         with open("tests/resources/stemcell.json") as mock_data:
-            mock_response_api.json.return_value = json.load(mock_data)
+            mock_response_api.iter_content.return_value = listing_chunks(json.load(mock_data))
         mock_response_api.raise_for_status = MagicMock()
         mock_requests_get.return_value = mock_response_api
         mock_download_stemcell.return_value = os.path.join(tmp_dir, "fake-stemcell.tgz")
@@ -125,11 +486,243 @@ class TestBoshIoStemcellMirror(unittest.TestCase):
             },
         )
 
+    @patch("src.mirror.bosh_io.BoshIoStemcellMirror._download_stemcell")
+    @patch("requests.get")
+    def test_notifier_waits_for_provisioned_version(self, mock_requests_get, mock_download_stemcell):
+        mock_requests_get.return_value.iter_content.return_value = listing_chunks(
+            [{"version": "1.682", "regular": {"url": "https://fake-url/stemcell.tgz"}}]
+        )
+        mock_download_stemcell.return_value = os.path.join(tmp_dir, "fake-stemcell.tgz")
+        self.mock_azure_manager.gallery_image_version_exists.return_value = False
+        failed = Future()
+        failed.set_exception(RuntimeError("replication failed"))
+        self.mock_azure_manager.create_gallery_image_version.return_value = failed
+        mock_notifier = MagicMock()
+
+        for wait_for_provisioning in (True, False):
+            with self.subTest(wait_for_provisioning=wait_for_provisioning):
+                mirror = BoshIoJammyMirror(
+                    azure_manager=self.mock_azure_manager,
+                    gallery_name="test-gallery",
+                    extraction_directory=tmp_dir,
+                    notifier=mock_notifier,
+                    wait_for_provisioning=wait_for_provisioning,
+                )
+                shutil.copy(os.path.join("tests", "resources", "fake-stemcell.tgz"), tmp_dir)
+
+                if wait_for_provisioning:
+                    with self.assertRaisesRegex(RuntimeError, "replication failed"):
+                        mirror.run()
+                else:
+                    mirror.run()
+
+        mock_notifier.notify_new_stemcell.assert_not_called()
+
+    @patch("src.mirror.bosh_io.BoshIoStemcellMirror._download_stemcell")
+    @patch("requests.get")
+    def test_interrupted_run_resumes_from_uploaded_vhd(self, mock_requests_get, mock_download_stemcell):
+        with open("tests/resources/stemcell.json") as mock_data:
+            stemcells = json.load(mock_data)
+        mock_requests_get.side_effect = lambda *args, **kwargs: api_response(stemcells)
+        mock_download_stemcell.return_value = os.path.join(tmp_dir, "fake-stemcell.tgz")
+        self.mock_azure_manager.gallery_image_version_exists.return_value = False
+        self.mock_azure_manager.upload_vhd.return_value = "https://account/stemcell/bosh-stemcell-1.682.0.vhd"
+        provisioned = self.mock_azure_manager.create_gallery_image_version.return_value
+        self.mock_azure_manager.create_gallery_image_version.side_effect = [RuntimeError("interrupted"), provisioned]
+        mock_notifier = MagicMock()
+        checkpoint_file = os.path.join(tmp_dir, "checkpoints.json")
+
+        def run():
+            BoshIoJammyMirror(
+                azure_manager=self.mock_azure_manager,
+                gallery_name="test-gallery",
+                gallery_image_name="test-image",
+                extraction_directory=tmp_dir,
+                notifier=mock_notifier,
+                checkpoints=CheckpointStore(checkpoint_file),
+            ).run()
+
+        with self.assertRaisesRegex(RuntimeError, "interrupted"):
+            run()
+        run()
+
+        mock_download_stemcell.assert_called_once()
+        self.mock_azure_manager.upload_vhd.assert_called_once()
+        self.assertEqual(self.mock_azure_manager.check_or_create_gallery_image.call_count, 2)
+        self.assertEqual(self.mock_azure_manager.check_or_create_gallery_image.call_args.args[3]["os_type"], "linux")
+        self.mock_azure_manager.create_gallery_image_version.assert_called_with(
+            "test-gallery", "test-image", "1.682.0", "https://account/stemcell/bosh-stemcell-1.682.0.vhd"
+        )
+        mock_notifier.notify_new_stemcell.assert_called_once()
+        self.assertEqual(
+            CheckpointStore(checkpoint_file)
+            .load(JAMMY_SERIES, "1.682.0", "sha256:" + stemcells[0]["regular"]["sha256"])
+            .stage,
+            STAGE_NOTIFIED,
+        )
+
+        self.mock_azure_manager.gallery_image_version_exists.return_value = True
+        run()
+
+        mock_notifier.notify_new_stemcell.assert_called_once()
+        self.mock_azure_manager.follow_gallery_image_version.assert_not_called()
+
+    @patch("requests.get")
+    def test_killed_download_resumes_on_the_next_run(self, mock_requests_get):
+        with open(os.path.join("tests", "resources", "fake-stemcell.tgz"), "rb") as stemcell:
+            payload = stemcell.read()
+        sha256 = hashlib.sha256(payload).hexdigest()
+        mock_requests_get.side_effect = lambda *args, **kwargs: api_response(
+            [{"version": "1.682", "regular": {"url": "https://fake-url/stemcell.tgz", "sha256": sha256}}]
+        )
+        session = make_session(payload)
+        serve = session.get.side_effect
+        killed = [True]
+
+        def get(url, headers=None, **kwargs):
+            if killed[0] and headers["Range"].startswith("bytes=200-"):
+                raise DownloadError("killed")
+            return serve(url, headers=headers, **kwargs)
+
+        session.get.side_effect = get
+        self.mock_azure_manager.gallery_image_version_exists.return_value = False
+        mirror = BoshIoJammyMirror(
+            azure_manager=self.mock_azure_manager,
+            gallery_name="test-gallery",
+            extraction_directory=tmp_dir,
+            downloader=RangedDownloader(workers=1, segment_size=100, session=session),
+        )
+
+        with self.assertRaisesRegex(DownloadError, "killed"):
+            mirror.run()
+        self.assertEqual(len(os.listdir(tmp_dir)), 2)
+        killed[0] = False
+        session.get.reset_mock()
+        mirror.run()
+
+        requested = [call.kwargs["headers"]["Range"] for call in session.get.call_args_list]
+        self.assertNotIn("bytes=0-99", requested)
+        self.assertEqual(requested[0], "bytes=200-299")
+        self.mock_azure_manager.create_gallery_image_version.assert_called_once()
+        self.assertEqual(os.listdir(tmp_dir), ["fake-stemcell.tgz"])
+
+    @patch("src.mirror.bosh_io.BoshIoStemcellMirror._download_stemcell")
+    @patch("requests.get")
+    def test_interrupted_run_uploads_again_when_its_blob_is_gone(self, mock_requests_get, mock_download_stemcell):
+        with open("tests/resources/stemcell.json") as mock_data:
+            stemcells = json.load(mock_data)
+        mock_requests_get.side_effect = lambda *args, **kwargs: api_response(stemcells)
+        mock_download_stemcell.return_value = os.path.join(tmp_dir, "fake-stemcell.tgz")
+        self.mock_azure_manager.gallery_image_version_exists.return_value = False
+        self.mock_azure_manager.upload_vhd.side_effect = [
+            "https://account/stemcell/a.vhd",
+            "https://account/stemcell/b.vhd",
+        ]
+        self.mock_azure_manager.holds_vhd.return_value = False
+        provisioned = self.mock_azure_manager.create_gallery_image_version.return_value
+        self.mock_azure_manager.create_gallery_image_version.side_effect = [RuntimeError("interrupted"), provisioned]
+        checkpoint_file = os.path.join(tmp_dir, "checkpoints.json")
+
+        def run():
+            BoshIoJammyMirror(
+                azure_manager=self.mock_azure_manager,
+                gallery_name="test-gallery",
+                gallery_image_name="test-image",
+                extraction_directory=tmp_dir,
+                checkpoints=CheckpointStore(checkpoint_file),
+            ).run()
+
+        with self.assertRaisesRegex(RuntimeError, "interrupted"):
+            run()
+        run()
+
+        self.mock_azure_manager.holds_vhd.assert_called_once_with(
+            "https://account/stemcell/a.vhd", 14, "db38d2e65e5d2b944c134d7a848a183379f3c9ec062de024938433594ae673e9"
+        )
+        self.assertEqual(mock_download_stemcell.call_count, 2)
+        self.mock_azure_manager.create_gallery_image_version.assert_called_with(
+            "test-gallery", "test-image", "1.682.0", "https://account/stemcell/b.vhd"
+        )
+        checkpoint = CheckpointStore(checkpoint_file).load(
+            JAMMY_SERIES, "1.682.0", "sha256:" + stemcells[0]["regular"]["sha256"]
+        )
+        self.assertEqual((checkpoint.stage, checkpoint.blob_uri), (STAGE_PROVISIONED, "https://account/stemcell/b.vhd"))
+
+    @patch("src.mirror.bosh_io.BoshIoStemcellMirror._download_stemcell")
+    @patch("requests.get")
+    def test_failed_version_from_resumed_blob_uploads_again(self, mock_requests_get, mock_download_stemcell):
+        with open("tests/resources/stemcell.json") as mock_data:
+            stemcells = json.load(mock_data)
+        mock_requests_get.side_effect = lambda *args, **kwargs: api_response(stemcells)
+        mock_download_stemcell.return_value = os.path.join(tmp_dir, "fake-stemcell.tgz")
+        self.mock_azure_manager.gallery_image_version_exists.return_value = False
+        self.mock_azure_manager.upload_vhd.return_value = "https://account/stemcell/a.vhd"
+        self.mock_azure_manager.holds_vhd.return_value = True
+        failed = Future()
+        failed.set_exception(RuntimeError("provisioning failed"))
+        provisioned = self.mock_azure_manager.create_gallery_image_version.return_value
+        self.mock_azure_manager.create_gallery_image_version.side_effect = [
+            RuntimeError("interrupted"),
+            failed,
+            provisioned,
+        ]
+        checkpoint_file = os.path.join(tmp_dir, "checkpoints.json")
+
+        def run():
+            BoshIoJammyMirror(
+                azure_manager=self.mock_azure_manager,
+                gallery_name="test-gallery",
+                gallery_image_name="test-image",
+                extraction_directory=tmp_dir,
+                checkpoints=CheckpointStore(checkpoint_file),
+            ).run()
+
+        with self.assertRaisesRegex(RuntimeError, "interrupted"):
+            run()
+        with self.assertRaisesRegex(RuntimeError, "provisioning failed"):
+            run()
+        self.assertEqual(mock_download_stemcell.call_count, 1)
+        run()
+
+        self.assertEqual(mock_download_stemcell.call_count, 2)
+        self.assertEqual(self.mock_azure_manager.upload_vhd.call_count, 2)
+        self.mock_azure_manager.holds_vhd.assert_called_once()
+
+    @patch("requests.get")
+    def test_requested_version_is_awaited_and_announced(self, mock_requests_get):
+        with open("tests/resources/stemcell.json") as mock_data:
+            stemcells = json.load(mock_data)
+        mock_requests_get.return_value = api_response(stemcells)
+        self.mock_azure_manager.gallery_image_version_exists.return_value = True
+        provisioned = Future()
+        provisioned.set_result(MagicMock())
+        self.mock_azure_manager.follow_gallery_image_version.return_value = provisioned
+        checkpoints = CheckpointStore()
+        checkpoints.load(JAMMY_SERIES, "1.682.0", "sha256:" + stemcells[0]["regular"]["sha256"])
+        checkpoints.advance(JAMMY_SERIES, "1.682.0", STAGE_REQUESTED, blob_uri="https://account/stemcell/a.vhd")
+        mock_notifier = MagicMock()
+        mirror = BoshIoJammyMirror(
+            azure_manager=self.mock_azure_manager,
+            gallery_name="test-gallery",
+            gallery_image_name="test-image",
+            notifier=mock_notifier,
+            checkpoints=checkpoints,
+        )
+
+        mirror.run()
+
+        self.mock_azure_manager.follow_gallery_image_version.assert_called_once_with(
+            "test-gallery", "test-image", "1.682.0"
+        )
+        self.mock_azure_manager.upload_vhd.assert_not_called()
+        self.mock_azure_manager.create_gallery_image_version.assert_not_called()
+        mock_notifier.notify_new_stemcell.assert_called_once()
+
     @patch("requests.get")
     def test_run_no_download_url(self, mock_requests_get):
         mock_response = MagicMock()
         mock_response.status_code = 200
-        mock_response.json.return_value = [{"version": "45.6"}]  # No 'regular.url'
+        mock_response.iter_content.return_value = listing_chunks([{"version": "45.6"}])  # No 'regular.url'
         mock_response.raise_for_status = MagicMock()
         mock_requests_get.return_value = mock_response
 
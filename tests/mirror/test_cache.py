@@ -0,0 +1,79 @@
+import os
+import shutil
+import unittest
+
+from src.mirror.cache import STAGE_DOWNLOADED, ArtifactCache
+from src.mirror.download import Checksum
+
+tmp_dir = os.path.join("tests", "tmp-cache")
+
+
+def write_file(path: str, size: int) -> None:
+    with open(path, "wb") as target:
+        target.write(os.urandom(size))
+
+
+class TestArtifactCache(unittest.TestCase):
+    def setUp(self):
+        os.makedirs(tmp_dir, exist_ok=True)
+
+    def tearDown(self):
+        shutil.rmtree(tmp_dir)
+
+    def test_entry_is_keyed_by_digest(self):
+        cache = ArtifactCache(tmp_dir, 1024)
+
+        entry = cache.entry(Checksum("sha256", "ABCDEF"))
+
+        self.assertEqual(entry, os.path.join(tmp_dir, "sha256-abcdef"))
+        self.assertTrue(os.path.isdir(entry))
+        self.assertEqual(cache.entry(Checksum("sha256", "abcdef")), entry)
+
+    def test_mark_records_completed_stage(self):
+        cache = ArtifactCache(tmp_dir, 1024)
+        entry = cache.entry(Checksum("sha1", "01"))
+
+        self.assertFalse(cache.is_marked(entry, STAGE_DOWNLOADED))
+        cache.mark(entry, STAGE_DOWNLOADED)
+
+        self.assertTrue(cache.is_marked(entry, STAGE_DOWNLOADED))
+
+    def test_evict_removes_least_recently_used_entries(self):
+        cache = ArtifactCache(tmp_dir, 300 * 1024)
+        entries = [cache.entry(Checksum("sha1", digest)) for digest in ("01", "02", "03")]
+        for age, entry in enumerate(entries):
+            write_file(os.path.join(entry, "stemcell.tgz"), 128 * 1024)
+            os.utime(entry, (1000 + age, 1000 + age))
+        os.utime(entries[0])
+
+        cache.evict()
+
+        self.assertEqual([os.path.isdir(entry) for entry in entries], [True, False, True])
+
+    def test_evict_keeps_entry_in_use(self):
+        cache = ArtifactCache(tmp_dir, 1)
+        entry = cache.entry(Checksum("sha1", "01"))
+        write_file(os.path.join(entry, "stemcell.tgz"), 64 * 1024)
+
+        cache.evict(keep=entry)
+
+        self.assertTrue(os.path.isdir(entry))
+
+    def test_evict_keeps_entries_used_by_other_mirrors(self):
+        cache = ArtifactCache(tmp_dir, 1)
+        with cache.use(Checksum("sha1", "01")) as first:
+            write_file(os.path.join(first, "stemcell.tgz"), 64 * 1024)
+            with cache.use(Checksum("sha1", "02")) as second:
+                write_file(os.path.join(second, "stemcell.tgz"), 64 * 1024)
+
+            self.assertEqual([os.path.isdir(first), os.path.isdir(second)], [True, True])
+
+        self.assertEqual([os.path.isdir(first), os.path.isdir(second)], [True, False])
+
+    def test_invalid_size_raises(self):
+        with self.assertRaises(ValueError):
+            ArtifactCache(tmp_dir, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import json
+import os
+import shutil
+import unittest
+from unittest.mock import MagicMock
+
+from src.mirror.checkpoint import (
+    STAGE_EXTRACTED,
+    STAGE_NOTIFIED,
+    STAGE_REQUESTED,
+    STAGE_UPLOADED,
+    CheckpointStore,
+)
+
+tmp_dir = os.path.join("tests", "tmp-checkpoint")
+SERIES = "bosh-azure-hyperv-ubuntu-jammy-go_agent"
+DIGEST = "sha256:181fa9d348fd9af2d1ff55da9c081889873c39abb75a18b2e9622d92b2eae52f"
+
+
+class TestCheckpointStore(unittest.TestCase):
+    def setUp(self):
+        os.makedirs(tmp_dir, exist_ok=True)
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        self.path = os.path.join(tmp_dir, "checkpoints.json")
+
+    def test_stages_only_advance_and_persist_across_runs(self):
+        store = CheckpointStore(self.path)
+        checkpoint = store.load(SERIES, "1.682.0", DIGEST)
+        self.assertIsNone(checkpoint.stage)
+
+        store.advance(SERIES, "1.682.0", STAGE_UPLOADED, blob_uri="https://account/stemcell/a.vhd", manifest="name: x")
+        store.advance(SERIES, "1.682.0", STAGE_EXTRACTED)
+
+        self.assertEqual(checkpoint.stage, STAGE_UPLOADED)
+        self.assertTrue(checkpoint.reached(STAGE_EXTRACTED))
+        self.assertFalse(checkpoint.reached(STAGE_REQUESTED))
+        resumed = CheckpointStore(self.path).load(SERIES, "1.682.0", DIGEST)
+        self.assertEqual(resumed, checkpoint)
+
+    def test_rewind_moves_back_to_an_earlier_stage(self):
+        store = CheckpointStore(self.path)
+        store.load(SERIES, "1.682.0", DIGEST)
+        store.advance(SERIES, "1.682.0", STAGE_NOTIFIED)
+
+        store.rewind(SERIES, "1.682.0", STAGE_UPLOADED)
+        store.rewind(SERIES, "1.682.0", STAGE_REQUESTED)
+
+        self.assertEqual(CheckpointStore(self.path).load(SERIES, "1.682.0", DIGEST).stage, STAGE_UPLOADED)
+
+    def test_rewind_before_upload_forgets_the_blob(self):
+        store = CheckpointStore(self.path)
+        checkpoint = store.load(SERIES, "1.682.0", DIGEST)
+        blob_uri = "https://account/stemcell/a.vhd"
+        store.advance(SERIES, "1.682.0", STAGE_REQUESTED, blob_uri=blob_uri, vhd_size=1024, vhd_sha256="ab")
+        self.assertEqual((checkpoint.vhd_size, checkpoint.vhd_sha256), (1024, "ab"))
+
+        store.rewind(SERIES, "1.682.0", STAGE_EXTRACTED)
+
+        resumed = CheckpointStore(self.path).load(SERIES, "1.682.0", DIGEST)
+        self.assertEqual(resumed.stage, STAGE_EXTRACTED)
+        self.assertEqual((resumed.blob_uri, resumed.vhd_size, resumed.vhd_sha256), (None, None, None))
+
+    def test_another_digest_starts_over(self):
+        store = CheckpointStore(self.path)
+        store.load(SERIES, "1.682.0", DIGEST)
+        store.advance(SERIES, "1.682.0", STAGE_UPLOADED, blob_uri="https://account/stemcell/a.vhd")
+
+        republished = CheckpointStore(self.path).load(SERIES, "1.682.0", "sha256:0000")
+
+        self.assertIsNone(republished.stage)
+        self.assertIsNone(republished.blob_uri)
+
+    def test_stemcells_without_digest_are_not_saved(self):
+        store = CheckpointStore(self.path)
+        store.load(SERIES, "1.682.0", None)
+        store.advance(SERIES, "1.682.0", STAGE_UPLOADED)
+
+        with open(self.path) as saved:
+            self.assertEqual(json.load(saved), {})
+
+    def test_unreadable_file_is_ignored(self):
+        with open(self.path, "w") as corrupt:
+            corrupt.write("{not json")
+        logger = MagicMock()
+
+        checkpoint = CheckpointStore(self.path, logger=logger).load(SERIES, "1.682.0", DIGEST)
+
+        self.assertIsNone(checkpoint.stage)
+        logger.warning.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
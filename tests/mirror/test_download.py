@@ -0,0 +1,160 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import unittest
+from unittest.mock import MagicMock
+
+from src.mirror.download import Checksum, ChecksumMismatchError, DownloadError, RangedDownloader
+
+tmp_dir = os.path.join("tests", "tmp-download")
+
+PAYLOAD = bytes(range(256)) * 40  # 10240 bytes
+URL = "https://example.com/stemcell.tgz"
+PAYLOAD_SHA256 = Checksum("sha256", hashlib.sha256(PAYLOAD).hexdigest())
+WRONG_SHA1 = Checksum("sha1", "0" * 40)
+
+
+def make_response(status_code: int = 200, headers: dict | None = None, body: bytes = b"") -> MagicMock:
+    response = MagicMock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    response.raise_for_status = MagicMock()
+    response.iter_content.side_effect = lambda chunk_size: iter(
+        [body[i : i + chunk_size] for i in range(0, len(body), chunk_size)]
+    )
+    response.__enter__.return_value = response
+    return response
+
+
+def make_session(payload: bytes = PAYLOAD, accept_ranges: bool = True, honour_ranges: bool = True) -> MagicMock:
+    session = MagicMock()
+    headers = {"Content-Length": str(len(payload))}
+    if accept_ranges:
+        headers["Accept-Ranges"] = "bytes"
+    session.head.return_value = make_response(headers=headers)
+
+    def get(url, headers=None, **kwargs):
+        range_header = (headers or {}).get("Range")
+        if not range_header or not honour_ranges:
+            return make_response(body=payload)
+        start, end = (int(value) for value in range_header.removeprefix("bytes=").split("-"))
+        return make_response(status_code=206, body=payload[start : end + 1])
+
+    session.get.side_effect = get
+    return session
+
+
+class TestRangedDownloader(unittest.TestCase):
+    def setUp(self):
+        os.makedirs(tmp_dir, exist_ok=True)
+        self.path = os.path.join(tmp_dir, "stemcell.tgz")
+
+    def tearDown(self):
+        shutil.rmtree(tmp_dir)
+
+    def test_download_in_ranges(self):
+        session = make_session()
+        downloader = RangedDownloader(workers=3, segment_size=1000, session=session)
+
+        result = downloader.download(URL, self.path)
+
+        self.assertEqual(result, self.path)
+        with open(self.path, "rb") as downloaded:
+            self.assertEqual(downloaded.read(), PAYLOAD)
+        self.assertEqual(session.get.call_count, 11)
+        self.assertFalse(os.path.exists(f"{self.path}.parts"))
+
+    def test_download_resumes_missing_segments(self):
+        with open(self.path, "wb") as partial:
+            partial.write(PAYLOAD[:4000] + bytes(len(PAYLOAD) - 4000))
+        with open(f"{self.path}.parts", "w") as sidecar:
+            json.dump({"url": URL, "size": len(PAYLOAD), "segment_size": 1000, "completed": [0, 1, 2, 3]}, sidecar)
+        session = make_session()
+        downloader = RangedDownloader(workers=2, segment_size=1000, session=session)
+
+        downloader.download(URL, self.path)
+
+        with open(self.path, "rb") as downloaded:
+            self.assertEqual(downloaded.read(), PAYLOAD)
+        requested = sorted(call.kwargs["headers"]["Range"] for call in session.get.call_args_list)
+        self.assertEqual(len(requested), 7)
+        self.assertNotIn("bytes=0-999", requested)
+
+    def test_download_ignores_mismatched_progress(self):
+        with open(self.path, "wb") as partial:
+            partial.write(bytes(len(PAYLOAD)))
+        with open(f"{self.path}.parts", "w") as sidecar:
+            json.dump({"url": URL, "size": len(PAYLOAD), "segment_size": 500, "completed": [0]}, sidecar)
+        session = make_session()
+
+        RangedDownloader(workers=2, segment_size=1000, session=session).download(URL, self.path)
+
+        self.assertEqual(session.get.call_count, 11)
+        with open(self.path, "rb") as downloaded:
+            self.assertEqual(downloaded.read(), PAYLOAD)
+
+    def test_download_falls_back_without_range_support(self):
+        session = make_session(accept_ranges=False)
+
+        RangedDownloader(session=session).download(URL, self.path)
+
+        session.get.assert_called_once()
+        self.assertNotIn("headers", session.get.call_args.kwargs)
+        with open(self.path, "rb") as downloaded:
+            self.assertEqual(downloaded.read(), PAYLOAD)
+
+    def test_download_raises_when_range_is_ignored(self):
+        session = make_session(honour_ranges=False)
+        downloader = RangedDownloader(workers=1, segment_size=1000, session=session)
+
+        with self.assertRaises(DownloadError):
+            downloader.download(URL, self.path)
+
+        self.assertTrue(os.path.exists(f"{self.path}.parts"))
+
+    def test_download_verifies_checksum(self):
+        for accept_ranges in (True, False):
+            with self.subTest(accept_ranges=accept_ranges):
+                session = make_session(accept_ranges=accept_ranges)
+                downloader = RangedDownloader(workers=3, segment_size=1000, session=session)
+
+                downloader.download(URL, self.path, PAYLOAD_SHA256)
+
+                with open(self.path, "rb") as downloaded:
+                    self.assertEqual(downloaded.read(), PAYLOAD)
+
+    def test_download_removes_file_on_checksum_mismatch(self):
+        for accept_ranges in (True, False):
+            with self.subTest(accept_ranges=accept_ranges):
+                downloader = RangedDownloader(session=make_session(accept_ranges=accept_ranges))
+
+                with self.assertRaises(ChecksumMismatchError):
+                    downloader.download(URL, self.path, WRONG_SHA1)
+
+                self.assertFalse(os.path.exists(self.path))
+
+    def test_stream_verifies_checksum_after_partial_read(self):
+        session = MagicMock()
+        session.get.return_value = make_response()
+        session.get.return_value.raw = io.BytesIO(PAYLOAD)
+        downloader = RangedDownloader(session=session)
+
+        with downloader.stream(URL, PAYLOAD_SHA256) as body:
+            self.assertEqual(body.read(10), PAYLOAD[:10])
+
+        session.get.return_value.raw = io.BytesIO(PAYLOAD)
+        with self.assertRaises(ChecksumMismatchError):
+            with downloader.stream(URL, WRONG_SHA1) as body:
+                body.read(10)
+
+    def test_invalid_settings_raise(self):
+        with self.assertRaises(ValueError):
+            RangedDownloader(workers=0)
+        with self.assertRaises(ValueError):
+            RangedDownloader(segment_size=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+import io
+import os
+import shutil
+import tarfile
+import unittest
+
+from src.mirror.extract import ExtractionError, extract_stemcell, walk_stemcell
+from src.sparse import load_range_map
+
+tmp_dir = os.path.join("tests", "tmp-extract")
+
+VHD_CONTENT = b"conectix" + bytes(8192) + b"vhd-footer"
+MANIFEST_CONTENT = b"---\nname: test\ncloud_properties:\n  architecture: x86_64\n"
+
+
+def make_tar(members: dict[str, bytes], mode: str) -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode=mode) as tar:
+        for name, content in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            tar.addfile(info, io.BytesIO(content))
+    return buffer.getvalue()
+
+
+def make_stemcell(extra_members: dict[str, bytes] | None = None, manifest_first: bool = False) -> bytes:
+    image = make_tar({"./root.vhd": VHD_CONTENT}, "w:gz")
+    members = {"./image": image, "./stemcell.MF": MANIFEST_CONTENT}
+    if manifest_first:
+        members = {"./stemcell.MF": MANIFEST_CONTENT, "./image": image}
+    members.update(extra_members or {})
+    return make_tar(members, "w:gz")
+
+
+class NonSeekableStream(io.RawIOBase):
+    """Mimics an HTTP response body, which can only be read forwards."""
+
+    def __init__(self, data: bytes) -> None:
+        self._buffer = io.BytesIO(data)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, target) -> int:
+        chunk = self._buffer.read(len(target))
+        target[: len(chunk)] = chunk
+        return len(chunk)
+
+
+class TestExtract(unittest.TestCase):
+    def setUp(self):
+        os.makedirs(tmp_dir, exist_ok=True)
+
+    def tearDown(self):
+        shutil.rmtree(tmp_dir)
+
+    def test_extract_stemcell_from_stream(self):
+        extracted = extract_stemcell(NonSeekableStream(make_stemcell({"./apply_spec.yml": b"spec"})), tmp_dir)
+
+        vhd_path = extracted.vhd_path
+        self.assertEqual(vhd_path, os.path.join(tmp_dir, "root.vhd"))
+        self.assertEqual(extracted.skipped_members, ["apply_spec.yml"])
+        with open(vhd_path, "rb") as vhd:
+            self.assertEqual(vhd.read(), VHD_CONTENT)
+        with open(os.path.join(tmp_dir, "stemcell.MF"), "rb") as manifest:
+            self.assertEqual(manifest.read(), MANIFEST_CONTENT)
+        self.assertFalse(os.path.exists(os.path.join(tmp_dir, "image")))
+        self.assertEqual(load_range_map(vhd_path), [(0, 4096), (8192, len(VHD_CONTENT))])
+
+    def test_extract_stemcell_reports_manifest_before_vhd(self):
+        vhd_path = os.path.join(tmp_dir, "root.vhd")
+        manifests = []
+
+        extract_stemcell(
+            NonSeekableStream(make_stemcell(manifest_first=True)),
+            tmp_dir,
+            on_manifest=lambda content: manifests.append((content, os.path.exists(vhd_path))),
+        )
+
+        self.assertEqual(manifests, [(MANIFEST_CONTENT, False)])
+
+    def test_extract_stemcell_reports_manifest_after_vhd_in_image_first_order(self):
+        vhd_path = os.path.join(tmp_dir, "root.vhd")
+        manifests = []
+
+        extract_stemcell(
+            NonSeekableStream(make_stemcell()),
+            tmp_dir,
+            on_manifest=lambda content: manifests.append((content, os.path.exists(vhd_path))),
+        )
+
+        self.assertEqual(manifests, [(MANIFEST_CONTENT, True)])
+
+    def test_extract_fake_stemcell_resource(self):
+        with open(os.path.join("tests", "resources", "fake-stemcell.tgz"), "rb") as stemcell:
+            extracted = extract_stemcell(NonSeekableStream(stemcell.read()), tmp_dir)
+
+        self.assertTrue(os.path.exists(extracted.vhd_path))
+        self.assertEqual(extracted.skipped_members, ["._image", "image/._root.vhd", "._stemcell.MF"])
+        self.assertTrue(os.path.exists(os.path.join(tmp_dir, "stemcell.MF")))
+        self.assertEqual(sorted(os.listdir(tmp_dir)), ["root.vhd", "root.vhd.map", "stemcell.MF"])
+
+    def test_walk_stemcell_dispatches_only_handled_members(self):
+        seen: dict[str, bytes] = {}
+
+        def record(stream, member):
+            seen[member.name] = stream.read()
+
+        skipped = walk_stemcell(
+            NonSeekableStream(make_stemcell({"./apply_spec.yml": b"spec"})),
+            {"root.vhd": record, "apply_spec.yml": record},
+        )
+
+        self.assertEqual(seen, {"./root.vhd": VHD_CONTENT, "./apply_spec.yml": b"spec"})
+        self.assertEqual(skipped, ["stemcell.MF"])
+
+    def test_walk_stemcell_rejects_linked_wanted_member(self):
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+            link = tarfile.TarInfo("./stemcell.MF")
+            link.type = tarfile.SYMTYPE
+            link.linkname = "/etc/passwd"
+            tar.addfile(link)
+        buffer.seek(0)
+
+        with self.assertRaises(ExtractionError):
+            extract_stemcell(buffer, tmp_dir)
+
+        self.assertEqual(os.listdir(tmp_dir), [])
+
+    def test_walk_stemcell_rejects_duplicate_wanted_member(self):
+        stemcell = make_tar(
+            {"./image": make_tar({"./root.vhd": VHD_CONTENT}, "w"), "stemcell.MF": b"a", "./stemcell.MF": b"b"},
+            "w:gz",
+        )
+
+        with self.assertRaises(ExtractionError):
+            extract_stemcell(io.BytesIO(stemcell), tmp_dir)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+import json
+import os
+import shutil
+import unittest
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from src.mirror.metadata import BoshIoMetadataClient, iter_listing
+
+tmp_dir = os.path.join("tests", "tmp-metadata")
+SERIES = "bosh-azure-hyperv-ubuntu-jammy-go_agent"
+
+
+def listing_chunks(stemcells: list[dict], chunk_size: int = 7) -> list[bytes]:
+    """The bosh.io listing of ``stemcells`` as the chunks of a streamed response."""
+    content: bytes = json.dumps(stemcells, indent=2).encode()
+    return [content[offset : offset + chunk_size] for offset in range(0, len(content), chunk_size)]
+
+
+def api_response(stemcells: list[dict], status_code: int = 200, headers: dict | None = None) -> MagicMock:
+    response = MagicMock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    response.iter_content.return_value = listing_chunks(stemcells)
+    return response
+
+
+class TestIterListing(unittest.TestCase):
+    def test_parses_elements_split_across_chunks(self):
+        stemcells = [{"version": "1.2", "name": "ünïcode"}, {"version": "1.1", "regular": {"url": "u"}}]
+
+        for chunk_size in (1, 3, 1000):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(list(iter_listing(listing_chunks(stemcells, chunk_size))), stemcells)
+        self.assertEqual(list(iter_listing([b"[]"])), [])
+
+    def test_stops_reading_at_the_end_of_the_array(self):
+        chunks = iter([b'[{"version": "1"}', b"]", b"ignored"])
+
+        self.assertEqual(list(iter_listing(chunks)), [{"version": "1"}])
+        self.assertEqual(next(chunks), b"ignored")
+
+    def test_invalid_listing_raises(self):
+        for content in (b'{"version": "1"}', b'[{"version": "1"}', b"[1, 2]"):
+            with self.subTest(content=content), self.assertRaises(ValueError):
+                list(iter_listing([content]))
+
+
+class TestBoshIoMetadataClient(unittest.TestCase):
+    def setUp(self):
+        os.makedirs(tmp_dir, exist_ok=True)
+        self.path = os.path.join(tmp_dir, "bosh-io.json")
+        with open(os.path.join("tests", "resources", "stemcell.json")) as source:
+            self.stemcells = json.load(source)
+
+    def tearDown(self):
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    @patch("requests.get")
+    def test_keeps_compact_entries(self, mock_get):
+        mock_get.return_value = api_response(self.stemcells)
+
+        listing = BoshIoMetadataClient().fetch(SERIES)
+
+        self.assertTrue(listing.changed)
+        self.assertEqual(len(listing.stemcells), len(self.stemcells))
+        self.assertEqual(
+            listing.stemcells[0],
+            {
+                "version": "1.682",
+                "regular": {
+                    "url": self.stemcells[0]["regular"]["url"],
+                    "size": 1253467594,
+                    "sha1": "c7d0acef5605a4c4e9dd55e03bbef5eb08b30137",
+                    "sha256": "181fa9d348fd9af2d1ff55da9c081889873c39abb75a18b2e9622d92b2eae52f",
+                },
+            },
+        )
+        self.assertEqual(mock_get.call_args.kwargs["headers"], {})
+
+    @patch("requests.get")
+    def test_revalidates_indexed_listing_across_runs(self, mock_get):
+        mock_get.return_value = api_response(self.stemcells, headers={"ETag": '"v1"', "Last-Modified": "yesterday"})
+        client = BoshIoMetadataClient(path=self.path)
+        client.fetch(SERIES)
+        client.mark_mirrored(SERIES, "selection")
+        mock_get.return_value = api_response([], status_code=304)
+
+        listing = BoshIoMetadataClient(path=self.path).fetch(SERIES)
+
+        self.assertEqual(
+            mock_get.call_args.kwargs["headers"], {"If-None-Match": '"v1"', "If-Modified-Since": "yesterday"}
+        )
+        self.assertFalse(listing.changed)
+        self.assertEqual(listing.mirrored, "selection")
+        self.assertEqual(listing.stemcells[0]["version"], "1.682")
+
+    @patch("requests.get")
+    def test_releases_the_connection_of_every_response(self, mock_get):
+        ok = mock_get.return_value = api_response(self.stemcells, headers={"ETag": '"v1"'})
+        client = BoshIoMetadataClient()
+        client.fetch(SERIES)
+        not_modified = mock_get.return_value = api_response([], status_code=304)
+        client.fetch(SERIES)
+        failed = mock_get.return_value = api_response([], status_code=500)
+        failed.raise_for_status.side_effect = requests.HTTPError("500 Server Error")
+
+        with self.assertRaises(requests.HTTPError):
+            client.fetch(SERIES)
+
+        for response in (ok, not_modified, failed):
+            response.__exit__.assert_called_once()
+
+    @patch("requests.get")
+    def test_same_content_without_validators_is_unchanged(self, mock_get):
+        mock_get.return_value = api_response(self.stemcells)
+        client = BoshIoMetadataClient()
+        client.fetch(SERIES)
+        client.mark_mirrored(SERIES, "selection")
+
+        unchanged = client.fetch(SERIES)
+        mock_get.return_value = api_response(self.stemcells[1:])
+        changed = client.fetch(SERIES)
+
+        self.assertEqual((unchanged.changed, unchanged.mirrored), (False, "selection"))
+        self.assertEqual((changed.changed, changed.mirrored), (True, None))
+
+    @patch("requests.get")
+    def test_ignores_unreadable_index(self, mock_get):
+        with open(self.path, "w") as f:
+            f.write("not json")
+        mock_get.return_value = api_response(self.stemcells)
+        logger = MagicMock()
+
+        listing = BoshIoMetadataClient(path=self.path, logger=logger).fetch(SERIES)
+
+        self.assertTrue(listing.changed)
+        logger.warning.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import threading
+import time
+import unittest
+
+from src.mirror.pipeline import Stage, run_pipeline
+
+
+class TestRunPipeline(unittest.TestCase):
+    def test_stages_overlap_across_items(self):
+        lock = threading.Lock()
+        active: set[tuple[str, int]] = set()
+        overlaps: list[set[tuple[str, int]]] = []
+
+        def stage(name):
+            def work(item):
+                with lock:
+                    active.add((name, item))
+                    overlaps.append(set(active))
+                time.sleep(0.02)
+                with lock:
+                    active.discard((name, item))
+
+            return Stage(name, work)
+
+        failures = run_pipeline(range(3), [stage("fetch"), stage("upload"), stage("publish")])
+
+        self.assertEqual(failures, [])
+        self.assertTrue(any({("fetch", 1), ("upload", 0)} <= seen for seen in overlaps))
+        self.assertTrue(any({("fetch", 2), ("upload", 1), ("publish", 0)} <= seen for seen in overlaps))
+
+    def test_failed_item_is_dropped_without_stopping_others(self):
+        published: list[int] = []
+        error = RuntimeError("boom")
+
+        def fetch(item):
+            if item == 1:
+                raise error
+
+        failures = run_pipeline(
+            range(4), [Stage("fetch", fetch, workers=2), Stage("publish", published.append)], queue_size=2
+        )
+
+        self.assertEqual(failures, [(1, error)])
+        self.assertEqual(sorted(published), [0, 2, 3])
+
+    def test_invalid_settings_raise(self):
+        with self.assertRaises(ValueError):
+            run_pipeline([], [])
+        with self.assertRaises(ValueError):
+            run_pipeline([], [Stage("fetch", print, workers=0)])
+
+
+if __name__ == "__main__":
+    unittest.main()
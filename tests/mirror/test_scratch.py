@@ -0,0 +1,40 @@
+import threading
+import time
+import unittest
+
+from src.mirror.scratch import ScratchBudget
+
+
+class TestScratchBudget(unittest.TestCase):
+    def test_reserve_blocks_until_space_is_released(self):
+        budget = ScratchBudget(100)
+        events = []
+
+        def reserve_second():
+            with budget.reserve(60):
+                events.append("second")
+
+        with budget.reserve(60):
+            thread = threading.Thread(target=reserve_second)
+            thread.start()
+            time.sleep(0.02)
+            events.append("first released")
+        thread.join()
+
+        self.assertEqual(events, ["first released", "second"])
+
+    def test_oversized_reservation_is_capped(self):
+        budget = ScratchBudget(100)
+
+        with budget.reserve(1000):
+            pass
+        with budget.reserve(100):
+            pass
+
+    def test_invalid_size_raises(self):
+        with self.assertRaises(ValueError):
+            ScratchBudget(0)
+
+
+if __name__ == "__main__":
+    unittest.main()
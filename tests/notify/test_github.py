@@ -48,6 +48,15 @@ class TestGitHubNotifier(unittest.TestCase):
             "test-gallery-rg",
         )
 
+    def test_notify_sends_through_session(self) -> None:
+        session = MagicMock()
+        session.post.return_value.status_code = 204
+
+        GitHubNotifier(self.config, session=session).notify_new_stemcell({"gallery_image_version": "1.2.3"})
+
+        session.post.assert_called_once()
+        self.assertEqual(session.post.call_args.kwargs["timeout"], 5)
+
     @patch("src.notify.github.requests.post")
     def test_notify_failure_raises(self, mock_post: MagicMock) -> None:
         mock_response = MagicMock()
@@ -1,6 +1,8 @@
 import unittest
 import unittest.mock
-from unittest.mock import MagicMock, mock_open, patch
+from concurrent.futures import Future
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
 
 from azure.core.exceptions import ResourceNotFoundError
 
@@ -8,9 +10,13 @@ from src.azure_manager import AzureManager, _normalize_architecture
 
 
 class TestAzureManager(unittest.TestCase):
-    @patch("src.azure_manager.DefaultAzureCredential")
-    @patch("src.azure_manager.ComputeManagementClient")
-    def setUp(self, mock_compute_client: MagicMock, mock_credential: MagicMock) -> None:
+    def setUp(self) -> None:
+        # The SDK clients are created on first use, so they stay patched for the whole test.
+        for target in ("azure.identity.ManagedIdentityCredential", "azure.mgmt.compute.ComputeManagementClient"):
+            patcher = patch(target)
+            setattr(self, f"mock_{target.rsplit('.', 1)[1]}", patcher.start())
+            self.addCleanup(patcher.stop)
+        self.mock_compute_client = self.mock_ComputeManagementClient
         self.mock_logger = MagicMock()
         self.manager = AzureManager(
             subscription_id="test-subscription-id",
@@ -19,9 +25,8 @@ class TestAzureManager(unittest.TestCase):
             location="test-location",
             logger=self.mock_logger,
         )
-        self.mock_compute_client = mock_compute_client
 
-    @patch("src.azure_manager.BlobServiceClient")
+    @patch("azure.storage.blob.BlobServiceClient")
     def test_setup_storage(self, mock_blob_service_client: MagicMock) -> None:
         mock_container_client = make_mock_container_client(mock_blob_service_client, exists=False)
 
@@ -29,24 +34,35 @@ class TestAzureManager(unittest.TestCase):
 
         self.assertEqual(self.manager.storage_account_name, "teststorage123")
         self.assertEqual(self.manager.storage_container, "testcontainer123")
+        mock_blob_service_client.assert_not_called()
+        self.assertIs(self.manager.container_client, mock_container_client)
+        self.assertIs(self.manager.container_client, mock_container_client)
         mock_container_client.create_container.assert_called_once()
 
-    @patch("src.azure_manager.BlobServiceClient")
+    def test_clients_are_created_on_first_use(self) -> None:
+        self.mock_ManagedIdentityCredential.assert_not_called()
+        self.mock_compute_client.assert_not_called()
+
+        self.manager.gallery_image_version_exists("gallery", "img", "1.2.3")
+
+        self.mock_ManagedIdentityCredential.assert_called_once_with(client_id="test-client-id")
+        self.mock_compute_client.assert_called_once_with(self.manager.credential, "test-subscription-id")
+        self.assertIs(self.manager.credential.credential, self.mock_ManagedIdentityCredential.return_value)
+
+    @patch("azure.storage.blob.BlobServiceClient")
     def test_upload_vhd(self, mock_blob_service_client: MagicMock) -> None:
         mock_container_client = make_mock_container_client(mock_blob_service_client)
+        self.manager.uploader = MagicMock()
         self.manager.setup_storage("teststorage", "testcontainer")
 
-        with patch("builtins.open", mock_open(read_data=b"fake-vhd")):
-            url = self.manager.upload_vhd("fake.vhd")
+        url = self.manager.upload_vhd("fake.vhd")
 
         self.assertIn("https://teststorage.blob.core.windows.net/testcontainer/bosh-stemcell-", url)
         self.assertIn(".vhd", url)
-        mock_container_client.upload_blob.assert_called_once_with(
-            name=unittest.mock.ANY,
-            data=unittest.mock.ANY,
-            overwrite=True,
-            blob_type="PageBlob",
-            max_concurrency=unittest.mock.ANY,
+        blob_name = mock_container_client.get_blob_client.call_args.args[0]
+        self.assertTrue(url.endswith(blob_name))
+        self.manager.uploader.upload_file.assert_called_once_with(
+            mock_container_client.get_blob_client.return_value, "fake.vhd", None, resume=False
         )
         self.assertTrue(
             any(
@@ -56,6 +72,103 @@ class TestAzureManager(unittest.TestCase):
             "Expected log message starting with 'Uploaded VHD to blob: '",
         )
 
+    @patch("azure.storage.blob.BlobServiceClient")
+    def test_upload_vhd_stream(self, mock_blob_service_client: MagicMock) -> None:
+        mock_container_client = make_mock_container_client(mock_blob_service_client)
+        self.manager.uploader = MagicMock()
+        self.manager.setup_storage("teststorage", "testcontainer")
+        stream = MagicMock()
+
+        url = self.manager.upload_vhd_stream(stream, 1024)
+
+        blob_name = mock_container_client.get_blob_client.call_args.args[0]
+        self.assertTrue(blob_name.startswith("bosh-stemcell-"))
+        self.assertEqual(url, f"https://teststorage.blob.core.windows.net/testcontainer/{blob_name}")
+        self.manager.uploader.upload_stream.assert_called_once_with(
+            mock_container_client.get_blob_client.return_value, stream, 1024, resume=False
+        )
+
+    @patch("azure.storage.blob.BlobServiceClient")
+    def test_upload_vhd_resumes_named_blob(self, mock_blob_service_client: MagicMock) -> None:
+        mock_container_client = make_mock_container_client(mock_blob_service_client)
+        self.manager.uploader = MagicMock()
+        self.manager.setup_storage("teststorage", "testcontainer")
+
+        url = self.manager.upload_vhd("fake.vhd", [(0, 512)], blob_name="bosh-stemcell-1.0.0-abcdef.vhd")
+
+        self.assertEqual(url, "https://teststorage.blob.core.windows.net/testcontainer/bosh-stemcell-1.0.0-abcdef.vhd")
+        mock_container_client.get_blob_client.assert_called_once_with("bosh-stemcell-1.0.0-abcdef.vhd")
+        self.manager.uploader.upload_file.assert_called_once_with(
+            mock_container_client.get_blob_client.return_value, "fake.vhd", [(0, 512)], resume=True
+        )
+
+    @patch("src.azure_manager.os.path.getsize", return_value=1024)
+    @patch("azure.storage.blob.BlobServiceClient")
+    def test_upload_vhd_reuses_blob_with_same_content(self, mock_blob_service_client, mock_getsize) -> None:
+        mock_container_client = make_mock_container_client(mock_blob_service_client)
+        blob_client = mock_container_client.get_blob_client.return_value
+        blob_client.get_blob_properties.return_value = SimpleNamespace(size=1024, metadata={"vhd_sha256": "abc123"})
+        self.manager.uploader = MagicMock()
+        self.manager.setup_storage("teststorage", "testcontainer")
+
+        url = self.manager.upload_vhd("fake.vhd", blob_name="bosh-stemcell-1.0.0-ff.vhd", content_digest="abc123")
+
+        self.assertEqual(url, "https://teststorage.blob.core.windows.net/testcontainer/bosh-stemcell-sha256-abc123.vhd")
+        self.manager.uploader.upload_file.assert_not_called()
+
+    @patch("src.azure_manager.os.path.getsize", return_value=1024)
+    @patch("azure.storage.blob.BlobServiceClient")
+    def test_upload_vhd_records_content_digest(self, mock_blob_service_client, mock_getsize) -> None:
+        mock_container_client = make_mock_container_client(mock_blob_service_client)
+        blob_client = mock_container_client.get_blob_client.return_value
+        blob_client.get_blob_properties.side_effect = ResourceNotFoundError("BlobNotFound")
+        self.manager.uploader = MagicMock()
+        self.manager.setup_storage("teststorage", "testcontainer")
+
+        self.manager.upload_vhd("fake.vhd", content_digest="abc123")
+
+        mock_container_client.get_blob_client.assert_called_once_with("bosh-stemcell-sha256-abc123.vhd")
+        self.manager.uploader.upload_file.assert_called_once_with(blob_client, "fake.vhd", None, resume=True)
+        blob_client.set_blob_metadata.assert_called_once_with({"vhd_sha256": "abc123"})
+
+    @patch("azure.storage.blob.BlobServiceClient")
+    def test_delete_blob_ignores_missing_blob(self, mock_blob_service_client: MagicMock) -> None:
+        mock_container_client = make_mock_container_client(mock_blob_service_client)
+        blob_client = mock_container_client.get_blob_client.return_value
+        blob_client.delete_blob.side_effect = [None, ResourceNotFoundError("BlobNotFound")]
+        self.manager.setup_storage("teststorage", "stemcell")
+
+        self.manager.delete_blob("root.vhd")
+        self.manager.delete_blob("root.vhd")
+
+        mock_container_client.get_blob_client.assert_called_with("root.vhd")
+        self.assertEqual(blob_client.delete_blob.call_count, 2)
+
+    @patch("azure.storage.blob.BlobServiceClient")
+    def test_holds_vhd_checks_blob_properties(self, mock_blob_service_client: MagicMock) -> None:
+        mock_container_client = make_mock_container_client(mock_blob_service_client)
+        blob_client = mock_container_client.get_blob_client.return_value
+        blob_client.get_blob_properties.side_effect = [
+            SimpleNamespace(size=1024, metadata={"vhd_sha256": "abc123"}),
+            SimpleNamespace(size=1024, metadata={}),
+            SimpleNamespace(size=512, metadata={}),
+            ResourceNotFoundError("BlobNotFound"),
+        ]
+        self.manager.setup_storage("teststorage", "stemcell")
+        blob_uri = "https://teststorage.blob.core.windows.net/stemcell/root.vhd"
+
+        self.assertTrue(self.manager.holds_vhd(blob_uri, 1024, "abc123"))
+        self.assertFalse(self.manager.holds_vhd(blob_uri, 1024, "abc123"))
+        self.assertFalse(self.manager.holds_vhd(blob_uri, 1024))
+        self.assertFalse(self.manager.holds_vhd(blob_uri))
+        self.assertFalse(self.manager.holds_vhd("https://other.blob.core.windows.net/stemcell/root.vhd"))
+        mock_container_client.get_blob_client.assert_called_with("root.vhd")
+        self.assertEqual(blob_client.get_blob_properties.call_count, 4)
+
+    def test_upload_vhd_stream_no_storage_config_raises(self):
+        with self.assertRaises(ValueError):
+            self.manager.upload_vhd_stream(MagicMock(), 1024)
+
     def test_upload_vhd_no_storage_config_raises(self):
         with self.assertRaises(ValueError):
             self.manager.upload_vhd("fake.vhd")
@@ -76,6 +189,7 @@ class TestAzureManager(unittest.TestCase):
         self.mock_logger.info.assert_any_call("Creating new gallery image definition...")
         begin = self.mock_compute_client.return_value.gallery_images.begin_create_or_update
         begin.assert_called_once()
+        begin.return_value.result.assert_called_once()
         gallery_image = begin.call_args.kwargs["gallery_image"]
         self.assertEqual(gallery_image.os_type, "Linux")
         self.assertEqual(gallery_image.os_state, "Generalized")
@@ -143,30 +257,71 @@ class TestAzureManager(unittest.TestCase):
         self.assertIsNone(_normalize_architecture(""))
 
     def test_gallery_image_version_exists_true(self):
-        self.mock_compute_client.return_value.gallery_image_versions.get.return_value = MagicMock()
+        compute_client = self.mock_compute_client.return_value
+        compute_client.gallery_images.list_by_gallery.return_value = [SimpleNamespace(name="img")]
+        compute_client.gallery_image_versions.list_by_gallery_image.return_value = [
+            SimpleNamespace(name="ver", provisioning_state="Succeeded")
+        ]
+
+        self.assertTrue(self.manager.gallery_image_version_exists("gallery", "img", "ver"))
+        self.assertFalse(self.manager.gallery_image_version_exists("gallery", "img", "other"))
+        compute_client.gallery_image_versions.get.assert_not_called()
+        compute_client.gallery_image_versions.list_by_gallery_image.assert_called_once()
+
+    def test_created_gallery_image_version_exists(self):
+        compute_client = self.mock_compute_client.return_value
+        compute_client.gallery_images.list_by_gallery.return_value = []
+        self.manager.storage_account_name = "teststorage"
 
-        result = self.manager.gallery_image_version_exists("gallery", "img", "ver")
+        self.manager.create_gallery_image_version("gallery", "img", "1.2.3", "https://blob/root.vhd")
 
-        self.assertTrue(result)
+        self.assertTrue(self.manager.gallery_image_version_exists("gallery", "img", "1.2.3"))
+        compute_client.gallery_images.list_by_gallery.assert_called_once()
 
     def test_create_gallery_image_version_nests_properties(self):
         self.manager.storage_account_name = "teststorage"
 
-        self.manager.create_gallery_image_version("gallery", "img", "1.2.3", "https://blob/root.vhd")
+        provisioned = self.manager.create_gallery_image_version("gallery", "img", "1.2.3", "https://blob/root.vhd")
 
         begin = self.mock_compute_client.return_value.gallery_image_versions.begin_create_or_update
         begin.assert_called_once()
+        self.assertIs(provisioned.result(timeout=5), begin.return_value.result.return_value)
         image_version = begin.call_args.args[4]
         body = image_version.as_dict()
 
         self.assertNotIn("publishingProfile", body)
         self.assertNotIn("storageProfile", body)
         properties = body["properties"]
-        self.assertEqual(properties["publishingProfile"]["targetRegions"][0]["name"], "test-location")
+        self.assertEqual(
+            properties["publishingProfile"]["targetRegions"],
+            [{"name": "test-location", "regionalReplicaCount": 1, "storageAccountType": "Standard_LRS"}],
+        )
         source = properties["storageProfile"]["osDiskImage"]["source"]
         self.assertEqual(source["uri"], "https://blob/root.vhd")
         self.assertIn("teststorage", source["storageAccountId"])
 
+    def test_failed_gallery_image_version_is_not_taken_to_exist(self):
+        self.manager.storage_account_name = "teststorage"
+        self.manager.operations = MagicMock()
+        provisioned = self.manager.operations.track.return_value = Future()
+
+        self.manager.create_gallery_image_version("gallery", "img", "1.2.3", "https://blob/root.vhd")
+        self.assertTrue(self.manager.gallery_image_version_exists("gallery", "img", "1.2.3"))
+        provisioned.set_exception(RuntimeError("provisioning failed"))
+
+        self.assertFalse(self.manager.gallery_image_version_exists("gallery", "img", "1.2.3"))
+        self.assertEqual(self.mock_compute_client.return_value.gallery_images.list_by_gallery.call_count, 2)
+
+    def test_follow_gallery_image_version_resolves_once_provisioned(self):
+        versions = self.mock_compute_client.return_value.gallery_image_versions
+        versions.get.return_value = SimpleNamespace(provisioning_state="Succeeded", replication_status=None)
+
+        provisioned = self.manager.follow_gallery_image_version("gallery", "img", "1.2.3")
+
+        self.assertIs(provisioned.result(timeout=5), versions.get.return_value)
+        versions.get.assert_any_call("test-rg", "gallery", "img", "1.2.3")
+        versions.begin_create_or_update.assert_not_called()
+
 
 def make_mock_container_client(blob_service_client: MagicMock, exists: bool = True) -> MagicMock:
     mock_container_client = MagicMock()
@@ -75,6 +75,222 @@ class TestConfig(unittest.TestCase):
         self.assertEqual(config.mirror, "boshio/ubuntu-noble")
         self.assertEqual(config.mounted_directory, "")
 
+    @patch.dict(
+        "os.environ",
+        {"BASM_DOWNLOAD_WORKERS": "16", "BASM_DOWNLOAD_SEGMENT_SIZE_MB": "32"},
+        clear=True,
+    )
+    def test_load_mirror_config_reads_download_settings(self):
+        config = load_mirror_config()
+
+        self.assertEqual(config.download_workers, 16)
+        self.assertEqual(config.download_segment_size, 32 * 1024 * 1024)
+
+    @patch.dict("os.environ", {"BASM_CACHE_SIZE_GB": "20"}, clear=True)
+    def test_load_mirror_config_reads_cache_size(self):
+        self.assertEqual(load_mirror_config().cache_size, 20 * 1024 * 1024 * 1024)
+
+    @patch.dict("os.environ", {}, clear=True)
+    def test_load_mirror_config_disables_cache_by_default(self):
+        self.assertEqual(load_mirror_config().cache_size, 0)
+
+    @patch.dict("os.environ", {"BASM_MIRROR": "all", "BASM_MIRROR_CONCURRENCY": "1"}, clear=True)
+    def test_load_mirror_config_reads_mirror_concurrency(self):
+        config = load_mirror_config()
+
+        self.assertEqual((config.mirror, config.mirror_concurrency), ("all", 1))
+
+    @patch.dict(
+        "os.environ",
+        {
+            "AZURE_SUBSCRIPTION_ID": "sub",
+            "AZURE_MANAGED_IDENTITY_ID": "identity",
+            "AZURE_RESOURCE_GROUP": "rg",
+            "AZURE_STORAGE_ACCOUNT_NAME": "storage",
+            "BASM_UPLOAD_AUTOTUNE": "true",
+            "BASM_UPLOAD_MAX_CONCURRENCY": "24",
+        },
+        clear=True,
+    )
+    def test_load_azure_config_reads_upload_tuning(self):
+        config = load_azure_config()
+
+        self.assertTrue(config.upload_autotune)
+        self.assertEqual(config.upload_max_concurrency, 24)
+        self.assertEqual(config.upload_chunk_size, 4 * 1024 * 1024)
+
+    @patch.dict(
+        "os.environ",
+        {
+            "AZURE_SUBSCRIPTION_ID": "sub",
+            "AZURE_MANAGED_IDENTITY_ID": "identity",
+            "AZURE_RESOURCE_GROUP": "rg",
+            "AZURE_STORAGE_ACCOUNT_NAME": "storage",
+            "BASM_UPLOAD_CHUNK_SIZE_KB": "1024",
+        },
+        clear=True,
+    )
+    def test_load_azure_config_reads_upload_chunk_size(self):
+        self.assertEqual(load_azure_config().upload_chunk_size, 1024 * 1024)
+
+        with patch.dict("os.environ", {"BASM_UPLOAD_CHUNK_SIZE_KB": "8192"}):
+            with self.assertRaisesRegex(ValueError, "BASM_UPLOAD_CHUNK_SIZE_KB must be a multiple of 512 bytes"):
+                load_azure_config()
+
+    @patch.dict(
+        "os.environ",
+        {
+            "AZURE_SUBSCRIPTION_ID": "sub",
+            "AZURE_MANAGED_IDENTITY_ID": "identity",
+            "AZURE_RESOURCE_GROUP": "rg",
+            "AZURE_STORAGE_ACCOUNT_NAME": "storage",
+            "BASM_GALLERY_INVENTORY_TTL": "600",
+            "BASM_GALLERY_INVENTORY_FILE": "/mnt/inventory.json",
+        },
+        clear=True,
+    )
+    def test_load_azure_config_reads_gallery_inventory(self):
+        config = load_azure_config()
+
+        self.assertEqual(config.gallery_inventory_ttl, 600)
+        self.assertEqual(config.gallery_inventory_file, "/mnt/inventory.json")
+
+    @patch.dict(
+        "os.environ",
+        {
+            "BASM_BACKFILL_COUNT": "5",
+            "BASM_BACKFILL_RANGE": ">=1.600",
+            "BASM_SCRATCH_BUDGET_GB": "40",
+            "BASM_PIPELINE_UPLOAD_WORKERS": "2",
+            "BASM_PIPELINE_QUEUE_SIZE": "3",
+        },
+        clear=True,
+    )
+    def test_load_mirror_config_reads_backfill(self):
+        config = load_mirror_config()
+
+        self.assertEqual((config.backfill_count, config.backfill_range), (5, ">=1.600"))
+        self.assertEqual(config.scratch_budget, 40 * 1024 * 1024 * 1024)
+        self.assertEqual((config.fetch_workers, config.upload_workers, config.publish_workers), (1, 2, 1))
+        self.assertEqual(config.pipeline_queue_size, 3)
+
+    @patch.dict("os.environ", {}, clear=True)
+    def test_load_mirror_config_waits_for_provisioning_by_default(self):
+        self.assertTrue(load_mirror_config().wait_for_provisioning)
+
+    @patch.dict("os.environ", {"BASM_PUBLISH_WAIT": "false"}, clear=True)
+    def test_load_mirror_config_reads_publish_wait(self):
+        self.assertFalse(load_mirror_config().wait_for_provisioning)
+
+    @patch.dict("os.environ", {"BASM_METADATA_INDEX_FILE": "/mnt/data/bosh-io.json"}, clear=True)
+    def test_load_mirror_config_reads_metadata_index_file(self):
+        self.assertEqual(load_mirror_config().metadata_index_file, "/mnt/data/bosh-io.json")
+
+    @patch.dict("os.environ", {"BASM_CHECKPOINT_FILE": "/mnt/data/checkpoints.json"}, clear=True)
+    def test_load_mirror_config_reads_checkpoint_file(self):
+        self.assertEqual(load_mirror_config().checkpoint_file, "/mnt/data/checkpoints.json")
+        self.assertEqual(load_mirror_config().http_retries, 3)
+
+    @patch.dict("os.environ", {"BASM_HTTP_RETRIES": "5"}, clear=True)
+    def test_load_mirror_config_reads_http_retries(self):
+        self.assertEqual(load_mirror_config().http_retries, 5)
+
+    @patch.dict("os.environ", {"BASM_HTTP_RETRIES": "0"}, clear=True)
+    def test_load_mirror_config_disables_http_retries(self):
+        self.assertEqual(load_mirror_config().http_retries, 0)
+
+    @patch.dict("os.environ", {"BASM_HTTP_RETRIES": "-1"}, clear=True)
+    def test_load_mirror_config_negative_http_retries_raises(self):
+        with self.assertRaisesRegex(ValueError, "BASM_HTTP_RETRIES must be at least 0"):
+            load_mirror_config()
+
+    @patch.dict(
+        "os.environ",
+        {
+            "AZURE_SUBSCRIPTION_ID": "sub",
+            "AZURE_MANAGED_IDENTITY_ID": "identity",
+            "AZURE_RESOURCE_GROUP": "rg",
+            "AZURE_STORAGE_ACCOUNT_NAME": "storage",
+            "BASM_GALLERY_TARGET_REGIONS": "westeurope=3,northeurope",
+            "BASM_GALLERY_VM_CONCURRENCY": "50",
+            "BASM_GALLERY_REPLICATION_MODE": "Shallow",
+        },
+        clear=True,
+    )
+    def test_load_azure_config_reads_publishing_profile(self):
+
+        config = load_azure_config()
+
+        self.assertEqual(config.gallery_target_regions, "westeurope=3,northeurope")
+        self.assertEqual((config.gallery_replica_count, config.gallery_vm_concurrency), (0, 50))
+        self.assertEqual(
+            (config.gallery_storage_account_type, config.gallery_replication_mode), ("Standard_LRS", "Shallow")
+        )
+
+    @patch.dict(
+        "os.environ",
+        {
+            "AZURE_SUBSCRIPTION_ID": "sub",
+            "AZURE_MANAGED_IDENTITY_ID": "identity",
+            "AZURE_RESOURCE_GROUP": "rg",
+            "AZURE_STORAGE_ACCOUNT_NAME": "storage",
+            "BASM_AZURE_CREDENTIAL": "managed-identity",
+            "BASM_TOKEN_CACHE_FILE": "/mnt/data/tokens.json",
+        },
+        clear=True,
+    )
+    def test_load_azure_config_reads_credential_settings(self):
+        config = load_azure_config()
+
+        self.assertEqual(
+            (config.credential_type, config.token_cache_file), ("managed-identity", "/mnt/data/tokens.json")
+        )
+
+    @patch.dict("os.environ", {"BASM_DOWNLOAD_WORKERS": "many"}, clear=True)
+    def test_load_mirror_config_invalid_integer_raises(self):
+        with self.assertRaises(ValueError):
+            load_mirror_config()
+
+    @patch.dict(
+        "os.environ",
+        {
+            "AZURE_SUBSCRIPTION_ID": "sub",
+            "AZURE_MANAGED_IDENTITY_ID": "identity",
+            "AZURE_RESOURCE_GROUP": "rg",
+            "AZURE_STORAGE_ACCOUNT_NAME": "storage",
+            "BASM_GALLERY_INVENTORY_TTL": "0",
+        },
+        clear=True,
+    )
+    def test_load_azure_config_accepts_zero_gallery_inventory_ttl(self):
+        self.assertEqual(load_azure_config().gallery_inventory_ttl, 0)
+
+    @patch.dict(
+        "os.environ",
+        {
+            "AZURE_SUBSCRIPTION_ID": "sub",
+            "AZURE_MANAGED_IDENTITY_ID": "identity",
+            "AZURE_RESOURCE_GROUP": "rg",
+            "AZURE_STORAGE_ACCOUNT_NAME": "storage",
+            "BASM_GALLERY_REPLICA_COUNT": "0",
+        },
+        clear=True,
+    )
+    def test_load_azure_config_accepts_zero_replica_count(self):
+        self.assertEqual(load_azure_config().gallery_replica_count, 0)
+
+    @patch.dict("os.environ", {"BASM_MIRROR": "all", "BASM_MIRROR_CONCURRENCY": "0"}, clear=True)
+    def test_load_mirror_config_accepts_zero_mirror_concurrency(self):
+        self.assertEqual(load_mirror_config().mirror_concurrency, 0)
+
+    @patch.dict("os.environ", {"BASM_CACHE_SIZE_GB": "0"}, clear=True)
+    def test_load_mirror_config_accepts_zero_cache_size(self):
+        self.assertEqual(load_mirror_config().cache_size, 0)
+
+    @patch.dict("os.environ", {"BASM_SCRATCH_BUDGET_GB": "0"}, clear=True)
+    def test_load_mirror_config_accepts_zero_scratch_budget(self):
+        self.assertEqual(load_mirror_config().scratch_budget, 0)
+
 
 if __name__ == "__main__":
     unittest.main()
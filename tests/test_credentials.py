@@ -0,0 +1,110 @@
+import os
+import shutil
+import stat
+import unittest
+from unittest.mock import MagicMock, patch
+
+from azure.core.credentials import AccessToken
+
+from src.credentials import CachingCredential, build_credential
+from src.state_file import save_state
+from tests.fakes import FakeClock
+
+tmp_dir = os.path.join("tests", "tmp-credentials")
+ARM_SCOPE = "https://management.azure.com/.default"
+STORAGE_SCOPE = "https://storage.azure.com/.default"
+
+
+class TestCachingCredential(unittest.TestCase):
+    def setUp(self):
+        os.makedirs(tmp_dir, exist_ok=True)
+        self.path = os.path.join(tmp_dir, "tokens.json")
+        self.clock = FakeClock(1_000.0)
+        self.inner = MagicMock()
+        self.inner.get_token.side_effect = lambda *scopes, **kwargs: AccessToken(
+            f"token-{self.inner.get_token.call_count}", int(self.clock.now) + 3600
+        )
+
+    def tearDown(self):
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def test_reuses_token_per_scope_until_it_nears_expiry(self):
+        credential = CachingCredential(self.inner, clock=self.clock)
+
+        arm = credential.get_token(ARM_SCOPE)
+        self.assertIs(credential.get_token(ARM_SCOPE), arm)
+        storage = credential.get_token(STORAGE_SCOPE)
+        self.clock.now += 3600 - 299
+
+        self.assertNotEqual(storage.token, arm.token)
+        self.assertNotEqual(credential.get_token(ARM_SCOPE).token, arm.token)
+        self.assertEqual(self.inner.get_token.call_count, 3)
+
+    def test_claims_challenge_fetches_new_token(self):
+        credential = CachingCredential(self.inner, clock=self.clock)
+        first = credential.get_token(ARM_SCOPE)
+
+        second = credential.get_token(ARM_SCOPE, claims='{"access_token": {}}')
+
+        self.assertNotEqual(first.token, second.token)
+        self.assertIs(credential.get_token(ARM_SCOPE), second)
+
+    def test_persists_tokens_across_runs(self):
+        token = CachingCredential(self.inner, path=self.path, clock=self.clock).get_token(ARM_SCOPE)
+
+        later_run = CachingCredential(MagicMock(), path=self.path, clock=self.clock)
+
+        self.assertEqual(later_run.get_token(ARM_SCOPE), token)
+        later_run.credential.get_token.assert_not_called()
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+
+    def test_warns_once_when_file_mode_is_not_applied(self):
+        logger = MagicMock()
+        credential = CachingCredential(self.inner, path=self.path, logger=logger, clock=self.clock)
+
+        with patch("src.credentials.save_state", side_effect=lambda *args, **kwargs: save_state(*args[:4])):
+            credential.get_token(ARM_SCOPE)
+            credential.get_token(STORAGE_SCOPE)
+
+        logger.warning.assert_called_once()
+        self.assertIn("other users may read it", logger.warning.call_args.args[0])
+
+    def test_ignores_expired_and_unreadable_cache(self):
+        CachingCredential(self.inner, path=self.path, clock=self.clock).get_token(ARM_SCOPE)
+        self.clock.now += 7200
+        self.assertEqual(
+            CachingCredential(self.inner, path=self.path, clock=self.clock).get_token(ARM_SCOPE).token, "token-2"
+        )
+
+        with open(self.path, "w") as f:
+            f.write("not json")
+        logger = MagicMock()
+
+        CachingCredential(self.inner, path=self.path, logger=logger, clock=self.clock).get_token(ARM_SCOPE)
+
+        logger.warning.assert_called_once()
+        self.assertEqual(self.inner.get_token.call_count, 3)
+
+
+class TestBuildCredential(unittest.TestCase):
+    @patch("azure.identity.DefaultAzureCredential")
+    @patch("azure.identity.ManagedIdentityCredential")
+    def test_uses_managed_identity_when_client_id_is_set(self, mock_managed_identity, mock_default):
+        fast = build_credential("client-id")
+        explicit = build_credential("", "managed-identity")
+        chain = build_credential("client-id", "default")
+
+        self.assertIs(fast.credential, mock_managed_identity.return_value)
+        self.assertIs(explicit.credential, mock_managed_identity.return_value)
+        mock_managed_identity.assert_any_call(client_id="client-id")
+        mock_managed_identity.assert_any_call(client_id=None)
+        self.assertIs(chain.credential, mock_default.return_value)
+        self.assertIs(build_credential("").credential, mock_default.return_value)
+
+    def test_unsupported_credential_type_raises(self):
+        with self.assertRaises(ValueError):
+            build_credential("client-id", "certificate")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import os
+import shutil
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from azure.core.exceptions import ResourceNotFoundError
+
+from src.gallery_inventory import PROVISIONING_STATE_CREATING, GalleryInventory
+from tests.fakes import FakeClock
+
+tmp_dir = os.path.join("tests", "tmp-inventory")
+
+
+def make_compute_client(versions: dict[str, list[str]]) -> MagicMock:
+    compute_client = MagicMock()
+    compute_client.gallery_images.list_by_gallery.return_value = [SimpleNamespace(name=name) for name in versions]
+    compute_client.gallery_image_versions.list_by_gallery_image.side_effect = lambda _rg, _gallery, image: [
+        SimpleNamespace(name=version, provisioning_state=SimpleNamespace(value="Succeeded"))
+        for version in versions[image]
+    ]
+    return compute_client
+
+
+class TestGalleryInventory(unittest.TestCase):
+    def setUp(self):
+        os.makedirs(tmp_dir, exist_ok=True)
+        self.clock = FakeClock(1000.0)
+
+    def tearDown(self):
+        shutil.rmtree(tmp_dir)
+
+    def test_answers_queries_from_one_listing(self):
+        compute_client = make_compute_client({"ubuntu-jammy": ["1.0.0", "1.1.0"], "ubuntu-noble": ["2.0.0"]})
+        inventory = GalleryInventory(compute_client, "rg", clock=self.clock)
+
+        self.assertTrue(inventory.version_exists("gallery", "ubuntu-jammy", "1.1.0"))
+        self.assertFalse(inventory.version_exists("gallery", "ubuntu-jammy", "2.0.0"))
+        self.assertEqual(inventory.provisioning_state("gallery", "ubuntu-noble", "2.0.0"), "Succeeded")
+        self.assertFalse(inventory.image_exists("gallery", "ubuntu-bionic"))
+
+        compute_client.gallery_images.list_by_gallery.assert_called_once_with("rg", "gallery")
+        self.assertEqual(compute_client.gallery_image_versions.list_by_gallery_image.call_count, 2)
+        compute_client.gallery_image_versions.get.assert_not_called()
+
+    def test_lists_gallery_again_after_ttl(self):
+        compute_client = make_compute_client({"ubuntu-jammy": []})
+        inventory = GalleryInventory(compute_client, "rg", ttl=60, clock=self.clock)
+        inventory.version_exists("gallery", "ubuntu-jammy", "1.0.0")
+
+        self.clock.now += 61
+        inventory.version_exists("gallery", "ubuntu-jammy", "1.0.0")
+
+        self.assertEqual(compute_client.gallery_images.list_by_gallery.call_count, 2)
+
+    def test_records_created_versions(self):
+        compute_client = make_compute_client({})
+        inventory = GalleryInventory(compute_client, "rg", clock=self.clock)
+
+        inventory.record_version("gallery", "ubuntu-jammy", "1.0.0")
+
+        self.assertTrue(inventory.image_exists("gallery", "ubuntu-jammy"))
+        self.assertEqual(inventory.provisioning_state("gallery", "ubuntu-jammy", "1.0.0"), PROVISIONING_STATE_CREATING)
+        compute_client.gallery_images.list_by_gallery.assert_called_once()
+
+    def test_missing_gallery_has_no_versions(self):
+        compute_client = MagicMock()
+        compute_client.gallery_images.list_by_gallery.side_effect = ResourceNotFoundError("Not found")
+
+        inventory = GalleryInventory(compute_client, "rg", clock=self.clock)
+
+        self.assertFalse(inventory.version_exists("gallery", "ubuntu-jammy", "1.0.0"))
+
+    def test_persists_listings_across_runs(self):
+        path = os.path.join(tmp_dir, "inventory.json")
+        GalleryInventory(
+            make_compute_client({"ubuntu-jammy": ["1.0.0"]}), "rg", path=path, clock=self.clock
+        ).image_exists("gallery", "ubuntu-jammy")
+        compute_client = make_compute_client({})
+
+        inventory = GalleryInventory(compute_client, "rg", ttl=60, path=path, clock=self.clock)
+
+        self.assertTrue(inventory.version_exists("gallery", "ubuntu-jammy", "1.0.0"))
+        compute_client.gallery_images.list_by_gallery.assert_not_called()
+        self.clock.now += 61
+        self.assertFalse(inventory.version_exists("gallery", "ubuntu-jammy", "1.0.0"))
+
+    def test_ignores_unreadable_persisted_listings(self):
+        path = os.path.join(tmp_dir, "inventory.json")
+        with open(path, "w") as target:
+            target.write("not json")
+        compute_client = make_compute_client({"ubuntu-jammy": ["1.0.0"]})
+
+        inventory = GalleryInventory(compute_client, "rg", path=path, logger=MagicMock(), clock=self.clock)
+
+        self.assertTrue(inventory.version_exists("gallery", "ubuntu-jammy", "1.0.0"))
+        compute_client.gallery_images.list_by_gallery.assert_called_once()
+
+    def test_invalidate_forces_listing(self):
+        compute_client = make_compute_client({"ubuntu-jammy": []})
+        inventory = GalleryInventory(compute_client, "rg", clock=self.clock)
+        inventory.image_exists("gallery", "ubuntu-jammy")
+
+        inventory.invalidate("gallery")
+        inventory.image_exists("gallery", "ubuntu-jammy")
+
+        self.assertEqual(compute_client.gallery_images.list_by_gallery.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
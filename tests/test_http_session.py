@@ -0,0 +1,73 @@
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.http_session import build_session
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """Answers 503 with a Retry-After to the first ``failures`` requests, then 200."""
+
+    failures = 0
+    requests: list[str] = []
+
+    def do_GET(self):
+        self._respond()
+
+    def do_POST(self):
+        self._respond()
+
+    def _respond(self):
+        type(self).requests.append(self.command)
+        if len(type(self).requests) <= type(self).failures:
+            self.send_response(503)
+            self.send_header("Retry-After", "0")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class TestBuildSession(unittest.TestCase):
+    def setUp(self):
+        FlakyHandler.failures = 2
+        FlakyHandler.requests = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyHandler)
+        threading.Thread(target=self.server.serve_forever, args=(0.01,), daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+
+    def test_retries_idempotent_requests(self):
+        with build_session(backoff=0) as session:
+            response = session.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(FlakyHandler.requests, ["GET"] * 3)
+
+    def test_does_not_retry_post(self):
+        with build_session(backoff=0) as session:
+            response = session.post(self.url)
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(FlakyHandler.requests, ["POST"])
+
+    def test_returns_last_response_once_retries_are_used_up(self):
+        with build_session(retries=1, backoff=0) as session:
+            self.assertEqual(session.get(self.url).status_code, 503)
+
+    def test_pools_and_timeout(self):
+        session = build_session(pool_size=16, timeout=(1, 2))
+
+        self.assertEqual(session.get_adapter("https://storage.googleapis.com/x.tgz")._pool_maxsize, 16)
+        self.assertEqual(session.get_adapter("https://bosh.io/api/v1/stemcells/x")._pool_maxsize, 16)
+        self.assertEqual(session.timeout, (1, 2))
+        with self.assertRaises(ValueError):
+            build_session(pool_size=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,26 @@
 import logging
+import subprocess
+import sys
+import threading
+import time
 import unittest
+from dataclasses import replace
 from unittest.mock import MagicMock
 
 from src.config import AzureConfig, MirrorConfig
-from src.main import build_mirror
+from src.main import (
+    build_cache,
+    build_mirror,
+    build_mirrors,
+    build_publishing_profile,
+    build_uploader,
+    mirror_keys,
+    run_mirrors,
+)
 from src.mirror.bosh_io import BoshIoJammyMirror, BoshIoNobleMirror
+from src.upload.adaptive import AdaptivePageBlobUploader
+from src.upload.async_page_blob import AsyncPageBlobUploader
+from src.upload.page_blob import PageBlobUploader
 
 
 class TestBuildMirror(unittest.TestCase):
@@ -47,6 +63,68 @@ class TestBuildMirror(unittest.TestCase):
 
         self.assertIsInstance(mirror, BoshIoNobleMirror)
 
+    def test_build_cache_in_mounted_directory(self):
+        cache = build_cache(
+            MirrorConfig(mirror="boshio/ubuntu-jammy", mounted_directory="/mnt", cache_size=1), self.logger
+        )
+
+        self.assertIsNotNone(cache)
+        self.assertEqual(cache.directory, "/mnt/cache")
+        self.assertIsNone(build_cache(self._mirror_config("boshio/ubuntu-jammy"), self.logger))
+        self.assertIsNone(
+            build_cache(MirrorConfig(mirror="boshio/ubuntu-jammy", mounted_directory="", cache_size=1), self.logger)
+        )
+
+    def test_build_uploader_for_engine(self):
+        threads = build_uploader(self.azure_config, self.logger)
+        async_uploader = build_uploader(
+            replace(self.azure_config, upload_engine="async", upload_in_flight_size=32 * 1024 * 1024), self.logger
+        )
+
+        self.assertIs(type(threads), PageBlobUploader)
+        self.assertIsInstance(async_uploader, AsyncPageBlobUploader)
+        self.assertEqual(async_uploader.window_size, 32 * 1024 * 1024)
+        with self.assertRaises(ValueError):
+            build_uploader(replace(self.azure_config, upload_engine="carrier-pigeon"), self.logger)
+
+    def test_build_autotuned_uploader(self):
+        uploader = build_uploader(
+            replace(self.azure_config, upload_autotune=True, upload_concurrency=8, upload_max_concurrency=16),
+            self.logger,
+        )
+
+        self.assertIsInstance(uploader, AdaptivePageBlobUploader)
+        self.assertEqual((uploader.tuner.concurrency, uploader.tuner.max_concurrency), (8, 16))
+        self.assertEqual(uploader.tuner.chunk_sizes, (4 * 1024 * 1024, 2 * 1024 * 1024, 1024 * 1024))
+
+    def test_build_uploader_with_chunk_size(self):
+        config = replace(self.azure_config, upload_chunk_size=1536 * 1024)
+
+        threads = build_uploader(config, self.logger)
+        async_uploader = build_uploader(replace(config, upload_engine="async"), self.logger)
+        autotuned = build_uploader(replace(config, upload_autotune=True), self.logger)
+
+        self.assertEqual((threads.chunk_size, async_uploader.chunk_size), (1536 * 1024, 1536 * 1024))
+        self.assertEqual(autotuned.tuner.chunk_sizes, (1536 * 1024, 1024 * 1024))
+
+    def test_build_publishing_profile(self):
+        profile = build_publishing_profile(
+            replace(self.azure_config, gallery_target_regions="westeurope=3,northeurope", gallery_vm_concurrency=50)
+        )
+        explicit = build_publishing_profile(
+            replace(self.azure_config, gallery_replica_count=4, gallery_vm_concurrency=50)
+        )
+
+        self.assertEqual(profile.replica_count, 3)
+        self.assertEqual(
+            [(r.name, r.replica_count) for r in profile.regions], [("westeurope", 3), ("northeurope", None)]
+        )
+        self.assertEqual(explicit.replica_count, 4)
+        with self.assertRaises(ValueError):
+            build_publishing_profile(
+                replace(self.azure_config, gallery_replication_mode="Shallow", gallery_vm_concurrency=50)
+            )
+
     def test_build_unsupported_mirror_raises(self):
         with self.assertRaises(ValueError):
             build_mirror(
@@ -57,6 +135,98 @@ class TestBuildMirror(unittest.TestCase):
                 self.logger,
             )
 
+    def test_mirror_keys(self):
+        self.assertEqual(mirror_keys("all"), ["boshio/ubuntu-jammy", "boshio/ubuntu-noble"])
+        self.assertEqual(
+            mirror_keys(" boshio/ubuntu-noble, boshio/ubuntu-jammy,boshio/ubuntu-noble"),
+            ["boshio/ubuntu-noble", "boshio/ubuntu-jammy"],
+        )
+
+    def test_build_mirrors_share_downloader_and_cache(self):
+        mirrors = build_mirrors(
+            self.azure_manager,
+            self.azure_config,
+            MirrorConfig(mirror="all", mounted_directory="/mnt", cache_size=1, download_workers=8),
+            None,
+            self.logger,
+        )
+
+        self.assertEqual([type(mirror) for mirror in mirrors], [BoshIoJammyMirror, BoshIoNobleMirror])
+        self.assertIs(mirrors[0].downloader, mirrors[1].downloader)
+        self.assertIs(mirrors[0].cache, mirrors[1].cache)
+        self.assertIs(mirrors[0].azure_manager, mirrors[1].azure_manager)
+        self.assertIs(mirrors[0].metadata, mirrors[1].metadata)
+        self.assertIs(mirrors[0].metadata._http, mirrors[0].downloader._http)
+        self.assertEqual(mirrors[0].downloader._http.get_adapter("https://bosh.io/")._pool_maxsize, 16)
+
+
+class TestRunMirrors(unittest.TestCase):
+    def make_mirror(self, name: str, run=None) -> MagicMock:
+        mirror = MagicMock()
+        mirror.name = name
+        mirror.run.side_effect = run
+        return mirror
+
+    def test_failing_mirror_does_not_stop_others(self):
+        mirrors = [self.make_mirror("a", RuntimeError("boom")), self.make_mirror("b")]
+
+        failed = run_mirrors(mirrors, 0, MagicMock())
+
+        self.assertEqual(failed, ["a"])
+        mirrors[1].run.assert_called_once()
+
+    def test_runs_mirrors_concurrently_up_to_limit(self):
+        lock = threading.Lock()
+        running = [0, 0]  # current, maximum
+
+        def run():
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+
+        self.assertEqual(run_mirrors([self.make_mirror(str(i), run) for i in range(4)], 2, MagicMock()), [])
+        self.assertEqual(running[1], 2)
+
+
+class TestStartup(unittest.TestCase):
+    # Loaded only once a run needs to publish or upload something.
+    DEFERRED_MODULES = ("azure.identity", "azure.mgmt.compute", "azure.storage.blob", "aiohttp")
+    # Import time of src.main beyond requests and yaml, relative to theirs. It is about 1; importing
+    # azure.mgmt.compute at startup, for instance, takes it to about 2.5.
+    IMPORT_TIME_BUDGET = 2
+
+    def test_startup_defers_sdk_imports(self):
+        result = subprocess.run(
+            [sys.executable, "-c", "import sys, src.main; print(*sys.modules)"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+        loaded = set(result.stdout.split())
+        self.assertEqual([module for module in self.DEFERRED_MODULES if module in loaded], [])
+
+    def test_startup_import_time_stays_within_budget(self):
+        # src.main is imported after the third-party modules it needs at startup, in the same interpreter,
+        # so its own import time is compared to theirs rather than to a wall-clock limit a loaded machine exceeds.
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import requests, yaml; import src.main"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+        cumulative: dict[str, int] = {}
+        for line in result.stderr.splitlines():
+            fields: list[str] = line.split("|")
+            if len(fields) == 3 and fields[1].strip().isdigit():
+                cumulative[fields[2].strip()] = int(fields[1])
+        baseline: int = cumulative["requests"] + cumulative["yaml"]
+        self.assertLess(cumulative["src.main"], self.IMPORT_TIME_BUDGET * baseline)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,131 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from src.operations import OperationTracker, ProvisioningStatePoller
+
+
+class FakePoller:
+    """An LROPoller that is done once ``finish`` is called."""
+
+    def __init__(self, result=None, error: Exception | None = None) -> None:
+        self._done = threading.Event()
+        self._result = result
+        self._error = error
+
+    def finish(self) -> None:
+        self._done.set()
+
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def result(self):
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+class TestOperationTracker(unittest.TestCase):
+    def setUp(self):
+        self.logger = MagicMock()
+        self.tracker = OperationTracker(min_interval=0.01, max_interval=0.05, logger=self.logger)
+
+    def test_resolves_futures_as_operations_finish(self):
+        first, second = FakePoller("first"), FakePoller("second")
+        first_done = self.tracker.track("Operation 1", first)
+        second_done = self.tracker.track("Operation 2", second)
+
+        second.finish()
+        self.assertEqual(second_done.result(timeout=5), "second")
+        self.assertFalse(first_done.done())
+        first.finish()
+
+        self.assertEqual(first_done.result(timeout=5), "first")
+        self.assertTrue(any("Operation 1 succeeded" in call.args[0] for call in self.logger.info.mock_calls))
+
+    def test_failed_operation_resolves_to_its_error(self):
+        error = RuntimeError("replication failed")
+        poller = FakePoller(error=error)
+        poller.finish()
+
+        with self.assertRaises(RuntimeError):
+            self.tracker.track("Operation", poller).result(timeout=5)
+
+    def test_reports_progress_until_done(self):
+        poller = FakePoller()
+        states = iter([{"eastus": "Replicating 10%"}, {"eastus": "Replicating 10%"}, {"eastus": "Completed 100%"}])
+        probed = threading.Event()
+
+        def progress():
+            state = next(states, None)
+            if state is None:
+                probed.set()
+                return {"eastus": "Completed 100%"}, None
+            return state, None
+
+        done = self.tracker.track("Operation", poller, progress)
+        probed.wait(5)
+        poller.finish()
+        done.result(timeout=5)
+
+        messages = [call.args[0] for call in self.logger.info.mock_calls if "replication" in call.args[0]]
+        self.assertEqual(
+            messages, ["Operation replication: eastus Replicating 10%", "Operation replication: eastus Completed 100%"]
+        )
+
+    def test_operation_without_progress_is_polled_every_interval(self):
+        poller = FakePoller()
+        calls = []
+        done = poller.done
+        poller.done = lambda: calls.append(None) or done()
+        tracker = OperationTracker(min_interval=0.05, max_interval=0.05, logger=self.logger)
+
+        tracked = tracker.track("Operation", poller)
+        time.sleep(0.5)
+        poller.finish()
+        tracked.result(timeout=5)
+
+        self.assertLessEqual(len(calls), 20)
+
+    def test_invalid_intervals_raise(self):
+        with self.assertRaises(ValueError):
+            OperationTracker(min_interval=0)
+        with self.assertRaises(ValueError):
+            OperationTracker(min_interval=10, max_interval=1)
+
+
+class TestProvisioningStatePoller(unittest.TestCase):
+    def test_reads_the_state_until_provisioning_ends(self):
+        now = [0.0]
+        creating, succeeded = MagicMock(provisioning_state="Creating"), MagicMock(provisioning_state="Succeeded")
+        get_resource = MagicMock(side_effect=[creating, succeeded])
+        poller = ProvisioningStatePoller(get_resource, min_interval=5, clock=lambda: now[0])
+
+        self.assertFalse(poller.done())
+        now[0] = 4
+        self.assertFalse(poller.done())
+        now[0] = 5
+        self.assertTrue(poller.done())
+        self.assertTrue(poller.done())
+
+        self.assertEqual(get_resource.call_count, 2)
+        self.assertIs(poller.result(), succeeded)
+
+    def test_failed_provisioning_raises(self):
+        poller = ProvisioningStatePoller(lambda: MagicMock(provisioning_state="Failed"))
+
+        self.assertTrue(poller.done())
+        with self.assertRaisesRegex(RuntimeError, "Failed"):
+            poller.result()
+
+    def test_missing_resource_raises_its_error(self):
+        poller = ProvisioningStatePoller(MagicMock(side_effect=LookupError("not found")))
+
+        self.assertTrue(poller.done())
+        with self.assertRaises(LookupError):
+            poller.result()
+
+
+if __name__ == "__main__":
+    unittest.main()
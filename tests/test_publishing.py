@@ -0,0 +1,61 @@
+import unittest
+
+from src.publishing import PublishingProfile, RegionTarget, parse_target_regions, replica_count_for
+
+
+class TestPublishingProfile(unittest.TestCase):
+    def test_replicates_to_home_and_target_regions(self):
+        profile = PublishingProfile(
+            regions=(RegionTarget("West Europe", 3), RegionTarget("northeurope")),
+            replica_count=2,
+            storage_account_type="Standard_ZRS",
+        )
+
+        body = profile.build("eastus").as_dict()
+
+        self.assertEqual(
+            [(region["name"], region["regionalReplicaCount"]) for region in body["targetRegions"]],
+            [("eastus", 2), ("westeurope", 3), ("northeurope", 2)],
+        )
+        self.assertEqual({region["storageAccountType"] for region in body["targetRegions"]}, {"Standard_ZRS"})
+        self.assertEqual((body["replicaCount"], body["replicationMode"]), (2, "Full"))
+
+    def test_home_region_target_overrides_its_replica_count(self):
+        body = PublishingProfile(regions=(RegionTarget("eastus", 5),)).build("EastUS").as_dict()
+
+        self.assertEqual([(r["name"], r["regionalReplicaCount"]) for r in body["targetRegions"]], [("eastus", 5)])
+
+    def test_shallow_replication_only_in_home_region(self):
+        body = PublishingProfile(replication_mode="Shallow").build("eastus").as_dict()
+
+        self.assertEqual(body["replicationMode"], "Shallow")
+        with self.assertRaises(ValueError):
+            PublishingProfile(regions=(RegionTarget("westeurope"),), replication_mode="Shallow")
+        with self.assertRaises(ValueError):
+            PublishingProfile(replica_count=2, replication_mode="Shallow")
+
+    def test_invalid_settings_raise(self):
+        with self.assertRaises(ValueError):
+            PublishingProfile(replication_mode="Deep")
+        with self.assertRaises(ValueError):
+            PublishingProfile(storage_account_type="Floppy_LRS")
+        with self.assertRaises(ValueError):
+            PublishingProfile(regions=(RegionTarget("westeurope", 0),))
+
+    def test_replica_count_for_vm_concurrency(self):
+        self.assertEqual([replica_count_for(n) for n in (0, 1, 20, 21, 100, 10_000)], [1, 1, 1, 2, 5, 100])
+
+    def test_parse_target_regions(self):
+        self.assertEqual(
+            parse_target_regions(" westeurope=3, northeurope ,"),
+            (RegionTarget("westeurope", 3), RegionTarget("northeurope")),
+        )
+        self.assertEqual(parse_target_regions(""), ())
+        with self.assertRaises(ValueError):
+            parse_target_regions("westeurope=many")
+        with self.assertRaises(ValueError):
+            parse_target_regions("=3")
+
+
+if __name__ == "__main__":
+    unittest.main()
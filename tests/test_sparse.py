@@ -0,0 +1,105 @@
+import hashlib
+import io
+import os
+import shutil
+import unittest
+
+from src.sparse import (
+    coalesce_ranges,
+    find_data_ranges,
+    load_content_digest,
+    load_range_map,
+    split_ranges,
+    subtract_ranges,
+    write_sparse,
+)
+
+tmp_dir = os.path.join("tests", "tmp-sparse")
+
+
+class TestSparse(unittest.TestCase):
+    def test_find_data_ranges_all_zero(self):
+        self.assertEqual(find_data_ranges(bytes(256 * 1024)), [])
+
+    def test_find_data_ranges_coalesces_adjacent_pages(self):
+        data = bytearray(256 * 1024)
+        data[100] = 1
+        data[600] = 1  # adjacent page, merged with the first
+        data[65535] = 1  # last page of the first 64 KiB block...
+        data[65536] = 1  # ...merged across the block boundary
+        data[200000] = 1
+
+        ranges = find_data_ranges(bytes(data), offset=4096)
+
+        self.assertEqual(
+            ranges,
+            [(4096, 4096 + 1024), (4096 + 65024, 4096 + 66048), (4096 + 199680, 4096 + 200192)],
+        )
+
+    def test_find_data_ranges_block_size(self):
+        data = bytearray(8192)
+        data[5000] = 1
+
+        self.assertEqual(find_data_ranges(bytes(data), block_size=4096), [(4096, 8192)])
+        with self.assertRaises(ValueError):
+            find_data_ranges(bytes(data), block_size=3000)
+
+    def test_find_data_ranges_partial_block(self):
+        self.assertEqual(find_data_ranges(b"\0" * 700 + b"\1"), [(512, 701)])
+
+    def test_coalesce_ranges(self):
+        self.assertEqual(coalesce_ranges([(0, 10), (10, 20), (15, 30), (40, 50)]), [(0, 30), (40, 50)])
+
+    def test_subtract_ranges(self):
+        self.assertEqual(
+            subtract_ranges([(0, 10), (20, 30), (40, 50)], [(2, 4), (8, 22), (25, 26), (40, 50)]),
+            [(0, 2), (4, 8), (22, 25), (26, 30)],
+        )
+        self.assertEqual(subtract_ranges([(0, 10)], []), [(0, 10)])
+
+    def test_split_ranges(self):
+        self.assertEqual(list(split_ranges([(0, 10), (20, 25)], 4)), [(0, 4), (4, 8), (8, 10), (20, 24), (24, 25)])
+
+
+class TestWriteSparse(unittest.TestCase):
+    def setUp(self):
+        os.makedirs(tmp_dir, exist_ok=True)
+        self.path = os.path.join(tmp_dir, "root.vhd")
+
+    def tearDown(self):
+        shutil.rmtree(tmp_dir)
+
+    def test_write_sparse_is_byte_identical(self):
+        data = b"head" + bytes(10 * 1024 * 1024) + b"\x01" * 5000 + bytes(8 * 1024 * 1024) + b"tail"
+
+        ranges = write_sparse(io.BytesIO(data), self.path)
+
+        with open(self.path, "rb") as written:
+            self.assertEqual(written.read(), data)
+        self.assertEqual(ranges[0], (0, 4096))
+        self.assertEqual(ranges[-1][1], len(data))
+        self.assertEqual(load_range_map(self.path), ranges)
+        self.assertEqual(load_content_digest(self.path), hashlib.sha256(data).hexdigest())
+        self.assertLess(sum(end - start for start, end in ranges), 64 * 1024)
+
+    def test_write_sparse_trailing_zeros_keep_size(self):
+        data = b"\x01" + bytes(9 * 1024 * 1024)
+
+        ranges = write_sparse(io.BytesIO(data), self.path)
+
+        self.assertEqual(os.path.getsize(self.path), len(data))
+        self.assertEqual(ranges, [(0, 4096)])
+
+    def test_load_range_map_rejects_stale_map(self):
+        write_sparse(io.BytesIO(b"\x01" * 4096), self.path)
+        with open(self.path, "ab") as modified:
+            modified.write(b"more")
+
+        self.assertIsNone(load_range_map(self.path))
+
+    def test_load_range_map_missing(self):
+        self.assertIsNone(load_range_map(self.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import json
+import os
+import shutil
+import stat
+import unittest
+from unittest.mock import MagicMock
+
+from src.state_file import load_state, save_state
+
+tmp_dir = os.path.join("tests", "tmp-state-file")
+
+
+class TestStateFile(unittest.TestCase):
+    def setUp(self):
+        os.makedirs(tmp_dir, exist_ok=True)
+        self.path = os.path.join(tmp_dir, "state.json")
+        self.logger = MagicMock()
+
+    def tearDown(self):
+        shutil.rmtree(tmp_dir)
+
+    def test_saved_state_is_loaded(self):
+        save_state(self.path, {"a": [1, 2]}, "state", self.logger, compact=True)
+
+        self.assertEqual(load_state(self.path, "state", self.logger), {"a": [1, 2]})
+        with open(self.path) as saved:
+            self.assertEqual(saved.read(), '{"a":[1,2]}')
+        self.assertFalse(os.path.exists(f"{self.path}.tmp"))
+        self.logger.warning.assert_not_called()
+
+    def test_missing_file_is_empty(self):
+        self.assertEqual(load_state(self.path, "state", self.logger), {})
+        self.logger.warning.assert_not_called()
+
+    def test_unreadable_file_is_ignored(self):
+        for content in (b"{not json", b"\xff\xfe", json.dumps([1]).encode()):
+            with open(self.path, "wb") as target:
+                target.write(content)
+
+            self.assertEqual(load_state(self.path, "state", self.logger), {})
+        self.assertEqual(self.logger.warning.call_count, 3)
+
+    def test_mode_applies_to_new_file(self):
+        save_state(self.path, {}, "state", self.logger, mode=0o600)
+
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+
+    def test_failed_save_is_logged(self):
+        save_state(os.path.join(tmp_dir, "missing", "state.json"), {}, "state", self.logger)
+
+        self.assertIn("Failed to save state", self.logger.warning.call_args.args[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
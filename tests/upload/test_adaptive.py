@@ -0,0 +1,141 @@
+import io
+import unittest
+from unittest.mock import MagicMock, patch
+
+from azure.core.exceptions import HttpResponseError, ServiceRequestError
+
+from src.upload.adaptive import AdaptivePageBlobUploader, UploadTuner
+from tests.fakes import FakeClock
+from tests.upload.test_page_blob import KIB, RecordingBlobClient
+
+
+def server_busy(status_code: int = 503) -> HttpResponseError:
+    response = MagicMock()
+    response.status_code = status_code
+    return HttpResponseError(message="The server is busy.", response=response)
+
+
+class TestUploadTuner(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.tuner = UploadTuner(
+            initial_concurrency=2,
+            max_concurrency=16,
+            chunk_sizes=(4 * KIB, 2 * KIB),
+            probe_size=1000 * KIB,
+            step_size=10 * KIB,
+            logger=MagicMock(),
+            clock=self.clock,
+        )
+        self.tuner.start()
+
+    def run_step(self, seconds: float) -> None:
+        self.clock.now += seconds
+        self.tuner.record(10 * KIB)
+
+    def test_doubles_concurrency_while_throughput_improves(self):
+        self.run_step(4.0)
+        self.assertEqual(self.tuner.concurrency, 4)
+        self.run_step(2.0)
+        self.assertEqual(self.tuner.concurrency, 8)
+
+        self.run_step(1.95)  # not enough of an improvement over 2.0
+
+        self.assertEqual((self.tuner.concurrency, self.tuner.chunk_size), (4, 2 * KIB))
+
+    def test_settles_on_best_setting(self):
+        self.run_step(2.0)
+        self.run_step(4.0)  # concurrency 4 is slower
+        self.assertEqual((self.tuner.concurrency, self.tuner.chunk_size), (2, 2 * KIB))
+
+        self.run_step(1.0)  # smaller chunks are faster
+
+        self.assertTrue(self.tuner.settled)
+        self.assertEqual((self.tuner.concurrency, self.tuner.chunk_size), (2, 2 * KIB))
+        self.assertIn(
+            "BASM_UPLOAD_CHUNK_SIZE_KB=2 and BASM_UPLOAD_CONCURRENCY=2", self.tuner.logger.info.call_args.args[0]
+        )
+
+    def test_throttling_halves_and_caps_concurrency(self):
+        self.run_step(4.0)
+        self.run_step(2.0)
+        self.assertEqual(self.tuner.concurrency, 8)
+
+        self.tuner.throttled()
+        self.tuner.throttled()  # rejected together with the first request
+
+        self.assertEqual((self.tuner.concurrency, self.tuner.max_concurrency), (4, 4))
+
+
+class TestAdaptivePageBlobUploader(unittest.TestCase):
+    @patch("src.upload.adaptive.time.sleep")
+    def test_retries_throttled_requests(self, mock_sleep):
+        data = b"\x01" * (4 * KIB)
+        blob_client = RecordingBlobClient()
+        upload_page = blob_client.upload_page
+        failures = [server_busy()]
+
+        def flaky_upload_page(page, offset, length, **kwargs):
+            if offset == 2 * KIB and failures:
+                raise failures.pop()
+            upload_page(page, offset=offset, length=length)
+
+        blob_client.upload_page = flaky_upload_page
+        tuner = UploadTuner(initial_concurrency=2, max_concurrency=4, chunk_sizes=(2 * KIB, KIB))
+        uploader = AdaptivePageBlobUploader(tuner)
+
+        uploader.upload_stream(blob_client, io.BytesIO(data), len(data))
+
+        self.assertEqual(bytes(blob_client.content), data)
+        mock_sleep.assert_called_once()
+        self.assertEqual(tuner.concurrency, 1)
+
+    @patch("src.upload.adaptive.time.sleep")
+    def test_throttling_reaches_the_tuner_on_the_first_rejection(self, mock_sleep):
+        data = b"\x01" * KIB
+        blob_client = RecordingBlobClient()
+        upload_page = blob_client.upload_page
+        attempts = []
+        tuner = UploadTuner(initial_concurrency=4, max_concurrency=4, chunk_sizes=(KIB,))
+
+        def busy_once(page, offset, length, **kwargs):
+            attempts.append((tuner.concurrency, kwargs))
+            if len(attempts) == 1:
+                raise server_busy()
+            upload_page(page, offset=offset, length=length)
+
+        blob_client.upload_page = busy_once
+
+        AdaptivePageBlobUploader(tuner).upload_stream(blob_client, io.BytesIO(data), len(data))
+
+        self.assertEqual(attempts, [(4, {"retry_total": 0}), (2, {"retry_total": 0})])
+        self.assertEqual(bytes(blob_client.content), data)
+
+    @patch("src.upload.adaptive.time.sleep")
+    def test_transient_errors_are_retried_without_throttling(self, mock_sleep):
+        data = b"\x01" * KIB
+        blob_client = RecordingBlobClient()
+        upload_page = blob_client.upload_page
+        failures = [ServiceRequestError("connection reset"), server_busy(500)]
+
+        def flaky_upload_page(page, offset, length, **kwargs):
+            if failures:
+                raise failures.pop()
+            upload_page(page, offset=offset, length=length)
+
+        blob_client.upload_page = flaky_upload_page
+        tuner = UploadTuner(initial_concurrency=4, max_concurrency=4, chunk_sizes=(KIB,))
+
+        AdaptivePageBlobUploader(tuner).upload_stream(blob_client, io.BytesIO(data), len(data))
+
+        self.assertEqual(bytes(blob_client.content), data)
+        self.assertEqual(mock_sleep.call_count, 2)
+        self.assertEqual(tuner.concurrency, 4)
+
+    def test_invalid_chunk_sizes_raise(self):
+        with self.assertRaises(ValueError):
+            AdaptivePageBlobUploader(UploadTuner(chunk_sizes=(1000,)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import asyncio
+import io
+import os
+import shutil
+import unittest
+
+from src.upload.async_page_blob import AsyncPageBlobUploader
+from tests.upload.test_page_blob import KIB, RecordingBlobClient
+
+tmp_dir = os.path.join("tests", "tmp-async-upload")
+
+
+class RecordingAsyncBlobClient:
+    """Applies async Put Page calls to a ``RecordingBlobClient`` and tracks the bytes in flight."""
+
+    def __init__(self, blob_client: RecordingBlobClient) -> None:
+        self.blob_client = blob_client
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        return None
+
+    async def upload_page(self, page: bytes, offset: int, length: int) -> None:
+        self.in_flight += length
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= length
+        self.blob_client.upload_page(page, offset=offset, length=length)
+
+
+class RecordingAsyncPageBlobUploader(AsyncPageBlobUploader):
+    def _open_async_client(self, blob_client):
+        self.async_client = RecordingAsyncBlobClient(blob_client)
+        return self.async_client
+
+
+class TestAsyncPageBlobUploader(unittest.TestCase):
+    def setUp(self):
+        os.makedirs(tmp_dir, exist_ok=True)
+        self.addCleanup(shutil.rmtree, tmp_dir)
+
+    def test_upload_stream_bounds_bytes_in_flight(self):
+        data = bytes(2 * KIB) + b"\x01" * (14 * KIB)
+        blob_client = RecordingBlobClient()
+        uploader = RecordingAsyncPageBlobUploader(in_flight_size=4 * KIB, chunk_size=KIB)
+
+        uploader.upload_stream(blob_client, io.BytesIO(data), len(data))
+
+        self.assertEqual(bytes(blob_client.content), data)
+        self.assertEqual(sorted(blob_client.writes), [(offset, KIB) for offset in range(2 * KIB, 16 * KIB, KIB)])
+        self.assertLessEqual(uploader.async_client.max_in_flight, 4 * KIB)
+        self.assertGreater(uploader.async_client.max_in_flight, KIB)
+
+    def test_upload_file_sends_views_of_the_mapping(self):
+        data = b"\x01" * (4 * KIB)
+        vhd_path = os.path.join(tmp_dir, "root.vhd")
+        with open(vhd_path, "wb") as vhd:
+            vhd.write(data)
+        blob_client = RecordingBlobClient()
+        pages = []
+        upload_page = blob_client.upload_page
+        blob_client.upload_page = lambda page, offset, length: pages.append(type(page)) or upload_page(
+            page, offset=offset, length=length
+        )
+
+        RecordingAsyncPageBlobUploader(in_flight_size=2 * KIB, chunk_size=KIB).upload_file(blob_client, vhd_path)
+
+        self.assertEqual(bytes(blob_client.content), data)
+        self.assertEqual(pages, [memoryview] * 4)
+
+    def test_resume_skips_present_pages(self):
+        data = b"\x01" * (4 * KIB)
+        blob_client = RecordingBlobClient()
+        blob_client.create_page_blob(len(data))
+        blob_client.content[0 : 2 * KIB] = data[0 : 2 * KIB]
+        blob_client.present = [(0, 2 * KIB)]
+
+        RecordingAsyncPageBlobUploader(in_flight_size=2 * KIB, chunk_size=KIB).upload_stream(
+            blob_client, io.BytesIO(data), len(data), resume=True
+        )
+
+        self.assertEqual(bytes(blob_client.content), data)
+        self.assertEqual(sorted(blob_client.writes), [(2 * KIB, KIB), (3 * KIB, KIB)])
+
+    def test_upload_propagates_failure(self):
+        blob_client = RecordingBlobClient(fail_at_offset=2 * KIB)
+
+        with self.assertRaises(RuntimeError):
+            RecordingAsyncPageBlobUploader(in_flight_size=2 * KIB, chunk_size=KIB).upload_stream(
+                blob_client, io.BytesIO(b"\x01" * 8 * KIB), 8 * KIB
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
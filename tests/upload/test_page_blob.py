@@ -0,0 +1,233 @@
+import io
+import os
+import shutil
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from azure.core.exceptions import ResourceNotFoundError
+
+from src.upload.page_blob import PageBlobUploader, PageBody, UploadError
+
+KIB = 1024
+MIB = 1024 * KIB
+
+tmp_dir = os.path.join("tests", "tmp-upload")
+
+
+class RecordingBlobClient:
+    """Collects Put Page calls into an in-memory page blob."""
+
+    def __init__(self, fail_at_offset: int | None = None) -> None:
+        self.content = bytearray()
+        self.writes: list[tuple[int, int]] = []
+        self.fail_at_offset = fail_at_offset
+        self._lock = threading.Lock()
+
+        self.exists = False
+        self.present: list[tuple[int, int]] = []
+
+    def create_page_blob(self, size: int) -> None:
+        self.content = bytearray(size)
+        self.exists = True
+        self.present = []
+
+    def get_blob_properties(self) -> SimpleNamespace:
+        if not self.exists:
+            raise ResourceNotFoundError("BlobNotFound")
+        return SimpleNamespace(size=len(self.content))
+
+    def list_page_ranges(self) -> list[SimpleNamespace]:
+        return [SimpleNamespace(start=start, end=end - 1, cleared=False) for start, end in self.present]
+
+    def upload_page(self, page: bytes, offset: int, length: int) -> None:
+        if offset == self.fail_at_offset:
+            raise RuntimeError("boom")
+        with self._lock:
+            self.content[offset : offset + length] = bytes(page[:length])
+            self.writes.append((offset, length))
+
+
+class TestPageBlobUploader(unittest.TestCase):
+    def setUp(self):
+        os.makedirs(tmp_dir, exist_ok=True)
+
+    def tearDown(self):
+        shutil.rmtree(tmp_dir)
+
+    def test_upload_file_skips_zero_pages(self):
+        data = bytearray(12 * MIB)
+        data[0:1024] = b"\x01" * 1024
+        data[5 * MIB : 10 * MIB] = b"\x02" * (5 * MIB)
+        data[-512:] = b"\x03" * 512
+        vhd_path = os.path.join(tmp_dir, "root.vhd")
+        with open(vhd_path, "wb") as vhd:
+            vhd.write(data)
+        blob_client = RecordingBlobClient()
+
+        PageBlobUploader(concurrency=2).upload_file(blob_client, vhd_path)
+
+        self.assertEqual(bytes(blob_client.content), bytes(data))
+        self.assertEqual(
+            sorted(blob_client.writes),
+            [(0, 1024), (5 * MIB, 4 * MIB), (9 * MIB, MIB), (12 * MIB - 512, 512)],
+        )
+
+    def test_upload_file_with_known_data_ranges(self):
+        data = bytearray(4 * MIB)
+        data[8192:8292] = b"\x01" * 100
+        data[3 * MIB : 3 * MIB + 512] = b"\x02" * 512  # outside the map, so never read
+        vhd_path = os.path.join(tmp_dir, "root.vhd")
+        with open(vhd_path, "wb") as vhd:
+            vhd.write(data)
+        blob_client = RecordingBlobClient()
+
+        PageBlobUploader().upload_file(blob_client, vhd_path, [(8192, 12288)])
+
+        self.assertEqual(blob_client.writes, [(8192, 512)])
+
+    def test_upload_file_empty(self):
+        vhd_path = os.path.join(tmp_dir, "empty.vhd")
+        open(vhd_path, "wb").close()
+        blob_client = RecordingBlobClient()
+
+        PageBlobUploader().upload_file(blob_client, vhd_path)
+
+        self.assertEqual((bytes(blob_client.content), blob_client.writes), (b"", []))
+
+    def test_upload_stream(self):
+        data = bytes(range(256)) * 40  # 10 KiB
+        blob_client = RecordingBlobClient()
+        uploader = PageBlobUploader(concurrency=3, window_size=4 * KIB, chunk_size=2 * KIB)
+
+        uploader.upload_stream(blob_client, io.BytesIO(data), len(data))
+
+        self.assertEqual(bytes(blob_client.content), data)
+        self.assertEqual(sorted(blob_client.writes), [(offset, 2 * KIB) for offset in range(0, 10 * KIB, 2 * KIB)])
+
+    def test_upload_stream_skips_zero_pages(self):
+        data = bytes(4 * KIB) + b"\x01" * KIB + bytes(3 * KIB)
+        blob_client = RecordingBlobClient()
+
+        PageBlobUploader(chunk_size=2 * KIB, window_size=4 * KIB).upload_stream(
+            blob_client, io.BytesIO(data), len(data)
+        )
+
+        self.assertEqual(bytes(blob_client.content), data)
+        self.assertEqual(blob_client.writes, [(4 * KIB, KIB)])
+
+    def test_upload_stream_requires_page_alignment(self):
+        blob_client = MagicMock()
+
+        with self.assertRaises(ValueError):
+            PageBlobUploader().upload_stream(blob_client, io.BytesIO(b"x" * 100), 100)
+
+        blob_client.create_page_blob.assert_not_called()
+
+    def test_upload_stream_raises_on_short_stream(self):
+        with self.assertRaises(EOFError):
+            PageBlobUploader(chunk_size=KIB, window_size=KIB).upload_stream(
+                RecordingBlobClient(), io.BytesIO(bytes(KIB)), 4 * KIB
+            )
+
+    def test_upload_stream_propagates_upload_failure(self):
+        blob_client = RecordingBlobClient(fail_at_offset=2 * KIB)
+
+        with self.assertRaises(RuntimeError):
+            PageBlobUploader(chunk_size=KIB, window_size=2 * KIB).upload_stream(
+                blob_client, io.BytesIO(b"\x01" * 8 * KIB), 8 * KIB
+            )
+
+    def test_resume_uploads_only_missing_pages(self):
+        data = b"\x01" * (8 * KIB)
+        vhd_path = os.path.join(tmp_dir, "root.vhd")
+        with open(vhd_path, "wb") as vhd:
+            vhd.write(data)
+        blob_client = RecordingBlobClient()
+        blob_client.create_page_blob(len(data))
+        blob_client.content[0 : 3 * KIB] = data[0 : 3 * KIB]
+        blob_client.present = [(0, 2 * KIB), (2 * KIB, 3 * KIB), (6 * KIB, 7 * KIB)]
+        blob_client.content[6 * KIB : 7 * KIB] = data[6 * KIB : 7 * KIB]
+        uploader = PageBlobUploader(chunk_size=4 * KIB, window_size=4 * KIB)
+
+        for data_ranges in (None, [(0, len(data))]):
+            with self.subTest(data_ranges=data_ranges):
+                blob_client.writes = []
+                uploader.upload_file(blob_client, vhd_path, data_ranges, resume=True)
+
+                self.assertEqual(bytes(blob_client.content), data)
+                self.assertEqual(sorted(blob_client.writes), [(3 * KIB, 3 * KIB), (7 * KIB, KIB)])
+
+    def test_resume_stream_skips_present_pages(self):
+        data = b"\x01" * (4 * KIB)
+        blob_client = RecordingBlobClient()
+        blob_client.create_page_blob(len(data))
+        blob_client.content[0 : 2 * KIB] = data[0 : 2 * KIB]
+        blob_client.present = [(0, 2 * KIB)]
+
+        PageBlobUploader(chunk_size=KIB, window_size=KIB).upload_stream(
+            blob_client, io.BytesIO(data), len(data), resume=True
+        )
+
+        self.assertEqual(bytes(blob_client.content), data)
+        self.assertEqual(sorted(blob_client.writes), [(2 * KIB, KIB), (3 * KIB, KIB)])
+
+    def test_resume_recreates_missing_or_mismatched_blob(self):
+        data = b"\x01" * (2 * KIB)
+        for existing_size in (None, KIB):
+            with self.subTest(existing_size=existing_size):
+                blob_client = RecordingBlobClient()
+                if existing_size is not None:
+                    blob_client.create_page_blob(existing_size)
+                    blob_client.present = [(0, existing_size)]
+
+                PageBlobUploader(chunk_size=KIB, window_size=KIB).upload_stream(
+                    blob_client, io.BytesIO(data), len(data), resume=True
+                )
+
+                self.assertEqual(bytes(blob_client.content), data)
+                self.assertEqual(sorted(blob_client.writes), [(0, KIB), (KIB, KIB)])
+
+    def test_resume_raises_on_size_mismatch(self):
+        blob_client = MagicMock()
+        blob_client.get_blob_properties.side_effect = [ResourceNotFoundError("BlobNotFound"), SimpleNamespace(size=0)]
+
+        with self.assertRaises(UploadError):
+            PageBlobUploader().upload_stream(blob_client, io.BytesIO(bytes(KIB)), KIB, resume=True)
+
+    def test_invalid_settings_raise(self):
+        with self.assertRaises(ValueError):
+            PageBlobUploader(concurrency=0)
+        with self.assertRaises(ValueError):
+            PageBlobUploader(chunk_size=1000)
+        with self.assertRaises(ValueError):
+            PageBlobUploader(chunk_size=8 * 1024 * KIB)
+        with self.assertRaises(ValueError):
+            PageBlobUploader(chunk_size=2 * KIB, window_size=KIB)
+
+
+class TestPageBody(unittest.TestCase):
+    def test_reads_and_slices_without_copying(self):
+        data = bytearray(b"0123456789")
+        body = PageBody(memoryview(data))[2:8]
+
+        self.assertEqual(len(body), 6)
+        self.assertEqual(bytes(body.read(4)), b"2345")
+        self.assertEqual(body.tell(), 4)
+        data[6] = ord("x")
+        self.assertEqual(bytes(body.read()), b"x7")
+        self.assertEqual(bytes(body.read(1)), b"")
+
+    def test_seek_rewinds_for_retries(self):
+        body = PageBody(memoryview(b"abcdef"))
+        body.read()
+
+        self.assertEqual(body.seek(0), 0)
+        self.assertEqual(bytes(body.read(2)), b"ab")
+        self.assertEqual(body.seek(-1, os.SEEK_END), 5)
+        self.assertEqual(bytes(body), b"abcdef")
+
+
+if __name__ == "__main__":
+    unittest.main()